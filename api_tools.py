@@ -0,0 +1,143 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# HTTP tools the assistants call, e.g. the weather lookup in main.py. Requests
+# go through one pooled session with explicit timeouts, and answers are cached
+# per key. Point WEATHER_BASE_URL at a local server to run without the real API.
+
+DEFAULT_TIMEOUT = (3.05, 10)
+
+logger = logging.getLogger(__name__)
+
+
+class HttpClient:
+    """A requests.Session with a connection pool, keep-alive and default timeouts."""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, pool_size=10, retries=2):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.timeout = timeout
+        self.session = requests.Session()
+        # Only idempotent GETs are retried, and only on connection errors and 5xx
+        retry = Retry(total=retries, backoff_factor=0.3, status_forcelist=(502, 503, 504),
+                      allowed_methods=frozenset(['GET']))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get_json(self, url, params=None, timeout=None):
+        response = self.session.get(url, params=params, timeout=timeout or self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def close(self):
+        self.session.close()
+
+
+class TTLCache:
+    """Cache with stale-while-revalidate.
+
+    An entry younger than `ttl` is returned as is. One older than that but
+    within `stale_ttl` is returned at once while a background refresh replaces
+    it. Anything older, or missing, is fetched before returning. A failed
+    background refresh is logged and keeps the stale entry; the next one for
+    that key waits `retry_after` seconds, doubling with each failure in a
+    row up to `max_retry_after`.
+    """
+
+    def __init__(self, ttl=600, stale_ttl=3600, max_entries=256, retry_after=30, max_retry_after=600):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.retry_after = retry_after
+        self.max_retry_after = max_retry_after
+        self.entries = {}
+        self.refreshing = set()
+        # key -> (time of the last failed refresh, failures in a row)
+        self.failures = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+        self.hits = self.stale_hits = self.misses = 0
+
+    def get(self, key, fetch):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry:
+                age = now - entry[0]
+                if age < self.ttl:
+                    self.hits += 1
+                    return entry[1]
+                if age < self.stale_ttl:
+                    self.stale_hits += 1
+                    if key not in self.refreshing and not self._backing_off(key, now):
+                        self.refreshing.add(key)
+                        self.executor.submit(self._refresh, key, fetch)
+                    return entry[1]
+            self.misses += 1
+
+        value = fetch()
+        self._store(key, value)
+        return value
+
+    def _backing_off(self, key, now):
+        failure = self.failures.get(key)
+        if not failure:
+            return False
+        failed_at, count = failure
+        return now - failed_at < min(self.max_retry_after, self.retry_after * 2 ** (count - 1))
+
+    def _refresh(self, key, fetch):
+        try:
+            self._store(key, fetch())
+            with self.lock:
+                self.failures.pop(key, None)
+        except Exception as e:
+            with self.lock:
+                count = self.failures.get(key, (0, 0))[1] + 1
+                self.failures[key] = (time.monotonic(), count)
+            logger.warning("Refreshing %r failed (%d in a row), serving the stale value: %s", key, count, e)
+        finally:
+            with self.lock:
+                self.refreshing.discard(key)
+
+    def _store(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic(), value)
+            if len(self.entries) > self.max_entries:
+                oldest = min(self.entries, key=lambda k: self.entries[k][0])
+                del self.entries[oldest]
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+class WeatherTool:
+    """Current weather from OpenWeatherMap, cached per location."""
+
+    def __init__(self, api_key=None, base_url=None, http=None, ttl=600, stale_ttl=3600):
+        self.api_key = api_key or os.getenv('WEATHER_API_KEY')
+        self.base_url = (base_url or os.getenv('WEATHER_BASE_URL') or 'https://api.openweathermap.org').rstrip('/')
+        self._http = http
+        self.cache = TTLCache(ttl, stale_ttl)
+
+    @property
+    def http(self):
+        if self._http is None:
+            self._http = HttpClient()
+        return self._http
+
+    def current(self, location):
+        key = ' '.join(location.lower().split())
+        return self.cache.get(key, lambda: self.http.get_json(
+            f"{self.base_url}/data/2.5/weather", params={'q': location, 'appid': self.api_key}))
+
+    def close(self):
+        self.cache.close()
+        if self._http is not None:
+            self._http.close()
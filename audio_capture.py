@@ -0,0 +1,457 @@
+import sys
+import time
+import wave
+import queue
+import array
+import argparse
+import threading
+import warnings
+from collections import deque
+
+with warnings.catch_warnings():
+    # Deprecated, but still the fastest RMS/resampling in the stdlib where it exists
+    warnings.simplefilter('ignore', DeprecationWarning)
+    try:
+        import audioop
+    except ImportError:
+        audioop = None
+
+# Continuous capture for the voice assistants. A capture thread copies frames
+# from the microphone (or WAV files) into a ring buffer and does nothing else,
+# so it never stalls behind recognition or speech output. A second thread runs
+# voice-activity detection over the buffer and puts complete utterances on a
+# queue. Try it on recordings with:
+#   python audio_capture.py first.wav second.wav
+
+FRAME_MS = 30
+SAMPLE_RATE = 16000
+
+
+class RingBuffer:
+    """Fixed-size byte ring for one writer thread and one reader thread.
+
+    The writer only moves write_pos and the reader only moves read_pos, so
+    neither side takes a lock. When the writer laps the reader the oldest
+    audio is dropped and counted in `overruns`.
+    """
+
+    def __init__(self, capacity, align=1):
+        self.capacity = capacity - capacity % align
+        self.align = align
+        self.buffer = bytearray(self.capacity)
+        self.write_pos = 0
+        self.read_pos = 0
+        self.overruns = 0
+        self.data_ready = threading.Event()
+
+    def __len__(self):
+        return min(self.write_pos - self.read_pos, self.capacity)
+
+    def write(self, data):
+        data = data[-self.capacity:]
+        start = self.write_pos % self.capacity
+        first = min(len(data), self.capacity - start)
+        self.buffer[start:start + first] = data[:first]
+        self.buffer[:len(data) - first] = data[first:]
+        self.write_pos += len(data)
+        self.data_ready.set()
+
+    def read(self, size, timeout=None):
+        """Return the next `size` bytes, or None if they don't arrive in time."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.write_pos - self.read_pos < size:
+            self.data_ready.clear()
+            if self.write_pos - self.read_pos >= size:
+                break
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            self.data_ready.wait(remaining)
+
+        while True:
+            if self.write_pos - self.read_pos > self.capacity - size:
+                # Lapped: skip ahead to the oldest audio that is still intact
+                skip_to = self.write_pos - self.capacity + size
+                self.read_pos = skip_to + (-skip_to) % self.align
+                self.overruns += 1
+            start = self.read_pos % self.capacity
+            first = min(size, self.capacity - start)
+            data = bytes(self.buffer[start:start + first]) + bytes(self.buffer[:size - first])
+            # The writer may have overwritten the bytes while they were copied
+            if self.write_pos - self.read_pos <= self.capacity:
+                self.read_pos += size
+                return data
+
+
+def rms(frame, sample_width):
+    if audioop:
+        return audioop.rms(frame, sample_width)
+    samples = array.array('h', frame)
+    return int((sum(sample * sample for sample in samples) / max(1, len(samples))) ** 0.5)
+
+
+# WAV conversions for WavFileSource; audioop where it exists (it is gone from
+# Python 3.13), plain Python otherwise, which is slower but only runs at open()
+
+def to_pcm16(data, width):
+    """Little-endian samples of `width` bytes as 16-bit signed PCM."""
+    if audioop:
+        if width == 1:
+            # 8-bit WAV samples are unsigned
+            data = audioop.bias(data, 1, -128)
+        return audioop.lin2lin(data, width, 2)
+    if width == 1:
+        return array.array('h', ((byte - 128) << 8 for byte in data)).tobytes()
+    # Keep the two most significant bytes of each sample
+    out = bytearray(len(data) // width * 2)
+    out[0::2] = data[width - 2::width]
+    out[1::2] = data[width - 1::width]
+    return bytes(out)
+
+
+def to_mono(data, channels):
+    """Average the channels of 16-bit interleaved PCM."""
+    if audioop and channels == 2:
+        return audioop.tomono(data, 2, 0.5, 0.5)
+    samples = array.array('h', data)
+    return array.array('h', (sum(samples[i:i + channels]) // channels
+                             for i in range(0, len(samples), channels))).tobytes()
+
+
+def resample(data, from_rate, to_rate):
+    """16-bit mono PCM at another sample rate, by linear interpolation."""
+    if audioop:
+        return audioop.ratecv(data, 2, 1, from_rate, to_rate, None)[0]
+    samples = array.array('h', data)
+    if not samples:
+        return b''
+    out = array.array('h')
+    last = len(samples) - 1
+    for n in range(len(samples) * to_rate // from_rate):
+        position = n * from_rate / to_rate
+        i = int(position)
+        following = samples[min(i + 1, last)]
+        out.append(int(samples[i] + (following - samples[i]) * (position - i)))
+    return out.tobytes()
+
+
+class EnergyVAD:
+    """Frames louder than a multiple of the running noise floor count as speech."""
+
+    def __init__(self, sample_width=2, ratio=3.0, min_energy=300, adapt=0.05):
+        self.sample_width = sample_width
+        self.ratio = ratio
+        self.min_energy = min_energy
+        self.adapt = adapt
+        self.noise = None
+
+    def is_speech(self, frame):
+        energy = rms(frame, self.sample_width)
+        if self.noise is None:
+            self.noise = energy
+        speech = energy > max(self.min_energy, self.noise * self.ratio)
+        if not speech:
+            # Only silence moves the floor, so a long utterance doesn't raise it
+            self.noise += (energy - self.noise) * self.adapt
+        return speech
+
+
+class WebRtcVAD:
+    def __init__(self, sample_rate, aggressiveness=2):
+        import webrtcvad
+        self.vad = webrtcvad.Vad(aggressiveness)
+        self.sample_rate = sample_rate
+
+    def is_speech(self, frame):
+        return self.vad.is_speech(frame, self.sample_rate)
+
+
+def make_vad(sample_rate, sample_width=2, name='auto'):
+    """WebRTC's VAD when it is installed and supports the format, else the energy VAD."""
+    if name in ('auto', 'webrtc') and sample_width == 2 and sample_rate in (8000, 16000, 32000, 48000):
+        try:
+            return WebRtcVAD(sample_rate)
+        except ImportError:
+            if name == 'webrtc':
+                raise
+    return EnergyVAD(sample_width)
+
+
+class Utterance:
+    def __init__(self, frame_data, sample_rate, sample_width, started_at, ended_at, truncated=False):
+        self.frame_data = frame_data
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        # Seconds since capture started, by sample count
+        self.started_at = started_at
+        self.ended_at = ended_at
+        # time.monotonic() when the end of speech was detected
+        self.detected_at = time.monotonic()
+        self.truncated = truncated
+        # Filled in when a streaming recognizer has already transcribed it
+        self.text = None
+
+    @property
+    def duration(self):
+        return len(self.frame_data) / (self.sample_rate * self.sample_width)
+
+    def audio_data(self):
+        """The utterance as speech_recognition.AudioData."""
+        import speech_recognition as sr
+        return sr.AudioData(self.frame_data, self.sample_rate, self.sample_width)
+
+
+class Segmenter:
+    """Turns a stream of frames into utterances.
+
+    Speech starts after `start_frames` voiced frames in a row and ends after
+    `end_silence` seconds without one. Each utterance keeps `pre_roll` seconds
+    from before the start, so the first syllable isn't clipped, and is cut at
+    `max_seconds` so a noisy room can't hold it open forever.
+    """
+
+    def __init__(self, vad, sample_rate, sample_width, frame_ms=FRAME_MS, start_frames=3,
+                 end_silence=0.6, pre_roll=0.3, max_seconds=30, on_speech_start=None):
+        self.vad = vad
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.frame_seconds = frame_ms / 1000
+        self.start_frames = start_frames
+        self.end_frames = max(1, round(end_silence / self.frame_seconds))
+        self.max_frames = round(max_seconds / self.frame_seconds)
+        self.on_speech_start = on_speech_start
+        self.pre_roll = deque(maxlen=start_frames + round(pre_roll / self.frame_seconds))
+        self.frames = []
+        self.voiced_run = 0
+        self.silent_run = 0
+        self.position = 0
+        self.started_at = None
+
+    @property
+    def in_speech(self):
+        return self.started_at is not None
+
+    def feed(self, frame):
+        """Add one frame; returns an Utterance when one has just ended."""
+        self.position += 1
+        voiced = self.vad.is_speech(frame)
+
+        if not self.in_speech:
+            self.pre_roll.append(frame)
+            self.voiced_run = self.voiced_run + 1 if voiced else 0
+            if self.voiced_run >= self.start_frames:
+                self.frames = list(self.pre_roll)
+                self.pre_roll.clear()
+                self.started_at = (self.position - len(self.frames)) * self.frame_seconds
+                self.silent_run = 0
+                if self.on_speech_start:
+                    self.on_speech_start()
+            return None
+
+        self.frames.append(frame)
+        self.silent_run = 0 if voiced else self.silent_run + 1
+        if self.silent_run >= self.end_frames:
+            # Keep a little of the trailing silence, drop the rest
+            return self._finish(len(self.frames) - self.silent_run + self.end_frames // 3)
+        if len(self.frames) >= self.max_frames:
+            return self._finish(len(self.frames), truncated=True)
+        return None
+
+    def flush(self):
+        """End any utterance in progress, e.g. at the end of a recording."""
+        if not self.in_speech:
+            return None
+        return self._finish(len(self.frames))
+
+    def _finish(self, keep, truncated=False):
+        frames = self.frames[:keep]
+        utterance = Utterance(b''.join(frames), self.sample_rate, self.sample_width, self.started_at,
+                              self.started_at + len(frames) * self.frame_seconds, truncated)
+        self.frames = []
+        self.started_at = None
+        self.voiced_run = 0
+        return utterance
+
+
+class MicrophoneSource:
+    """Reads raw frames from a speech_recognition Microphone."""
+
+    def __init__(self, sample_rate=SAMPLE_RATE, device_index=None):
+        import speech_recognition as sr
+        self.microphone = sr.Microphone(device_index=device_index, sample_rate=sample_rate,
+                                        chunk_size=sample_rate * FRAME_MS // 1000)
+        self.sample_rate = sample_rate
+        self.sample_width = None
+
+    def open(self):
+        self.microphone.__enter__()
+        self.sample_rate = self.microphone.SAMPLE_RATE
+        self.sample_width = self.microphone.SAMPLE_WIDTH
+
+    def read(self, samples):
+        return self.microphone.stream.read(samples)
+
+    def close(self):
+        self.microphone.__exit__(None, None, None)
+
+
+class WavFileSource:
+    """Plays WAV files into the capture in place of the microphone.
+
+    Files are converted to mono 16-bit at the first file's rate, with `gap`
+    seconds of silence after each one so they come out as separate
+    utterances. With realtime=True frames are paced like a live microphone.
+    """
+
+    def __init__(self, paths, gap=1.0, realtime=False):
+        self.paths = list(paths)
+        self.gap = gap
+        self.realtime = realtime
+        self.sample_rate = None
+        self.sample_width = 2
+        self._pending = bytearray()
+        self._started = None
+        self._delivered = 0
+
+    def open(self):
+        for path in self.paths:
+            with wave.open(path, 'rb') as wav:
+                data = wav.readframes(wav.getnframes())
+                width, channels, rate = wav.getsampwidth(), wav.getnchannels(), wav.getframerate()
+            if width != 2:
+                data = to_pcm16(data, width)
+            if channels > 1:
+                data = to_mono(data, channels)
+            self.sample_rate = self.sample_rate or rate
+            if rate != self.sample_rate:
+                data = resample(data, rate, self.sample_rate)
+            self._pending += data + bytes(int(self.gap * self.sample_rate) * 2)
+        self._started = time.monotonic()
+
+    def read(self, samples):
+        size = samples * self.sample_width
+        data = bytes(self._pending[:size])
+        del self._pending[:size]
+        if self.realtime and data:
+            self._delivered += samples
+            delay = self._started + self._delivered / self.sample_rate - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        return data
+
+    def read_all(self):
+        return self.read(len(self._pending) // self.sample_width)
+
+    def close(self):
+        self._pending.clear()
+
+
+class AudioCapture:
+    """Capture thread, ring buffer and VAD thread feeding a queue of utterances.
+
+    `vad` is a VAD object or a make_vad() name. `utterances` receives
+    Utterance objects, then None once a finite source such as WavFileSource
+    runs out. The optional callbacks run on the VAD thread: on_speech_frame
+    gets every frame of an utterance as it is captured, pre-roll included,
+    and on_speech_end gets the utterance before it is queued.
+    """
+
+    def __init__(self, source, vad=None, buffer_seconds=10, on_speech_start=None, on_speech_frame=None,
+                 on_speech_end=None, **segmenter_options):
+        self.source = source
+        self.vad = vad
+        self.buffer_seconds = buffer_seconds
+        self.on_speech_start = on_speech_start
+        self.on_speech_frame = on_speech_frame
+        self.on_speech_end = on_speech_end
+        self.segmenter_options = segmenter_options
+        self.utterances = queue.Queue()
+        self.running = False
+        self.finished = False
+        self.ring = None
+        self.segmenter = None
+        self._threads = []
+
+    def start(self):
+        self.source.open()
+        rate, width = self.source.sample_rate, self.source.sample_width
+        self.frame_samples = rate * FRAME_MS // 1000
+        self.frame_bytes = self.frame_samples * width
+        self.ring = RingBuffer(self.buffer_seconds * rate * width, align=self.frame_bytes)
+        vad = self.vad if hasattr(self.vad, 'is_speech') else make_vad(rate, width, self.vad or 'auto')
+        self.segmenter = Segmenter(vad, rate, width,
+                                   on_speech_start=self.on_speech_start, **self.segmenter_options)
+        self.running = True
+        self._threads = [threading.Thread(target=self._capture, name="audio-capture", daemon=True),
+                         threading.Thread(target=self._segment, name="audio-vad", daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    def _capture(self):
+        try:
+            while self.running:
+                data = self.source.read(self.frame_samples)
+                if not data:
+                    break
+                self.ring.write(data)
+        finally:
+            self.finished = True
+            self.ring.data_ready.set()
+
+    def _segment(self):
+        while self.running:
+            frame = self.ring.read(self.frame_bytes, timeout=0.1)
+            if frame is None:
+                if self.finished:
+                    break
+                continue
+            was_in_speech = self.segmenter.in_speech
+            utterance = self.segmenter.feed(frame)
+            if self.on_speech_frame and self.segmenter.in_speech:
+                for speech_frame in ([frame] if was_in_speech else self.segmenter.frames):
+                    self.on_speech_frame(speech_frame)
+            if utterance:
+                self._deliver(utterance)
+        utterance = self.segmenter.flush()
+        if utterance:
+            self._deliver(utterance)
+        self.utterances.put(None)
+
+    def _deliver(self, utterance):
+        if self.on_speech_end:
+            self.on_speech_end(utterance)
+        self.utterances.put(utterance)
+
+    def stop(self):
+        self.running = False
+        for thread in self._threads:
+            thread.join(timeout=1)
+        self.source.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Split WAV recordings into utterances with the capture pipeline")
+    parser.add_argument('wavs', nargs='+')
+    parser.add_argument('--vad', choices=('auto', 'energy', 'webrtc'), default='auto')
+    parser.add_argument('--realtime', action='store_true', help="feed the audio at recording speed")
+    args = parser.parse_args()
+
+    capture = AudioCapture(WavFileSource(args.wavs, realtime=args.realtime), vad=args.vad)
+    capture.start()
+    start = time.perf_counter()
+    count = 0
+    while True:
+        utterance = capture.utterances.get()
+        if utterance is None:
+            break
+        count += 1
+        flag = " (cut at max length)" if utterance.truncated else ""
+        print(f"{count:3d}  {utterance.started_at:7.2f}s - {utterance.ended_at:7.2f}s  "
+              f"{utterance.duration:5.2f}s{flag}")
+    capture.stop()
+    print(f"{count} utterances in {time.perf_counter() - start:.2f}s, {capture.ring.overruns} buffer overruns",
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,15 +2,26 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext, simpledialog
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
-import json
 import threading
+import queue
 import time
 import os
-from bs4 import BeautifulSoup
-from groq import Groq
+from llm_client import get_client
 import configparser
 import logging
-import pickle
+import re
+import textwrap
+from concurrent.futures import ThreadPoolExecutor, Future
+from driver_pool import DriverPool
+from llm_cache import LLMCache
+from html_extract import get_backend
+from chunking import map_reduce
+from retrieval import BM25Index
+from virtual_tree import VirtualTreeview
+from export import JsonlWriter, write_jsonl, iter_elements, export_columnar
+from fingerprints import FingerprintStore, check_validators, text_fingerprint
+
+LLM_PROCESSING_ERROR = "An error occurred while processing the content with the LLM."
 
 class SmartWebScraperTool:
     def __init__(self, master):
@@ -20,15 +31,37 @@ class SmartWebScraperTool:
 
         self.create_widgets()
 
+        # Worker threads never touch Tk directly; they post here and the
+        # main loop drains everything queued since the previous tick at once
+        self.ui_queue = queue.Queue()
+        self.ui_tick_ms = 50
+        self.master.after(self.ui_tick_ms, self.drain_ui_queue)
+
         self.driver = None
         self.selected_elements = {}
         self.is_selecting = False
         self.local_storage_path = "scraped_data"
         os.makedirs(self.local_storage_path, exist_ok=True)
+        self.fingerprints = FingerprintStore(self.local_storage_path)
+        # Extracted text of every loaded page, indexed for run_query
+        self.page_texts = {}
+        self.query_index = BM25Index()
+        # Elements are appended to a JSONL export as they are added
+        self.export_writer = None
+        self.export_dirty = False
+        # Guards swapping export_writer against appends from other threads
+        self.export_lock = threading.Lock()
 
         self.setup_logging()
         self.load_api_key()
-        self.llm_cache = {}
+        self.load_settings()
+        self.extractor = get_backend(self.extractor_name)
+        # Headless drivers for bulk loads; self.driver stays the interactive browser
+        self.driver_pool = DriverPool(size=self.pool_size)
+        self.llm_executor = ThreadPoolExecutor(max_workers=self.llm_workers)
+        # Separate from llm_executor so page tasks never wait on their own chunks
+        self.chunk_executor = ThreadPoolExecutor(max_workers=self.llm_workers)
+        self.code_executor = ThreadPoolExecutor(max_workers=self.llm_workers)
         self.load_cache()
 
     def setup_logging(self):
@@ -48,7 +81,26 @@ class SmartWebScraperTool:
             config['API'] = {'key': self.api_key}
             with open('config.ini', 'w') as configfile:
                 config.write(configfile)
-        self.client = Groq(api_key=self.api_key)
+        # Shared client: rate limiting, retries and coalescing of identical prompts
+        self.client = get_client(api_key=self.api_key)
+
+    def load_settings(self):
+        config = configparser.ConfigParser()
+        config.read('config.ini')
+        self.pool_size = config.getint('Scraper', 'pool_size', fallback=4)
+        self.llm_workers = config.getint('Scraper', 'llm_workers', fallback=4)
+        self.extractor_name = config.get('Scraper', 'extractor', fallback=None)
+        self.save_pages = config.getboolean('Scraper', 'save_pages', fallback=False)
+        self.llm_model = config.get('LLM', 'model', fallback="llama3-groq-70b-8192-tool-use-preview")
+        self.chunk_tokens = config.getint('LLM', 'chunk_tokens', fallback=3000)
+        self.chunk_overlap = config.getint('LLM', 'chunk_overlap', fallback=200)
+        self.query_top_k = config.getint('LLM', 'query_top_k', fallback=8)
+        self.export_compress = config.getboolean('Export', 'compress', fallback=False)
+        self.load_batch_size = config.getint('Export', 'load_batch_size', fallback=500)
+        self.cache_path = config.get('Cache', 'path', fallback='llm_cache.db')
+        self.cache_max_entries = config.getint('Cache', 'max_entries', fallback=5000)
+        self.cache_max_mb = config.getint('Cache', 'max_mb', fallback=50)
+        self.cache_ttl_days = config.getint('Cache', 'ttl_days', fallback=30)
 
     def create_widgets(self):
         # Main frame
@@ -89,18 +141,11 @@ class SmartWebScraperTool:
         left_frame = ttk.Frame(paned_window)
         paned_window.add(left_frame, weight=1)
 
-        # Elements list
-        self.elements_list = ttk.Treeview(left_frame, columns=("url", "tag", "text"), show="headings")
-        self.elements_list.heading("url", text="URL")
-        self.elements_list.heading("tag", text="Tag")
-        self.elements_list.heading("text", text="Text")
-        self.elements_list.pack(side=tk.LEFT, expand=True, fill=tk.BOTH)
-        self.elements_list.bind("<<TreeviewSelect>>", self.on_element_select)
-
-        # Scrollbar for elements list
-        scrollbar = ttk.Scrollbar(left_frame, orient=tk.VERTICAL, command=self.elements_list.yview)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.elements_list.config(yscrollcommand=scrollbar.set)
+        # Elements list; only the visible rows exist as Treeview items
+        self.elements_list = VirtualTreeview(left_frame, columns=("url", "tag", "text"),
+                                             headings=("URL", "Tag", "Text"),
+                                             on_select=self.on_element_select)
+        self.elements_list.pack(expand=True, fill=tk.BOTH)
 
         # Right frame for element details
         right_frame = ttk.Frame(paned_window)
@@ -134,6 +179,7 @@ class SmartWebScraperTool:
         ttk.Button(button_frame, text="Clear All", command=self.clear_elements).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Save Data", command=self.save_data).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Load Data", command=self.load_data).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Export Parquet", command=self.export_parquet).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Check Consistency", command=self.check_consistency).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Save Cache", command=self.save_cache).pack(side=tk.LEFT, padx=5)
 
@@ -143,102 +189,192 @@ class SmartWebScraperTool:
         status_bar.pack(side=tk.BOTTOM, fill=tk.X)
 
     def load_pages(self):
-        urls = self.url_entry.get('1.0', tk.END).strip().split('\n')
+        urls = [url.strip() for url in self.url_entry.get('1.0', tk.END).split('\n') if url.strip()]
         if not urls:
             messagebox.showerror("Error", "Please enter at least one URL")
             return
 
         self.selected_elements.clear()
-        self.elements_list.delete(*self.elements_list.get_children())
+        self.close_export()
+        self.elements_list.clear()
         self.codeblocks_text.delete('1.0', tk.END)
         self.element_details.delete('1.0', tk.END)
         self.consistency_text.delete('1.0', tk.END)
 
-        # Quit existing driver if any
-        if self.driver:
-            self.driver.quit()
-            self.driver = None
-
-        options = Options()
-        # Remove headless mode to allow user interaction
-        # options.add_argument('--headless')  # Comment out or remove this line
-        self.driver = webdriver.Chrome(options=options)  # Ensure chromedriver is in PATH
+        self.page_texts.clear()
+        self.query_index.clear()
+        for url in urls:
+            self.selected_elements[url] = []
 
         self.status_var.set("Loading pages...")
-        self.master.update()
 
-        # Process URLs sequentially
-        for url in urls:
-            self.load_and_process_page(url)
+        # Fetch in the background so the Tk main loop keeps running
+        thread = threading.Thread(target=self.load_pages_worker, args=(urls,))
+        thread.daemon = True
+        thread.start()
 
-        self.status_var.set("All pages loaded")
+    def load_pages_worker(self, urls):
+        self.open_interactive_browser(urls[-1])
 
-    def load_and_process_page(self, url):
+        # Pages are fetched in parallel on the headless pool; each fetch hands its
+        # text to the LLM executor so extraction overlaps with the remaining loads
+        with ThreadPoolExecutor(max_workers=self.driver_pool.size) as fetch_executor:
+            outcomes = list(fetch_executor.map(self.load_and_process_page, urls))
+
+        changes = {'new': [], 'changed': [], 'unchanged': [], 'failed': []}
+        for url, outcome in zip(urls, outcomes):
+            if isinstance(outcome, Future):
+                try:
+                    outcome = outcome.result()
+                except Exception as e:
+                    logging.error(f"Failed to process page {url}: {str(e)}")
+                    outcome = 'failed'
+            changes[outcome].append(url)
+
+        self.fingerprints.save()
+        for url in changes['new'] + changes['changed']:
+            logging.info(f"Page {url} is new or changed since the last scrape")
+        summary = ", ".join(f"{len(found)} {kind}" for kind, found in changes.items() if found)
+        self.post_ui(self.status_var.set, f"All pages loaded: {summary}")
+
+    def open_interactive_browser(self, url):
         try:
+            persistent = self.driver is None
+            if self.driver is None:
+                options = Options()
+                # Not headless, so the user can interact with the page
+                self.driver = webdriver.Chrome(options=options)  # Ensure chromedriver is in PATH
             self.driver.get(url)
-            self.inject_custom_js()
-            page_content = self.driver.page_source
-            self.selected_elements[url] = []
-            self.status_var.set(f"Loaded page: {url}")
-            self.master.update()
+            self.inject_custom_js(persistent=persistent)
+        except Exception as e:
+            logging.error(f"Failed to open interactive browser for {url}: {str(e)}")
 
-            # Extract relevant text
-            text_content = self.extract_relevant_text(page_content)
-            # Process content with LLM
-            llm_response = self.process_content_with_llm(text_content)
-            # Update GUI with LLM response
-            self.master.after(0, self.update_llm_output, url, llm_response)
+    def load_and_process_page(self, url):
+        previous = self.fingerprints.get(url)
+        try:
+            # A 304 on the ETag/Last-Modified we saw last time skips the browser fetch too;
+            # with no stored extraction to reuse, the HEAD would only cost a round trip
+            if previous and previous.get('llm_response'):
+                not_modified, etag, last_modified = check_validators(url, previous)
+            else:
+                not_modified, etag, last_modified = False, None, None
+            cached_text = self.fingerprints.load_text(previous.get('text_hash')) if not_modified else None
+            if cached_text is not None and previous.get('llm_response'):
+                self.fingerprints.update(url)
+                self.store_page_text(url, cached_text)
+                self.post_ui(self.update_llm_output, url, previous['llm_response'])
+                return 'unchanged'
+
+            with self.driver_pool.driver() as driver:
+                driver.get(url)
+                page_content = driver.page_source
+            self.post_ui(self.status_var.set, f"Loaded page: {url}")
+            return self.llm_executor.submit(self.process_page_content, url, page_content,
+                                            previous, etag, last_modified)
 
         except Exception as e:
             logging.error(f"Failed to load page {url}: {str(e)}")
-            self.status_var.set(f"Failed to load page: {url}")
-            messagebox.showerror("Error", f"Failed to load page: {url}\nError: {str(e)}")
-
-    def inject_custom_js(self):
+            self.post_ui(self.status_var.set, f"Failed to load page: {url}")
+            self.post_ui(messagebox.showerror, "Error", f"Failed to load page: {url}\nError: {str(e)}")
+            return 'failed'
+
+    def process_page_content(self, url, page_content, previous=None, etag=None, last_modified=None):
+        if self.save_pages:
+            self.save_page_source(url, page_content)
+        # Extract relevant text
+        text_content = self.extract_relevant_text(page_content)
+        fingerprint = text_fingerprint(text_content)
+        self.store_page_text(url, text_content)
+        self.fingerprints.save_text(fingerprint, text_content)
+
+        # Same text as last time: reuse the previous extraction instead of asking the LLM again
+        if previous and previous.get('text_hash') == fingerprint and previous.get('llm_response'):
+            self.fingerprints.update(url, etag=etag, last_modified=last_modified)
+            self.post_ui(self.update_llm_output, url, previous['llm_response'])
+            return 'unchanged'
+
+        # Process content with LLM
+        llm_response = self.process_content_with_llm(text_content)
+        if llm_response != LLM_PROCESSING_ERROR:
+            self.fingerprints.update(url, text_hash=fingerprint, etag=etag,
+                                     last_modified=last_modified, llm_response=llm_response)
+        # Update GUI with LLM response
+        self.post_ui(self.update_llm_output, url, llm_response)
+        return 'changed' if previous else 'new'
+
+    def store_page_text(self, url, text_content):
+        self.page_texts[url] = text_content
+        self.query_index.set_document(url, text_content)
+
+    def save_page_source(self, url, page_content):
+        # Raw pages are kept for bench_extract.py
+        pages_path = os.path.join(self.local_storage_path, 'pages')
+        os.makedirs(pages_path, exist_ok=True)
+        file_name = re.sub(r'[^A-Za-z0-9._-]+', '_', url)[:150] + '.html'
+        with open(os.path.join(pages_path, file_name), 'w', encoding='utf-8') as f:
+            f.write(page_content)
+
+    def inject_custom_js(self, persistent=False):
         js_code = """
-        function highlightElement(element) {
-            element.style.outline = '2px solid red';
-        }
-
-        function unhighlightElement(element) {
-            element.style.outline = '';
-        }
-
-        function selectElement(element) {
-            if (element.tagName === 'BODY' || element.tagName === 'HTML') {
-                return null;
+        (function() {
+            if (window.__scraperInstalled) {
+                return;
             }
-            var details = {
-                tag: element.tagName,
-                text: element.innerText,
-                attributes: {},
-                html: element.outerHTML
-            };
-            for (var i = 0; i < element.attributes.length; i++) {
-                details.attributes[element.attributes[i].name] = element.attributes[i].value;
-            }
-            return details;
-        }
+            window.__scraperInstalled = true;
+            window.__scraperQueue = [];
+            window.__scraperNotify = null;
 
-        document.body.addEventListener('mouseover', function(e) {
-            if (e.target.tagName !== 'BODY' && e.target.tagName !== 'HTML') {
-                highlightElement(e.target);
+            function highlightElement(element) {
+                element.style.outline = '2px solid red';
             }
-        });
 
-        document.body.addEventListener('mouseout', function(e) {
-            if (e.target.tagName !== 'BODY' && e.target.tagName !== 'HTML') {
-                unhighlightElement(e.target);
+            function unhighlightElement(element) {
+                element.style.outline = '';
             }
-        });
 
-        document.body.addEventListener('click', function(e) {
-            if (e.target.tagName !== 'BODY' && e.target.tagName !== 'HTML') {
-                e.preventDefault();
-                window.selectedElement = selectElement(e.target);
+            function selectElement(element) {
+                if (element.tagName === 'BODY' || element.tagName === 'HTML') {
+                    return null;
+                }
+                var details = {
+                    tag: element.tagName,
+                    text: element.innerText || '',
+                    attributes: {},
+                    html: element.outerHTML
+                };
+                for (var i = 0; i < element.attributes.length; i++) {
+                    details.attributes[element.attributes[i].name] = element.attributes[i].value;
+                }
+                return details;
             }
-        });
+
+            // Listeners sit on document so they work before <body> exists
+            document.addEventListener('mouseover', function(e) {
+                if (e.target.tagName !== 'BODY' && e.target.tagName !== 'HTML') {
+                    highlightElement(e.target);
+                }
+            }, true);
+
+            document.addEventListener('mouseout', function(e) {
+                if (e.target.tagName !== 'BODY' && e.target.tagName !== 'HTML') {
+                    unhighlightElement(e.target);
+                }
+            }, true);
+
+            document.addEventListener('click', function(e) {
+                if (e.target.tagName !== 'BODY' && e.target.tagName !== 'HTML') {
+                    e.preventDefault();
+                    window.__scraperQueue.push(selectElement(e.target));
+                    if (window.__scraperNotify) {
+                        window.__scraperNotify();
+                    }
+                }
+            }, true);
+        })();
         """
+        if persistent:
+            # Re-run on every new document, so selecting survives navigation
+            self.driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': js_code})
         self.driver.execute_script(js_code)
 
     def toggle_selecting(self):
@@ -249,19 +385,66 @@ class SmartWebScraperTool:
         else:
             self.select_button.config(text="Start Selecting")
 
+    def stop_selecting(self):
+        if self.is_selecting:
+            self.toggle_selecting()
+
     def start_auto_select(self):
+        # Blocks in the page until a click is queued (or wait_ms passes), then
+        # returns every queued click at once: one round-trip per batch, none while idle
+        wait_js = """
+        var wait_ms = arguments[0];
+        var done = arguments[arguments.length - 1];
+        if (!window.__scraperInstalled) {
+            done({installed: false});
+            return;
+        }
+        function drain() {
+            window.__scraperNotify = null;
+            var elements = window.__scraperQueue;
+            window.__scraperQueue = [];
+            done({installed: true, url: window.location.href, elements: elements});
+        }
+        if (window.__scraperQueue.length) {
+            drain();
+            return;
+        }
+        var timer = setTimeout(drain, wait_ms);
+        window.__scraperNotify = function() {
+            clearTimeout(timer);
+            drain();
+        };
+        """
+        wait_ms = 1000
+
         def auto_select():
+            if self.driver is None:
+                self.post_ui(self.status_var.set, "Load a page before selecting elements")
+                self.post_ui(self.stop_selecting)
+                return
+            self.driver.set_script_timeout(wait_ms / 1000 + 5)
+            failures = 0
             while self.is_selecting:
                 try:
-                    selected_element = self.driver.execute_script("return window.selectedElement;")
-                    if selected_element:
-                        current_url = self.driver.current_url
-                        self.master.after(0, self.add_element, current_url, selected_element)
-                        self.driver.execute_script("window.selectedElement = null;")
-                    time.sleep(0.1)  # Check every 100ms
+                    result = self.driver.execute_async_script(wait_js, wait_ms)
+                    failures = 0
                 except Exception as e:
+                    # Navigating away aborts a pending wait; retry against the new page
+                    failures += 1
                     logging.error(f"Error during auto-select: {str(e)}")
-                    break
+                    if failures >= 5:
+                        self.post_ui(self.status_var.set, "Element selection stopped: browser not responding")
+                        self.post_ui(self.stop_selecting)
+                        break
+                    time.sleep(0.2 * failures)
+                    continue
+
+                if not result or not result.get('installed'):
+                    self.inject_custom_js()
+                    continue
+                for selected_element in result['elements']:
+                    if selected_element:
+                        self.post_ui(self.add_element, result['url'], selected_element)
 
         thread = threading.Thread(target=auto_select)
         thread.daemon = True
@@ -269,21 +452,35 @@ class SmartWebScraperTool:
 
     def add_element(self, url, element_data):
         if element_data:
-            self.selected_elements[url].append(element_data)
-            self.elements_list.insert("", "end", values=(url, element_data['tag'], element_data['text'][:30]))
-            self.update_element_details(element_data)
+            self.selected_elements.setdefault(url, []).append(element_data)
+            self.record_element(url, element_data)
+            self.elements_list.append_rows([self.element_row(url, element_data)])
             self.status_var.set(f"Added element from: {url}")
             self.extract_code_blocks(element_data['html'])
             logging.info(f"Element added from {url}")
 
-    def on_element_select(self, event):
-        selection = self.elements_list.selection()
-        if selection:
-            item = self.elements_list.item(selection[0])
-            url = item['values'][0]
-            index = self.elements_list.index(selection[0])
-            element_data = self.selected_elements[url][index]
-            self.update_element_details(element_data)
+    def post_ui(self, callback, *args):
+        self.ui_queue.put((callback, args))
+
+    def drain_ui_queue(self):
+        try:
+            while True:
+                callback, args = self.ui_queue.get_nowait()
+                try:
+                    callback(*args)
+                except Exception as e:
+                    logging.error(f"UI update failed: {str(e)}")
+        except queue.Empty:
+            pass
+        self.master.after(self.ui_tick_ms, self.drain_ui_queue)
+
+    def element_row(self, url, element_data):
+        return (url, element_data['tag'], element_data['text'][:30]), (url, element_data)
+
+    def on_element_select(self, payload):
+        # Details are only formatted for the row the user actually picks
+        url, element_data = payload
+        self.update_element_details(element_data)
 
     def update_element_details(self, element_data):
         self.element_details.delete('1.0', tk.END)
@@ -296,34 +493,64 @@ class SmartWebScraperTool:
         self.element_details.insert(tk.END, details)
 
     def remove_element(self):
-        selection = self.elements_list.selection()
-        if selection:
-            item = self.elements_list.item(selection[0])
-            url = item['values'][0]
-            index = self.elements_list.index(selection[0])
-            self.elements_list.delete(selection[0])
-            del self.selected_elements[url][index]
+        index = self.elements_list.selected
+        if index is not None:
+            url, element_data = self.elements_list.selected_payload()
+            self.elements_list.remove(index)
+            elements = self.selected_elements.get(url, [])
+            for i, element in enumerate(elements):
+                if element is element_data:
+                    del elements[i]
+                    break
+            # The append-only export still holds it; save_data rewrites the file
+            self.export_dirty = True
             self.element_details.delete('1.0', tk.END)
             self.status_var.set("Removed selected element")
             logging.info("Removed selected element")
 
     def clear_elements(self):
-        self.elements_list.delete(*self.elements_list.get_children())
+        self.elements_list.clear()
         self.selected_elements.clear()
+        self.close_export()
         self.element_details.delete('1.0', tk.END)
         self.status_var.set("Cleared all elements")
         logging.info("Cleared all elements")
 
+    def new_export_path(self):
+        extension = ".jsonl.gz" if self.export_compress else ".jsonl"
+        return os.path.join(self.local_storage_path, f"scrape_{int(time.time())}{extension}")
+
+    def record_element(self, url, element_data):
+        try:
+            with self.export_lock:
+                if self.export_writer is None:
+                    self.export_writer = JsonlWriter(self.new_export_path())
+                self.export_writer.append(url, element_data)
+        except OSError as e:
+            logging.error(f"Failed to append element to export: {str(e)}")
+
+    def close_export(self):
+        self.replace_export_writer(None)
+        self.export_dirty = False
+
+    def replace_export_writer(self, file_path):
+        """Close the current export, flushing its tail, and append to file_path (if any) from now on."""
+        with self.export_lock:
+            if self.export_writer:
+                self.export_writer.close()
+            self.export_writer = JsonlWriter(file_path) if file_path else None
+
     def save_data(self):
-        if not self.selected_elements:
+        if not any(self.selected_elements.values()):
             messagebox.showwarning("Warning", "No elements to save")
             return
 
-        file_name = f"scrape_{int(time.time())}.json"
-        file_path = os.path.join(self.local_storage_path, file_name)
-
-        with open(file_path, 'w') as f:
-            json.dump(self.selected_elements, f, indent=2)
+        # Added elements are already on disk; only removals need the file rewritten
+        file_path = self.export_writer.path if self.export_writer else self.new_export_path()
+        if self.export_dirty or self.export_writer is None:
+            self.close_export()
+            write_jsonl(file_path, self.selected_elements)
+            self.replace_export_writer(file_path)
 
         self.status_var.set(f"Data saved to {file_path}")
         messagebox.showinfo("Success", f"Data saved to {file_path}")
@@ -331,19 +558,50 @@ class SmartWebScraperTool:
 
     def load_data(self):
         file_path = filedialog.askopenfilename(initialdir=self.local_storage_path,
-                                               filetypes=[("JSON files", "*.json")])
+                                               filetypes=[("JSON Lines files", "*.jsonl *.jsonl.gz"),
+                                                          ("JSON files", "*.json")])
         if file_path:
-            with open(file_path, 'r') as f:
-                loaded_data = json.load(f)
-
             self.clear_elements()
-            for url, elements in loaded_data.items():
-                self.selected_elements[url] = elements
-                for element in elements:
-                    self.elements_list.insert("", "end", values=(url, element['tag'], element['text'][:30]))
+            self.status_var.set(f"Loading data from {file_path}...")
+            self.load_data_batch(iter_elements(file_path), file_path)
+
+    def load_data_batch(self, rows, file_path):
+        # A batch of rows per Tk tick keeps the window responsive on large exports
+        batch = []
+        for url, element in rows:
+            self.selected_elements.setdefault(url, []).append(element)
+            batch.append(self.element_row(url, element))
+            if len(batch) == self.load_batch_size:
+                self.elements_list.append_rows(batch)
+                self.master.after(1, self.load_data_batch, rows, file_path)
+                return
+        self.elements_list.append_rows(batch)
+
+        # New elements keep appending to a loaded JSONL export
+        if not file_path.endswith('.json'):
+            self.replace_export_writer(file_path)
+        self.status_var.set(f"Loaded data from {file_path}")
+        logging.info(f"Loaded data from {file_path}")
+
+    def export_parquet(self):
+        if not any(self.selected_elements.values()):
+            messagebox.showwarning("Warning", "No elements to export")
+            return
 
-            self.status_var.set(f"Loaded data from {file_path}")
-            logging.info(f"Loaded data from {file_path}")
+        file_path = filedialog.asksaveasfilename(initialdir=self.local_storage_path,
+                                                 defaultextension=".parquet",
+                                                 filetypes=[("Parquet files", "*.parquet"),
+                                                            ("Arrow files", "*.arrow")])
+        if not file_path:
+            return
+        try:
+            rows = export_columnar(file_path, self.selected_elements)
+        except ImportError:
+            messagebox.showerror("Error", "Columnar export needs pyarrow (pip install pyarrow)")
+            return
+
+        self.status_var.set(f"Exported {rows} elements to {file_path}")
+        logging.info(f"Exported {rows} elements to {file_path}")
 
     def check_consistency(self):
         self.consistency_text.delete('1.0', tk.END)
@@ -369,51 +627,55 @@ class SmartWebScraperTool:
             prompt += f"{content}\n\n"
         prompt += "Provide a summary of similarities and differences."
 
-        if prompt in self.llm_cache:
-            return self.llm_cache[prompt]
-
         try:
-            response = self.client.chat.completions.create(
-                model="llama3-groq-70b-8192-tool-use-preview",
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=1024,
-            )
-            result = response.choices[0].message.content
-            self.llm_cache[prompt] = result
-            return result
+            return self.llm_completion(prompt, max_tokens=1024)
         except Exception as e:
             logging.error(f"LLM Error during consistency check: {str(e)}")
             return "An error occurred during the consistency check."
 
     def extract_code_blocks(self, html):
-        soup = BeautifulSoup(html, 'html.parser')
-        code_blocks = soup.find_all(['pre', 'code'])
+        # Runs on the Tk thread: only parsing happens here, explanations are
+        # queued on code_executor and appended to the tab as each one finishes
+        for tag, code_text in self.unique_code_blocks(self.extractor.extract_code(html)):
+            future = self.code_executor.submit(self.explain_code, code_text)
+            future.add_done_callback(
+                lambda f, tag=tag, code_text=code_text: self.code_block_explained(f, tag, code_text)
+            )
 
-        for block in code_blocks:
-            code_text = block.get_text()
-            explanation = self.explain_code(code_text)
-            self.codeblocks_text.insert(tk.END, f"Code Block ({block.name}):\n{code_text}\n\nExplanation:\n{explanation}\n\n")
-            logging.info("Extracted and explained a code block")
+    def code_block_explained(self, future, tag, code_text):
+        # Runs on the worker thread, or on the caller of cancel()/shutdown()
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            logging.error(f"Code explanation failed: {str(error)}")
+            explanation = "An error occurred while explaining this code."
+        else:
+            explanation = future.result()
+        self.post_ui(self.show_code_block, tag, code_text, explanation)
+
+    def unique_code_blocks(self, code_blocks):
+        # <pre><code> yields the same text twice; keep the outer block only
+        seen = set()
+        unique = []
+        for tag, code_text in code_blocks:
+            normalised = textwrap.dedent(code_text).strip('\n')
+            normalised = '\n'.join(line.rstrip() for line in normalised.split('\n'))
+            if not normalised.strip() or normalised in seen:
+                continue
+            seen.add(normalised)
+            unique.append((tag, normalised))
+        return unique
+
+    def show_code_block(self, tag, code_text, explanation):
+        self.codeblocks_text.insert(tk.END, f"Code Block ({tag}):\n{code_text}\n\nExplanation:\n{explanation}\n\n")
+        logging.info("Extracted and explained a code block")
 
     def explain_code(self, code):
         prompt = f"Explain the following code:\n\n{code}"
 
-        if prompt in self.llm_cache:
-            return self.llm_cache[prompt]
-
         try:
-            response = self.client.chat.completions.create(
-                model="llama3-groq-70b-8192-tool-use-preview",
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=512,
-            )
-            explanation = response.choices[0].message.content
-            self.llm_cache[prompt] = explanation
-            return explanation
+            return self.llm_completion(prompt, max_tokens=512)
         except Exception as e:
             logging.error(f"LLM Error during code explanation: {str(e)}")
             return "An error occurred while explaining the code."
@@ -424,58 +686,68 @@ class SmartWebScraperTool:
             messagebox.showwarning("Warning", "Please enter a query")
             return
 
-        all_contents = []
-        for url in self.selected_elements:
-            page_content = self.driver.page_source
-            processed_content = self.extract_relevant_text(page_content)
-            all_contents.append(processed_content)
+        if not self.page_texts:
+            messagebox.showwarning("Warning", "Load some pages before running a query")
+            return
 
-        combined_content = "\n\n".join(all_contents)
+        # Only the passages most relevant to the query go into the prompt; a
+        # query with no indexed words gets the start of each page instead
+        passages = self.query_index.search(query, k=self.query_top_k) or \
+            self.query_index.leading(k=self.query_top_k)
+        combined_content = "\n\n".join(f"Source: {url}\n{passage}" for url, passage, _ in passages)
         prompt = f"{query}\n\nContext:\n{combined_content}"
 
-        if prompt in self.llm_cache:
-            answer = self.llm_cache[prompt]
-        else:
-            try:
-                response = self.client.chat.completions.create(
-                    model="llama3-groq-70b-8192-tool-use-preview",
-                    messages=[
-                        {"role": "user", "content": prompt}
-                    ],
-                    max_tokens=1024,
-                )
-                answer = response.choices[0].message.content
-                self.llm_cache[prompt] = answer
-            except Exception as e:
-                logging.error(f"LLM Error during query: {str(e)}")
-                answer = "An error occurred while processing the query."
+        try:
+            answer = self.llm_completion(prompt, max_tokens=1024)
+        except Exception as e:
+            logging.error(f"LLM Error during query: {str(e)}")
+            answer = "An error occurred while processing the query."
 
         messagebox.showinfo("Query Result", answer)
         logging.info("Ran a natural language query")
 
     def process_content_with_llm(self, content):
-        prompt = f"Extract the key information from the following content:\n\n{content}"
-
-        if prompt in self.llm_cache:
-            return self.llm_cache[prompt]
-
+        # Long pages are split into token-budgeted chunks summarised in parallel.
+        # Every chunk prompt is cached on its own, so a page where one section
+        # changed only re-summarises the chunks around that section.
         try:
-            response = self.client.chat.completions.create(
-                model="llama3-groq-70b-8192-tool-use-preview",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                max_tokens=1024,
+            return map_reduce(
+                content,
+                self.summarise_chunk,
+                self.reduce_summaries,
+                self.chunk_executor,
+                max_tokens=self.chunk_tokens,
+                overlap_tokens=self.chunk_overlap,
             )
-            llm_response = response.choices[0].message.content
-            self.llm_cache[prompt] = llm_response
-            return llm_response
         except Exception as e:
             logging.error(f"LLM Error during content processing: {str(e)}")
-            return "An error occurred while processing the content with the LLM."
+            return LLM_PROCESSING_ERROR
+
+    def summarise_chunk(self, chunk):
+        prompt = f"Extract the key information from the following content:\n\n{chunk}"
+        return self.llm_completion(prompt, max_tokens=1024)
+
+    def reduce_summaries(self, summaries):
+        prompt = "Combine the following partial extractions from one page into a single summary " \
+                 "of its key information, removing repetition:\n\n"
+        prompt += "\n\n---\n\n".join(summaries)
+        return self.llm_completion(prompt, max_tokens=1024)
+
+    def llm_completion(self, prompt, max_tokens):
+        cached = self.llm_cache.get(self.llm_model, prompt, max_tokens)
+        if cached is not None:
+            return cached
+
+        result = self.client.complete(
+            [
+                {"role": "user", "content": prompt}
+            ],
+            self.llm_model,
+            max_tokens=max_tokens,
+        )
+        # Written through immediately, so a crash never loses finished responses
+        self.llm_cache.put(self.llm_model, prompt, max_tokens, result)
+        return result
 
     def update_llm_output(self, url, llm_response):
         # Display the LLM-processed output in the elements view
@@ -485,37 +757,39 @@ class SmartWebScraperTool:
             'attributes': {},
             'html': ''
         }
-        self.selected_elements[url].append(element_data)
-        self.elements_list.insert("", "end", values=(url, element_data['tag'], element_data['text'][:30]))
-        self.update_element_details(element_data)
+        self.selected_elements.setdefault(url, []).append(element_data)
+        self.record_element(url, element_data)
+        self.elements_list.append_rows([self.element_row(url, element_data)])
         logging.info(f"LLM output updated for {url}")
 
     def extract_relevant_text(self, html_content):
-        soup = BeautifulSoup(html_content, 'html.parser')
-        # Remove scripts and styles
-        for script_or_style in soup(['script', 'style']):
-            script_or_style.decompose()
-        # Get text
-        text = soup.get_text(separator='\n')
-        return text
+        # One pass that drops script/style/nav boilerplate and collapses whitespace
+        return self.extractor.extract_text(html_content)
 
     def save_cache(self):
-        with open('llm_cache.pkl', 'wb') as f:
-            pickle.dump(self.llm_cache, f)
-        self.status_var.set("Cache saved")
+        # Entries are already on disk; this only applies the size/TTL limits now
+        self.llm_cache.evict()
+        self.status_var.set(f"Cache saved ({len(self.llm_cache)} entries)")
         logging.info("LLM cache saved")
 
     def load_cache(self):
-        try:
-            with open('llm_cache.pkl', 'rb') as f:
-                self.llm_cache = pickle.load(f)
-            logging.info("LLM cache loaded")
-        except FileNotFoundError:
-            self.llm_cache = {}
-            logging.info("No LLM cache found, starting fresh")
+        self.llm_cache = LLMCache(
+            path=self.cache_path,
+            max_entries=self.cache_max_entries,
+            max_bytes=self.cache_max_mb * 1024 * 1024,
+            ttl=self.cache_ttl_days * 24 * 3600,
+        )
+        logging.info(f"LLM cache opened at {self.cache_path}")
 
     def on_closing(self):
         self.save_cache()
+        self.llm_executor.shutdown(wait=False, cancel_futures=True)
+        self.chunk_executor.shutdown(wait=False, cancel_futures=True)
+        self.code_executor.shutdown(wait=False, cancel_futures=True)
+        self.driver_pool.close()
+        self.llm_cache.close()
+        self.client.close()
+        self.close_export()
         if self.driver:
             self.driver.quit()
         self.master.destroy()
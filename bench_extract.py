@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+import argparse
+import difflib
+from html_extract import available_backends
+
+# Compare the HTML extraction backends over a folder of saved pages, e.g.
+#   python bench_extract.py scraped_data/pages --repeat 5
+
+
+def load_pages(pages_dir):
+    pages = []
+    for entry in sorted(os.scandir(pages_dir), key=lambda e: e.name):
+        if entry.is_file() and entry.name.endswith(('.html', '.htm')):
+            with open(entry.path, 'r', encoding='utf-8', errors='replace') as f:
+                pages.append((entry.name, f.read()))
+    return pages
+
+
+def time_backend(backend, pages, repeat):
+    outputs = {}
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for name, html in pages:
+            outputs[name] = backend.extract_text(html)
+    elapsed = time.perf_counter() - start
+    return elapsed, outputs
+
+
+def similarity(a, b):
+    if a == b:
+        return 1.0
+    return difflib.SequenceMatcher(None, a.splitlines(), b.splitlines(), autojunk=False).ratio()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML-to-text extraction backends")
+    parser.add_argument('pages_dir', nargs='?', default=os.path.join('scraped_data', 'pages'))
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages_dir)
+    if not pages:
+        print(f"No .html files found in {args.pages_dir}")
+        sys.exit(1)
+
+    total_mb = sum(len(html.encode('utf-8')) for _, html in pages) / (1024 * 1024)
+    print(f"{len(pages)} pages, {total_mb:.2f} MB, {args.repeat} repeats")
+
+    results = []
+    for backend in available_backends():
+        elapsed, outputs = time_backend(backend, pages, args.repeat)
+        results.append((backend.name, elapsed, outputs))
+
+    # The BeautifulSoup output is the reference when it is installed
+    reference_name, _, reference = next((r for r in results if r[0] == 'bs4'), results[0])
+
+    print(f"{'backend':<12}{'pages/s':>10}{'MB/s':>10}{'identical':>12}{'similarity':>12}")
+    for name, elapsed, outputs in results:
+        runs = len(pages) * args.repeat
+        identical = sum(1 for page in outputs if outputs[page] == reference[page])
+        mean_similarity = sum(similarity(outputs[page], reference[page]) for page in outputs) / len(outputs)
+        print(f"{name:<12}{runs / elapsed:>10.1f}{total_mb * args.repeat / elapsed:>10.2f}"
+              f"{identical:>7}/{len(pages):<4}{mean_similarity:>12.3f}")
+    print(f"Equivalence is measured against the {reference_name} backend")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from audio_capture import WavFileSource, Utterance
+from recognizers import BACKENDS, get_backend, RecognitionError
+
+# Latency and word error rate of the speech backends over recordings, e.g.
+#   python bench_recognizers.py recordings/ --backends vosk whisper google
+# Each foo.wav needs its reference transcript next to it in foo.txt.
+
+
+def normalize(text):
+    return re.sub(r"[^a-z0-9' ]+", ' ', text.lower()).split()
+
+
+def word_errors(reference, hypothesis):
+    """Word-level edit distance (substitutions + deletions + insertions)."""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1]
+
+
+def fmt(value, spec, width):
+    """A right-aligned table cell; n/a when there is nothing to show."""
+    return f"{'n/a' if value is None else format(value, spec):>{width}}"
+
+
+def load_samples(folder):
+    samples = []
+    for name in sorted(os.listdir(folder)):
+        if not name.endswith('.wav'):
+            continue
+        path = os.path.join(folder, name)
+        reference_path = os.path.splitext(path)[0] + '.txt'
+        if not os.path.exists(reference_path):
+            print(f"Skipping {name}: no {os.path.basename(reference_path)}")
+            continue
+        with open(reference_path, 'r', encoding='utf-8') as f:
+            reference = f.read()
+        source = WavFileSource([path], gap=0)
+        source.open()
+        data = source.read_all()
+        audio = Utterance(data, source.sample_rate, 2, 0.0, len(data) / (2 * source.sample_rate))
+        samples.append((name, audio, reference))
+    return samples
+
+
+def bench_backend(name, samples):
+    backend = get_backend(name)
+    start = time.perf_counter()
+    try:
+        backend.warm()
+    except RecognitionError as e:
+        return {'backend': name, 'error': str(e)}
+    load_seconds = time.perf_counter() - start
+
+    latencies = []
+    errors = words = failures = 0
+    audio_seconds = 0.0
+    transcripts = {}
+    for sample_name, audio, reference in samples:
+        start = time.perf_counter()
+        try:
+            text = backend.transcribe(audio)
+        except RecognitionError:
+            text = ''
+            failures += 1
+        latencies.append(time.perf_counter() - start)
+        audio_seconds += audio.duration
+        reference_words = normalize(reference)
+        errors += word_errors(reference_words, normalize(text))
+        words += len(reference_words)
+        transcripts[sample_name] = text
+
+    latencies.sort()
+    return {
+        'backend': name,
+        'load_seconds': load_seconds,
+        'mean_latency': sum(latencies) / len(latencies),
+        'p90_latency': latencies[min(len(latencies) - 1, int(len(latencies) * 0.9))],
+        'real_time_factor': sum(latencies) / audio_seconds if audio_seconds else None,
+        'wer': errors / words if words else None,
+        'failures': failures,
+        'transcripts': transcripts,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark speech recognition backends on reference recordings")
+    parser.add_argument('folder', help="folder of .wav files with matching .txt transcripts")
+    parser.add_argument('--backends', nargs='+', choices=sorted(BACKENDS), default=sorted(BACKENDS))
+    parser.add_argument('--output', help="write the results as JSON")
+    args = parser.parse_args()
+
+    samples = load_samples(args.folder)
+    if not samples:
+        print(f"No .wav files with transcripts found in {args.folder}")
+        sys.exit(1)
+    total_seconds = sum(audio.duration for _, audio, _ in samples)
+    print(f"{len(samples)} recordings, {total_seconds:.1f}s of audio")
+
+    results = [bench_backend(name, samples) for name in args.backends]
+
+    print(f"{'backend':<10}{'load s':>8}{'mean s':>8}{'p90 s':>8}{'RTF':>7}{'WER':>8}{'failed':>8}")
+    for result in results:
+        if 'error' in result:
+            print(f"{result['backend']:<10}  unavailable: {result['error']}")
+            continue
+        print(f"{result['backend']:<10}{fmt(result['load_seconds'], '.2f', 8)}"
+              f"{fmt(result['mean_latency'], '.3f', 8)}{fmt(result['p90_latency'], '.3f', 8)}"
+              f"{fmt(result['real_time_factor'], '.2f', 7)}{fmt(result['wer'], '.1%', 8)}"
+              f"{result['failures']:>8}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import argparse
+import resource
+import tempfile
+import subprocess
+
+# Measure sorter throughput over generated Downloads folders, e.g.
+#   python bench_sorter.py --files 10000 100000 --output before.json
+#   python bench_sorter.py --files 10000 --dest-root /dev/shm --compare before.json
+# With --dest-root on another filesystem every move is a copy instead of a rename.
+
+# Extensions the default rules sort, plus some they leave alone
+SORTED_EXTENSIONS = ['.pdf', '.docx', '.txt', '.xlsx', '.jpg', '.png', '.gif', '.mp4', '.mkv',
+                     '.zip', '.rar', '.iso', '.exe', '.msi', '.apk']
+UNSORTED_EXTENSIONS = ['.xyz', '.torrent', '.json', '']
+
+
+def file_size(rng, max_size):
+    # Mostly small files with a long tail, like a real Downloads folder
+    return min(max_size, int(rng.lognormvariate(9, 2)))
+
+
+def generate_tree(downloads, count, max_size, duplicate_ratio, seed):
+    """Fill `downloads` with `count` files and return their total size in bytes."""
+    rng = random.Random(seed)
+    os.makedirs(downloads, exist_ok=True)
+    pool = rng.randbytes(max_size + 64)
+    originals = []
+    total = 0
+    for n in range(count):
+        extension = rng.choice(SORTED_EXTENSIONS if rng.random() < 0.9 else UNSORTED_EXTENSIONS)
+        if originals and rng.random() < duplicate_ratio:
+            original, offset, size = rng.choice(originals)
+        else:
+            original, offset, size = n, rng.randrange(64), file_size(rng, max_size)
+            originals.append((original, offset, size))
+        # The header makes each original unique without generating new bytes
+        data = f"{original:016d}".encode() + pool[offset:offset + size]
+        with open(os.path.join(downloads, f"file{n:07d}{extension}"), 'wb') as f:
+            f.write(data)
+        total += len(data)
+    return total
+
+
+def bench_rules(dest_root):
+    from sort_rules import DEFAULT_RULES, Rule, RuleEngine
+    return RuleEngine([Rule(**dict(rule, destination=os.path.join(dest_root, rule['name'])))
+                       for rule in DEFAULT_RULES])
+
+
+def proc_io():
+    try:
+        with open('/proc/self/io') as f:
+            return {key: int(value) for key, value in (line.split(': ') for line in f)}
+    except OSError:
+        return {}
+
+
+def peak_rss_kb():
+    # VmHWM starts over at exec, unlike ru_maxrss which keeps the parent's peak
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KB elsewhere
+    return maxrss // 1024 if sys.platform == 'darwin' else maxrss
+
+
+def run_child(config):
+    """Sort one generated tree in this process and write the measurements as JSON."""
+    import sorter
+
+    engine = bench_rules(config['dest_root'])
+    io_before = proc_io()
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    with open(os.devnull, 'w') as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            start = time.perf_counter()
+            moved = sorter.scan_and_organize_downloads(config['downloads'], engine, workers=config['workers'],
+                                                       dedupe=config['dedupe'])
+            elapsed = time.perf_counter() - start
+        finally:
+            sys.stdout = stdout
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    io_after = proc_io()
+
+    result = {
+        'seconds': elapsed,
+        'moved': moved,
+        'peak_rss_kb': peak_rss_kb(),
+        'voluntary_switches': usage.ru_nvcsw - usage_before.ru_nvcsw,
+        'involuntary_switches': usage.ru_nivcsw - usage_before.ru_nivcsw,
+    }
+    if io_after:
+        result['read_syscalls'] = io_after['syscr'] - io_before['syscr']
+        result['write_syscalls'] = io_after['syscw'] - io_before['syscw']
+        result['bytes_read'] = io_after['read_bytes'] - io_before['read_bytes']
+        result['bytes_written'] = io_after['write_bytes'] - io_before['write_bytes']
+    with open(config['result'], 'w') as f:
+        json.dump(result, f)
+
+
+def strace_totals(path):
+    """Total and per-syscall counts from an `strace -c` summary."""
+    counts = {}
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            # % time, seconds, usecs/call, calls, [errors,] syscall
+            if len(fields) >= 5 and fields[3].isdigit() and fields[-1] != 'total':
+                counts[fields[-1]] = int(fields[3])
+    return sum(counts.values()), dict(sorted(counts.items(), key=lambda item: -item[1])[:10])
+
+
+def run_trial(count, args, workdir):
+    downloads = os.path.join(workdir, 'Downloads')
+    dest_root = os.path.join(args.dest_root or workdir, f"sorted-{os.getpid()}")
+    home = os.path.join(workdir, 'home')
+    os.makedirs(home, exist_ok=True)
+    total_bytes = generate_tree(downloads, count, args.max_size, args.duplicates, args.seed)
+
+    config = {'downloads': downloads, 'dest_root': dest_root, 'workers': args.workers,
+              'dedupe': args.dedupe, 'result': os.path.join(workdir, 'result.json')}
+    command = [sys.executable, os.path.abspath(__file__), '--child', json.dumps(config)]
+    strace_file = os.path.join(workdir, 'strace.txt')
+    if args.strace:
+        command = ['strace', '-f', '-c', '-o', strace_file] + command
+    # A private HOME keeps the dedupe index and journal of the run out of the real ones
+    env = dict(os.environ, HOME=home, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run(command, env=env, check=True)
+
+    with open(config['result']) as f:
+        result = json.load(f)
+    result.update({
+        'files': count,
+        'total_mb': round(total_bytes / (1024 * 1024), 2),
+        'cross_device': os.stat(workdir).st_dev != os.stat(args.dest_root or workdir).st_dev,
+        'workers': args.workers,
+        'dedupe': args.dedupe,
+        'files_per_sec': round(count / result['seconds'], 1),
+    })
+    if args.strace:
+        result['syscalls'], result['top_syscalls'] = strace_totals(strace_file)
+    shutil.rmtree(dest_root, ignore_errors=True)
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_results(results, baseline=None):
+    previous = {(r['files'], r['cross_device'], r['workers'], r['dedupe']): r
+                for r in (baseline or {}).get('results', [])}
+    print(f"{'files':>8}{'MB':>9}{'xdev':>6}{'files/s':>11}{'seconds':>9}{'peak MB':>9}{'syscalls':>10}"
+          + (f"{'vs base':>9}" if baseline else ''))
+    for r in results:
+        syscalls = r.get('syscalls', r.get('read_syscalls', 0) + r.get('write_syscalls', 0))
+        line = (f"{r['files']:>8}{r['total_mb']:>9.1f}{'yes' if r['cross_device'] else 'no':>6}"
+                f"{r['files_per_sec']:>11.1f}{r['seconds']:>9.2f}{r['peak_rss_kb'] / 1024:>9.1f}{syscalls:>10}")
+        base = previous.get((r['files'], r['cross_device'], r['workers'], r['dedupe']))
+        if base:
+            line += f"{r['files_per_sec'] / base['files_per_sec'] - 1:>+9.1%}"
+        print(line)
+    if results and 'syscalls' not in results[0]:
+        print("syscalls counts read/write calls only; pass --strace for the full count")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Downloads sorter on synthetic folders")
+    parser.add_argument('--files', type=int, nargs='+', default=[10000], help="tree sizes to run")
+    parser.add_argument('--max-size', type=int, default=1024 * 1024, help="largest generated file in bytes")
+    parser.add_argument('--duplicates', type=float, default=0.05, help="fraction of files that repeat content")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--no-dedupe', dest='dedupe', action='store_false')
+    parser.add_argument('--work-root', help="where the Downloads folders are generated (default: system temp)")
+    parser.add_argument('--dest-root', help="where files are sorted to; another filesystem forces copies")
+    parser.add_argument('--strace', action='store_true', help="count every syscall with strace -c")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write the results as JSON")
+    parser.add_argument('--compare', help="JSON from an earlier run to compare files/sec against")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(json.loads(args.child))
+        return
+    if args.strace and not shutil.which('strace'):
+        print("strace is not installed")
+        sys.exit(1)
+
+    results = []
+    for count in args.files:
+        with tempfile.TemporaryDirectory(dir=args.work_root) as workdir:
+            results.append(run_trial(count, args, workdir))
+
+    report = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
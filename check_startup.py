@@ -0,0 +1,118 @@
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+# Startup budget for the main.py assistant, e.g.
+#   python check_startup.py --budget 300
+# Exits with status 1 when the time to first prompt or the import time of
+# main goes over budget, or when a lazily imported module is loaded at startup.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROMPT = "Enter your command: "
+
+# Only needed once a command that uses them runs
+LAZY_MODULES = ['requests', 'selenium', 'groq', 'httpx', 'asyncio', 'tiktoken', 'llm_client', 'sorter']
+
+
+def import_times():
+    """Run `python -X importtime -c "import main"`.
+
+    Returns the cumulative import time of main in ms and a dict of the
+    modules main imports directly with their cumulative times.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'],
+                            cwd=HERE, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import main failed: {result.stderr.strip().splitlines()[-1]}")
+    children = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nesting is shown by indentation, and a module is listed after its imports
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        if depth == 1:
+            children[name] = int(cumulative) / 1000
+        elif depth == 0:
+            if name == 'main':
+                return int(cumulative) / 1000, children
+            children = {}
+    return 0.0, {}
+
+
+def loaded_lazy_modules():
+    code = f"import sys, main; print(' '.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, '-c', code], cwd=HERE, capture_output=True, text=True)
+    return result.stdout.split()
+
+
+def time_to_prompt():
+    """Seconds from launching main.py to its first prompt."""
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, 'main.py'], cwd=HERE, stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    output = ''
+    while not output.endswith(PROMPT):
+        char = process.stdout.read(1)
+        if not char:
+            process.wait()
+            raise RuntimeError(f"main.py exited before prompting (status {process.returncode})")
+        output += char
+    elapsed = time.perf_counter() - start
+    process.communicate("exit\n")
+    return elapsed
+
+
+def check(budget=300, import_budget=100, runs=5, top=8, verbose=True):
+    """Measure startup and return the ways it went over budget (empty when fine)."""
+    failures = []
+
+    main_ms, times = import_times()
+    if verbose:
+        print(f"import main: {main_ms:.1f} ms (budget {import_budget:.0f} ms)")
+        for name, ms in sorted(times.items(), key=lambda item: -item[1])[:top]:
+            print(f"  {name:<30}{ms:>8.1f} ms")
+    if main_ms > import_budget:
+        failures.append(f"import main took {main_ms:.1f} ms")
+
+    loaded = loaded_lazy_modules()
+    if loaded:
+        failures.append(f"imported at startup: {', '.join(loaded)}")
+
+    samples = [time_to_prompt() * 1000 for _ in range(runs)]
+    prompt_ms = statistics.median(samples)
+    if verbose:
+        print(f"time to first prompt: {prompt_ms:.1f} ms median of {runs} "
+              f"(min {min(samples):.1f}, budget {budget:.0f} ms)")
+    if prompt_ms > budget:
+        failures.append(f"first prompt after {prompt_ms:.1f} ms")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the startup time of main.py against a budget")
+    parser.add_argument('--budget', type=float, default=300, help="time to first prompt in ms")
+    parser.add_argument('--import-budget', type=float, default=100, help="import time of main in ms")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=8, help="slowest imports to list")
+    args = parser.parse_args()
+
+    try:
+        failures = check(args.budget, args.import_budget, args.runs, args.top)
+    except RuntimeError as e:
+        print(e)
+        sys.exit(1)
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        sys.exit(1)
+    print("Startup is within budget")
+
+
+if __name__ == '__main__':
+    main()
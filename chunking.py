@@ -0,0 +1,132 @@
+import zlib
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    # Loading the BPE tables takes a while, so it waits for the first count
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except ImportError:
+            _encoding = None
+        _encoding_loaded = True
+    return _encoding
+
+
+def count_tokens(text):
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    # Roughly four characters per token for English text
+    return max(1, len(text) // 4) if text else 0
+
+
+def _split_long_line(line, max_tokens):
+    pieces = []
+    current = []
+    current_tokens = 0
+    for word in line.split(' '):
+        word_tokens = count_tokens(word + ' ')
+        if current and current_tokens + word_tokens > max_tokens:
+            pieces.append(' '.join(current))
+            current = []
+            current_tokens = 0
+        current.append(word)
+        current_tokens += word_tokens
+    if current:
+        pieces.append(' '.join(current))
+    return pieces
+
+
+def _is_boundary(line, divisor):
+    return zlib.crc32(line.encode('utf-8')) % divisor == 0
+
+
+def chunk_text(text, max_tokens=3000, overlap_tokens=200, boundary_divisor=8):
+    """Split text into overlapping chunks of at most max_tokens.
+
+    Cut points are chosen from the content itself: once a chunk is at least
+    half full it ends after any line whose hash hits the boundary divisor.
+    An edit therefore only moves the boundaries next to it, and the chunks
+    for the rest of the page keep the same text (and the same cache keys).
+    """
+    lines = []
+    for line in text.split('\n'):
+        if count_tokens(line) > max_tokens - overlap_tokens:
+            lines.extend(_split_long_line(line, max_tokens - overlap_tokens))
+        elif line:
+            lines.append(line)
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    fresh_lines = 0
+    for line in lines:
+        line_tokens = count_tokens(line) + 1
+        if fresh_lines and current_tokens + line_tokens > max_tokens:
+            chunks.append(current)
+            current = _overlap(current, overlap_tokens)
+            current_tokens = sum(count_tokens(l) + 1 for l in current)
+            fresh_lines = 0
+        current.append(line)
+        current_tokens += line_tokens
+        fresh_lines += 1
+        if current_tokens >= max_tokens // 2 and _is_boundary(line, boundary_divisor):
+            chunks.append(current)
+            current = _overlap(current, overlap_tokens)
+            current_tokens = sum(count_tokens(l) + 1 for l in current)
+            fresh_lines = 0
+
+    # Don't emit a trailing chunk that is nothing but overlap
+    if fresh_lines:
+        chunks.append(current)
+    return ['\n'.join(chunk) for chunk in chunks]
+
+
+def _overlap(lines, overlap_tokens):
+    tail = []
+    tokens = 0
+    for line in reversed(lines):
+        tokens += count_tokens(line) + 1
+        if tokens > overlap_tokens:
+            break
+        tail.insert(0, line)
+    return tail
+
+
+def map_reduce(text, map_fn, reduce_fn, executor, max_tokens=3000, overlap_tokens=200):
+    """Run map_fn over every chunk concurrently and fold the results with reduce_fn.
+
+    reduce_fn gets a list of partial results and returns one string. If the
+    partial results are still too large for one prompt they are reduced again
+    in groups until a single result is left.
+    """
+    chunks = chunk_text(text, max_tokens, overlap_tokens)
+    if not chunks:
+        return map_fn(text)
+    if len(chunks) == 1:
+        return map_fn(chunks[0])
+
+    results = list(executor.map(map_fn, chunks))
+    while len(results) > 1:
+        groups = []
+        group = []
+        group_tokens = 0
+        for result in results:
+            result_tokens = count_tokens(result)
+            if group and group_tokens + result_tokens > max_tokens:
+                groups.append(group)
+                group = []
+                group_tokens = 0
+            group.append(result)
+            group_tokens += result_tokens
+        groups.append(group)
+        if len(groups) == 1 or len(groups) == len(results):
+            # One group left, or nothing merged this round: reduce everything at once
+            return reduce_fn(results)
+        results = list(executor.map(reduce_fn, groups))
+    return results[0]
@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from chunking import count_tokens
+
+# Conversation history for the assistants (main.py, voice.py, speach.py).
+# Recent turns are sent verbatim; once they pass the token budget the oldest
+# are folded into a running summary on a background thread, so each request
+# carries the summary plus a few turns instead of the whole transcript.
+# Sessions are saved as JSON, so a restarted assistant picks up where it left off.
+
+logger = logging.getLogger(__name__)
+
+SESSIONS_DIR = os.path.expanduser("~/.assistant_sessions")
+SUMMARY_MODEL = "llama3-8b-8192"
+
+SUMMARY_PROMPT = (
+    "Update the summary of a conversation between a user and an assistant. Keep names, facts, "
+    "preferences, decisions and open questions; drop small talk. Reply with the summary only.\n\n"
+    "Current summary:\n{summary}\n\nNew turns:\n{turns}"
+)
+
+
+def llm_summariser(client, model=SUMMARY_MODEL, max_tokens=400):
+    """A summarise(summary, turns) function backed by the shared LLM client."""
+    def summarise(summary, turns):
+        transcript = "\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+        prompt = SUMMARY_PROMPT.format(summary=summary or "(none yet)", turns=transcript)
+        return client.complete([{"role": "user", "content": prompt}], model, max_tokens=max_tokens).strip()
+    return summarise
+
+
+class Conversation:
+    """Rolling history of one session, kept under `token_budget` tokens.
+
+    When the stored turns go over three quarters of the budget, the oldest
+    are summarised in the background until they are under half of it; the
+    newest `keep_recent` turns are never summarised. Until a summary lands,
+    messages() leaves out the oldest turns so a request never goes over
+    budget.
+    """
+
+    def __init__(self, session="default", token_budget=3000, summarise=None, system_prompt=None,
+                 keep_recent=4, sessions_dir=None):
+        self.session = session
+        self.token_budget = token_budget
+        self.summarise = summarise
+        self.system_prompt = system_prompt
+        self.keep_recent = keep_recent
+        self.path = os.path.join(sessions_dir or SESSIONS_DIR, f"{session}.json")
+        self.summary = ""
+        self.turns = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summarise")
+        self._summarising = False
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("Could not load conversation %s: %s", self.path, e)
+            return
+        self.summary = data.get("summary", "")
+        self.turns = data.get("turns", [])
+
+    def save(self):
+        with self._lock:
+            data = {"session": self.session, "updated": time.time(), "summary": self.summary, "turns": self.turns}
+        temp_path = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            # The conversation carries on in memory
+            logger.warning("Could not save conversation %s: %s", self.path, e)
+
+    def messages(self, user_text):
+        """The messages to send for a new user message, within the token budget."""
+        head = []
+        if self.system_prompt:
+            head.append({"role": "system", "content": self.system_prompt})
+        with self._lock:
+            if self.summary:
+                head.append({"role": "system", "content": f"Summary of the conversation so far: {self.summary}"})
+            turns = list(self.turns)
+
+        budget = self.token_budget - sum(count_tokens(m["content"]) for m in head) - count_tokens(user_text)
+        recent = []
+        for turn in reversed(turns):
+            budget -= turn["tokens"]
+            if budget < 0:
+                break
+            recent.append({"role": turn["role"], "content": turn["content"]})
+        return head + recent[::-1] + [{"role": "user", "content": user_text}]
+
+    def record(self, user_text, reply):
+        """Store one exchange."""
+        with self._lock:
+            for role, content in (("user", user_text), ("assistant", reply)):
+                self.turns.append({"role": role, "content": content, "tokens": count_tokens(content)})
+        self._maybe_summarise()
+        self.save()
+
+    def _stored_tokens(self):
+        return count_tokens(self.summary) + sum(turn["tokens"] for turn in self.turns)
+
+    def _maybe_summarise(self):
+        with self._lock:
+            if not self.summarise or self._summarising or self._stored_tokens() <= self.token_budget * 3 // 4:
+                return
+            self._summarising = True
+        try:
+            self._executor.submit(self._summarise_oldest)
+        except RuntimeError:
+            # Closing; the next session picks the summary up again
+            self._summarising = False
+
+    def _summarise_oldest(self):
+        folded = False
+        try:
+            with self._lock:
+                tokens = self._stored_tokens()
+                count = 0
+                while count < len(self.turns) - self.keep_recent and tokens > self.token_budget // 2:
+                    tokens -= self.turns[count]["tokens"]
+                    count += 1
+                oldest = self.turns[:count]
+                summary = self.summary
+            if not oldest:
+                return
+            # The LLM call runs without the lock; turns are only ever appended
+            # meanwhile, so the oldest ones are still at the front afterwards
+            new_summary = self.summarise(summary, oldest)
+            with self._lock:
+                self.summary = new_summary
+                del self.turns[:count]
+            self.save()
+            folded = True
+        except Exception as e:
+            logger.warning("Could not summarise conversation %s: %s", self.session, e)
+        finally:
+            with self._lock:
+                self._summarising = False
+        if folded:
+            # Turns may have piled up while the summary was being written
+            self._maybe_summarise()
+
+    def clear(self):
+        with self._lock:
+            self.summary = ""
+            self.turns = []
+        self.save()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.save()
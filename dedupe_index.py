@@ -0,0 +1,227 @@
+import os
+import time
+import sqlite3
+import hashlib
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+BLOCK_SIZE = 64 * 1024
+INDEX_FILE = os.path.expanduser("~/.sorter_index.db")
+
+
+def quick_hash(path, size):
+    """Hash of the size plus the first and last 64 KB; cheap first filter."""
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(path, 'rb') as f:
+        digest.update(f.read(BLOCK_SIZE))
+        if size > 2 * BLOCK_SIZE:
+            f.seek(-BLOCK_SIZE, os.SEEK_END)
+            digest.update(f.read(BLOCK_SIZE))
+    return digest.hexdigest()
+
+
+def full_hash(path):
+    digest = xxhash.xxh3_128() if xxhash else hashlib.blake2b(digest_size=32)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DedupeIndex:
+    """Persistent index of the files already sorted into the destination folders.
+
+    Only size and mtime are recorded up front. Hashes are computed lazily:
+    a file whose size matches nothing in the index is never read, the quick
+    hash is taken only on a size collision and the full hash only when the
+    quick hashes collide too. Hashes are stored, so each file is read at
+    most once for each stage.
+    """
+
+    def __init__(self, path=INDEX_FILE, readonly=False):
+        self.readonly = readonly
+        if readonly:
+            self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            return
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY, folder TEXT NOT NULL, size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL, quick_hash TEXT, full_hash TEXT);"
+            "CREATE INDEX IF NOT EXISTS files_size ON files (size);"
+            "CREATE INDEX IF NOT EXISTS files_folder ON files (folder);"
+            "CREATE TABLE IF NOT EXISTS folders ("
+            " path TEXT PRIMARY KEY, parent TEXT, mtime_ns INTEGER);"
+        )
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def add(self, path, st=None, quick=None, full=None):
+        if self.readonly:
+            return
+        st = st or os.stat(path)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO files (path, folder, size, mtime_ns, quick_hash, full_hash) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (path, os.path.dirname(path), st.st_size, st.st_mtime_ns, quick, full)
+        )
+
+    def remove(self, path):
+        if self.readonly:
+            return
+        self.conn.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def refresh(self, folders):
+        """Bring the index up to date with the given folder trees.
+
+        A folder is only listed again when its mtime changed, which is what
+        happens when entries are added, removed or renamed in it. Files whose
+        size and mtime are unchanged keep their stored hashes.
+        """
+        for folder in folders:
+            self._refresh_folder(folder, None)
+        self.conn.commit()
+
+    def _refresh_folder(self, folder, parent):
+        try:
+            mtime_ns = os.stat(folder).st_mtime_ns
+        except FileNotFoundError:
+            self._forget_folder(folder)
+            return
+
+        row = self.conn.execute("SELECT mtime_ns FROM folders WHERE path = ?", (folder,)).fetchone()
+        if row and row[0] == mtime_ns:
+            subfolders = [path for (path,) in self.conn.execute(
+                "SELECT path FROM folders WHERE parent = ?", (folder,))]
+        else:
+            known = {path: (size, mtime) for path, size, mtime in self.conn.execute(
+                "SELECT path, size, mtime_ns FROM files WHERE folder = ?", (folder,))}
+            seen = set()
+            subfolders = []
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.'):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        subfolders.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        st = entry.stat()
+                        seen.add(entry.path)
+                        if known.get(entry.path) != (st.st_size, st.st_mtime_ns):
+                            self.add(entry.path, st)
+            self.conn.executemany("DELETE FROM files WHERE path = ?",
+                                  [(path,) for path in known if path not in seen])
+            for (path,) in self.conn.execute("SELECT path FROM folders WHERE parent = ?", (folder,)).fetchall():
+                if path not in subfolders:
+                    self._forget_folder(path)
+            # Timestamps are coarse, so a folder changed within the last couple
+            # of seconds may change again without its mtime moving; list it next time
+            recorded = None if time.time_ns() - mtime_ns < 2_000_000_000 else mtime_ns
+            self.conn.execute("INSERT OR REPLACE INTO folders (path, parent, mtime_ns) VALUES (?, ?, ?)",
+                              (folder, parent, recorded))
+
+        for subfolder in subfolders:
+            self._refresh_folder(subfolder, folder)
+
+    def _forget_folder(self, folder):
+        prefix = folder.rstrip(os.sep) + os.sep
+        self.conn.execute("DELETE FROM files WHERE folder = ? OR folder LIKE ? ESCAPE '\\'",
+                          (folder, self._like_prefix(prefix)))
+        self.conn.execute("DELETE FROM folders WHERE path = ? OR path LIKE ? ESCAPE '\\'",
+                          (folder, self._like_prefix(prefix)))
+
+    @staticmethod
+    def _like_prefix(prefix):
+        return prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+    def find_duplicate(self, path, st=None):
+        """Return the path of an indexed file with the same content, or None.
+
+        Empty files are never duplicates: they all hash the same, but an
+        empty placeholder has nothing to do with another one.
+        """
+        st = st or os.stat(path)
+        if not st.st_size:
+            return None
+        candidates = self.conn.execute(
+            "SELECT path, mtime_ns, quick_hash, full_hash FROM files WHERE size = ? AND path != ?",
+            (st.st_size, path)
+        ).fetchall()
+        if not candidates:
+            return None
+
+        new_quick = quick_hash(path, st.st_size)
+        new_full = None
+        for candidate, mtime_ns, candidate_quick, candidate_full in candidates:
+            try:
+                candidate_st = os.stat(candidate)
+            except FileNotFoundError:
+                self.remove(candidate)
+                continue
+            if (candidate_st.st_size, candidate_st.st_mtime_ns) != (st.st_size, mtime_ns):
+                # Changed since it was indexed; its stored hashes are stale
+                candidate_quick = candidate_full = None
+                mtime_ns = candidate_st.st_mtime_ns
+                if candidate_st.st_size != st.st_size:
+                    self.add(candidate, candidate_st)
+                    continue
+            if candidate_quick is None:
+                candidate_quick = quick_hash(candidate, st.st_size)
+                self.add(candidate, candidate_st, quick=candidate_quick)
+            if candidate_quick != new_quick:
+                continue
+
+            if new_full is None:
+                new_full = full_hash(path)
+            if candidate_full is None:
+                candidate_full = full_hash(candidate)
+                self.add(candidate, candidate_st, quick=candidate_quick, full=candidate_full)
+            if candidate_full == new_full:
+                self.conn.commit()
+                return candidate
+        self.conn.commit()
+        return None
+
+
+class BatchIndex:
+    """Files planned earlier in the same run, checked the same staged way.
+
+    The persistent index only knows what is already sorted, so two copies
+    arriving together would both be moved. Nothing is read unless two
+    planned files have the same size.
+    """
+
+    def __init__(self):
+        self.by_size = {}
+        self._quick = {}
+        self._full = {}
+
+    def _quick_hash(self, path, size):
+        if path not in self._quick:
+            self._quick[path] = quick_hash(path, size)
+        return self._quick[path]
+
+    def _full_hash(self, path):
+        if path not in self._full:
+            self._full[path] = full_hash(path)
+        return self._full[path]
+
+    def add(self, path, st, target):
+        if not st.st_size:
+            return
+        self.by_size.setdefault(st.st_size, []).append((path, target))
+
+    def find_duplicate(self, path, st):
+        """Return the planned target of an earlier file with the same content, or None."""
+        for candidate, target in self.by_size.get(st.st_size, ()):
+            if self._quick_hash(candidate, st.st_size) != self._quick_hash(path, st.st_size):
+                continue
+            if self._full_hash(candidate) == self._full_hash(path):
+                return target
+        return None
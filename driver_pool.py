@@ -0,0 +1,96 @@
+import queue
+import threading
+import logging
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+
+class DriverPool:
+    """A bounded pool of headless Chrome drivers for bulk page loads."""
+
+    def __init__(self, size=4, headless=True):
+        self.size = max(1, size)
+        self.headless = headless
+        self._idle = queue.Queue()
+        self._drivers = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _new_driver(self):
+        options = Options()
+        if self.headless:
+            options.add_argument('--headless=new')
+        options.add_argument('--disable-gpu')
+        options.add_argument('--disable-extensions')
+        return webdriver.Chrome(options=options)
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        # Drivers are started lazily, only as many as the batch actually needs
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Driver pool is closed")
+            can_create = len(self._drivers) < self.size
+            if can_create:
+                self._drivers.append(None)
+
+        if not can_create:
+            return self._idle.get()
+
+        try:
+            driver = self._new_driver()
+        except Exception:
+            with self._lock:
+                self._drivers.remove(None)
+            raise
+        with self._lock:
+            self._drivers[self._drivers.index(None)] = driver
+        return driver
+
+    def release(self, driver, broken=False):
+        if broken or self._closed:
+            # A crashed session is thrown away so the next acquire starts a fresh one
+            with self._lock:
+                if driver in self._drivers:
+                    self._drivers.remove(driver)
+            try:
+                driver.quit()
+            except Exception as e:
+                logging.error(f"Error quitting pooled driver: {str(e)}")
+            return
+        self._idle.put(driver)
+
+    @contextmanager
+    def driver(self):
+        driver = self.acquire()
+        broken = False
+        try:
+            yield driver
+        except Exception:
+            broken = not self._is_alive(driver)
+            raise
+        finally:
+            self.release(driver, broken=broken)
+
+    def _is_alive(self, driver):
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            drivers = [d for d in self._drivers if d is not None]
+            self._drivers = []
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception as e:
+                logging.error(f"Error quitting pooled driver: {str(e)}")
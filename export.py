@@ -0,0 +1,126 @@
+import os
+import json
+import gzip
+import zlib
+import threading
+
+
+def _open_text(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+class JsonlWriter:
+    """Appends one scraped element per line, flushed as soon as it is written."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = _open_text(path, 'a')
+
+    def append(self, url, element):
+        line = json.dumps({'url': url, 'element': element}, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def _gzip_lines(path):
+    """Lines of a gzip file, including one whose writer never closed it.
+
+    gzip.open raises EOFError at the missing end-of-stream marker and drops
+    what its last read decoded, so the members are decompressed here; every
+    flushed line is returned and a corrupt tail ends the file.
+    """
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    pending = b''
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            while chunk:
+                try:
+                    pending += decompressor.decompress(chunk)
+                except zlib.error:
+                    chunk = None
+                    break
+                # Each append session of a JsonlWriter adds its own gzip member
+                chunk = decompressor.unused_data if decompressor.eof else b''
+                if decompressor.eof:
+                    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+            *lines, pending = pending.split(b'\n')
+            for line in lines:
+                yield line.decode('utf-8', errors='replace')
+            if chunk is None:
+                return
+    if pending:
+        yield pending.decode('utf-8', errors='replace')
+
+
+def write_jsonl(path, selected_elements):
+    # Written to a temp file first so a failed rewrite never loses the old export
+    tmp_path = path + '.tmp' + ('.gz' if path.endswith('.gz') else '')
+    with _open_text(tmp_path, 'w') as f:
+        for url, elements in selected_elements.items():
+            for element in elements:
+                f.write(json.dumps({'url': url, 'element': element}, ensure_ascii=False) + '\n')
+    os.replace(tmp_path, path)
+
+
+def iter_elements(path):
+    """Yield (url, element) pairs without reading the whole file into memory.
+
+    Plain .json files from older versions hold one dict and have to be read
+    in full, but are still yielded row by row.
+    """
+    if path.endswith('.json'):
+        with open(path, 'r') as f:
+            loaded_data = json.load(f)
+        for url, elements in loaded_data.items():
+            for element in elements:
+                yield url, element
+        return
+
+    if path.endswith('.gz'):
+        lines = _gzip_lines(path)
+    else:
+        lines = open(path, 'r', encoding='utf-8')
+    try:
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash mid-write can leave a partial last line behind
+                continue
+            yield record['url'], record['element']
+    finally:
+        lines.close()
+
+
+def export_columnar(path, selected_elements):
+    """Write a Parquet (or Arrow IPC for .arrow paths) file. Needs pyarrow."""
+    import pyarrow as pa
+
+    columns = {'url': [], 'tag': [], 'text': [], 'attributes': [], 'html': []}
+    for url, elements in selected_elements.items():
+        for element in elements:
+            columns['url'].append(url)
+            columns['tag'].append(element['tag'])
+            columns['text'].append(element['text'])
+            columns['attributes'].append(json.dumps(element['attributes'], ensure_ascii=False))
+            columns['html'].append(element['html'])
+    table = pa.table(columns)
+
+    if path.endswith('.arrow'):
+        import pyarrow.feather as feather
+        feather.write_feather(table, path)
+    else:
+        import pyarrow.parquet as pq
+        pq.write_table(table, path, compression='zstd')
+    return len(table)
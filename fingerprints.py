@@ -0,0 +1,140 @@
+import os
+import json
+import hashlib
+import threading
+import time
+import logging
+import urllib.request
+import urllib.error
+
+
+def text_fingerprint(text):
+    normalised = ' '.join(text.split())
+    return hashlib.sha256(normalised.encode('utf-8')).hexdigest()
+
+
+def check_validators(url, previous, timeout=10):
+    """HEAD the URL, conditionally when we already hold an ETag/Last-Modified.
+
+    Returns (not_modified, etag, last_modified). Any network error just means
+    we know nothing and the page gets fetched normally.
+    """
+    request = urllib.request.Request(url, method='HEAD')
+    if previous:
+        if previous.get('etag'):
+            request.add_header('If-None-Match', previous['etag'])
+        if previous.get('last_modified'):
+            request.add_header('If-Modified-Since', previous['last_modified'])
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return False, response.headers.get('ETag'), response.headers.get('Last-Modified')
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return True, previous.get('etag'), previous.get('last_modified')
+        return False, None, None
+    except Exception as e:
+        logging.info(f"No validators for {url}: {str(e)}")
+        return False, None, None
+
+
+class FingerprintStore:
+    """Per-URL fingerprints and the extraction they produced, kept in scraped_data.
+
+    save() also prunes: URLs not checked for `max_age` seconds are
+    forgotten, texts no URL refers to are deleted, and the rest are evicted
+    least recently used first while there are more than `max_texts` or they
+    take more than `max_bytes`.
+    """
+
+    def __init__(self, storage_path, max_age=30 * 24 * 3600, max_texts=2000, max_bytes=100 * 1024 * 1024):
+        self.max_age = max_age
+        self.max_texts = max_texts
+        self.max_bytes = max_bytes
+        self.path = os.path.join(storage_path, 'fingerprints.json')
+        self.texts_path = os.path.join(storage_path, 'texts')
+        os.makedirs(self.texts_path, exist_ok=True)
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, 'r') as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+
+    def get(self, url):
+        with self._lock:
+            return dict(self.entries[url]) if url in self.entries else None
+
+    def update(self, url, **fields):
+        with self._lock:
+            entry = self.entries.setdefault(url, {})
+            entry.update(fields)
+            entry['checked'] = time.time()
+
+    def save_text(self, text_hash, text):
+        # Texts are stored by their fingerprint, so identical pages share one file
+        path = os.path.join(self.texts_path, f"{text_hash}.txt")
+        if os.path.exists(path):
+            os.utime(path)
+            return
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def load_text(self, text_hash):
+        if not text_hash:
+            return None
+        path = os.path.join(self.texts_path, f"{text_hash}.txt")
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+        except FileNotFoundError:
+            return None
+        # The mtime is the last use, for the LRU eviction in prune()
+        os.utime(path)
+        return text
+
+    def prune(self):
+        """Forget stale URLs and evict texts; returns how many texts were deleted."""
+        now = time.time()
+        with self._lock:
+            if self.max_age:
+                for url in [url for url, entry in self.entries.items()
+                            if now - entry.get('checked', 0) > self.max_age]:
+                    del self.entries[url]
+            referenced = {entry.get('text_hash') for entry in self.entries.values()}
+
+        texts = []
+        deleted = 0
+        with os.scandir(self.texts_path) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.txt'):
+                    continue
+                if entry.name[:-4] not in referenced:
+                    os.remove(entry.path)
+                    deleted += 1
+                    continue
+                st = entry.stat()
+                texts.append((st.st_mtime, st.st_size, entry.path))
+
+        texts.sort()
+        remaining = len(texts)
+        total = sum(size for _, size, _ in texts)
+        for _, size, path in texts:
+            if remaining <= self.max_texts and total <= self.max_bytes:
+                break
+            os.remove(path)
+            deleted += 1
+            remaining -= 1
+            total -= size
+        return deleted
+
+    def save(self):
+        try:
+            self.prune()
+        except OSError as e:
+            logging.error(f"Failed to prune page texts: {str(e)}")
+        with self._lock:
+            data = json.dumps(self.entries)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
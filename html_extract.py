@@ -0,0 +1,190 @@
+import re
+import logging
+from html.parser import HTMLParser
+
+# Elements whose content is never useful page text
+BOILERPLATE_TAGS = ('script', 'style', 'noscript', 'template', 'svg', 'iframe',
+                    'nav', 'header', 'footer', 'aside')
+CODE_TAGS = ('pre', 'code')
+
+_whitespace = re.compile(r'\s+')
+
+
+def collapse_lines(pieces):
+    lines = []
+    for piece in pieces:
+        line = _whitespace.sub(' ', piece).strip()
+        if line:
+            lines.append(line)
+    return '\n'.join(lines)
+
+
+class LxmlBackend:
+    name = 'lxml'
+
+    def __init__(self):
+        import lxml.html
+        from lxml import etree
+        self._html = lxml.html
+        self._etree = etree
+
+    def _parse(self, html):
+        """The parsed tree, or None for input with no elements (empty, only comments)."""
+        try:
+            try:
+                return self._html.fromstring(html)
+            except ValueError:
+                # lxml rejects str input that carries an XML encoding declaration
+                return self._html.fromstring(html.encode('utf-8'))
+        except (self._etree.ParserError, ValueError):
+            return None
+
+    def extract_text(self, html):
+        tree = self._parse(html) if html.strip() else None
+        if tree is None:
+            return ''
+        self._etree.strip_elements(tree, self._etree.Comment, *BOILERPLATE_TAGS, with_tail=False)
+        return collapse_lines(tree.itertext())
+
+    def extract_code(self, html):
+        tree = self._parse(html) if html.strip() else None
+        if tree is None:
+            return []
+        return [(el.tag, el.text_content()) for el in tree.iter(*CODE_TAGS)]
+
+
+class SelectolaxBackend:
+    name = 'selectolax'
+
+    def __init__(self):
+        try:
+            from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+        except ImportError:
+            from selectolax.parser import HTMLParser as SelectolaxParser
+        self._parser = SelectolaxParser
+
+    def extract_text(self, html):
+        tree = self._parser(html)
+        tree.strip_tags(list(BOILERPLATE_TAGS))
+        if tree.root is None:
+            return ''
+        return collapse_lines(node.text(deep=False) for node in tree.root.traverse(include_text=True)
+                              if node.tag == '-text')
+
+    def extract_code(self, html):
+        tree = self._parser(html)
+        return [(node.tag, node.text(deep=True)) for node in tree.css(','.join(CODE_TAGS))]
+
+
+class BeautifulSoupBackend:
+    name = 'bs4'
+
+    def __init__(self):
+        from bs4 import BeautifulSoup
+        self._soup = BeautifulSoup
+
+    def extract_text(self, html):
+        soup = self._soup(html, 'html.parser')
+        for element in soup(list(BOILERPLATE_TAGS)):
+            element.decompose()
+        return collapse_lines(soup.stripped_strings)
+
+    def extract_code(self, html):
+        soup = self._soup(html, 'html.parser')
+        return [(block.name, block.get_text()) for block in soup.find_all(list(CODE_TAGS))]
+
+
+class _TextCollector(HTMLParser):
+    """Single pass over the token stream; never builds a tree."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.pieces = []
+        self.skip_depth = 0
+        self.code_blocks = []
+        self.open_code = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in BOILERPLATE_TAGS:
+            self.skip_depth += 1
+        elif tag in CODE_TAGS:
+            self.code_blocks.append([tag, []])
+            self.open_code.append(self.code_blocks[-1])
+
+    def handle_startendtag(self, tag, attrs):
+        pass
+
+    def handle_endtag(self, tag):
+        if tag in BOILERPLATE_TAGS:
+            if self.skip_depth:
+                self.skip_depth -= 1
+        elif tag in CODE_TAGS:
+            # Close the innermost matching block, tolerating sloppy nesting
+            for i in range(len(self.open_code) - 1, -1, -1):
+                if self.open_code[i][0] == tag:
+                    del self.open_code[i]
+                    break
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.pieces.append(data)
+        for block in self.open_code:
+            block[1].append(data)
+
+
+class StreamBackend:
+    name = 'stream'
+
+    def _collect(self, html):
+        collector = _TextCollector()
+        collector.feed(html)
+        collector.close()
+        return collector
+
+    def extract_text(self, html):
+        return collapse_lines(self._collect(html).pieces)
+
+    def extract_code(self, html):
+        return [(tag, ''.join(parts)) for tag, parts in self._collect(html).code_blocks]
+
+
+# Fastest first; BeautifulSoup is the fallback, the stdlib tokenizer the last resort
+BACKENDS = {
+    'selectolax': SelectolaxBackend,
+    'lxml': LxmlBackend,
+    'bs4': BeautifulSoupBackend,
+    'stream': StreamBackend,
+}
+
+
+def available_backends():
+    backends = []
+    for name, backend_class in BACKENDS.items():
+        try:
+            backends.append(backend_class())
+        except ImportError:
+            continue
+    return backends
+
+
+def get_backend(name=None):
+    """The named backend, or the fastest installed one.
+
+    An unknown or uninstalled name is logged and the fastest installed
+    backend is used instead, so a bad setting doesn't stop page processing.
+    """
+    if name:
+        if name not in BACKENDS:
+            logging.warning(f"Unknown HTML extraction backend {name!r}, expected one of {', '.join(BACKENDS)}")
+        else:
+            try:
+                return BACKENDS[name]()
+            except ImportError as e:
+                logging.warning(f"HTML extraction backend {name!r} is not available ({e})")
+    for name, backend_class in BACKENDS.items():
+        try:
+            backend = backend_class()
+            logging.info(f"Using {name} HTML extraction backend")
+            return backend
+        except ImportError:
+            continue
@@ -0,0 +1,141 @@
+import time
+import logging
+import threading
+from collections import deque
+
+# Bounded processing for recognised utterances in voice.py. A fixed number of
+# worker threads take inputs in arrival order; inputs still waiting when a
+# newer one arrives are merged into it or dropped, so a burst of speech
+# can't build an unbounded backlog of LLM calls.
+
+POLICIES = ('coalesce', 'drop', 'keep')
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    def __init__(self, seq, text, heard_at):
+        self.seq = seq
+        self.text = text
+        self.heard_at = heard_at
+        self.merged = 1
+        self.started_at = None
+        # Set by on_start, e.g. the TTS reply that keeps responses in order
+        self.reply = None
+
+
+class InputPipeline:
+    """Runs `process(job)` for each input on `workers` threads.
+
+    With policy 'coalesce' the waiting inputs are joined into the newest
+    one, with 'drop' only the newest is kept, and with 'keep' all of them
+    wait (oldest are dropped beyond `max_pending`). `on_start(job)` runs
+    under the pipeline lock as a worker takes a job, so anything it
+    enqueues is in arrival order. `on_change(pipeline)` is called whenever
+    the counters change. If `process` raises, `on_error(job, error)` is
+    called on the same worker, which then carries on with the next input;
+    should that raise too, the job's reply is finished here so the replies
+    behind it aren't held up.
+    """
+
+    def __init__(self, process, workers=2, policy='coalesce', max_pending=4, on_start=None, on_change=None,
+                 on_error=None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy {policy!r}, expected one of {POLICIES}")
+        self.process = process
+        self.workers = workers
+        self.policy = policy
+        self.max_pending = max_pending
+        self.on_start = on_start
+        self.on_change = on_change
+        self.on_error = on_error
+        self.pending = deque()
+        self.running = 0
+        self.submitted = self.completed = self.dropped = self.coalesced = self.failed = 0
+        self.last_wait = None
+        self.closed = False
+        self._seq = 0
+        self._condition = threading.Condition()
+        self._threads = [threading.Thread(target=self._work, name=f"input-{n}", daemon=True)
+                         for n in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, text, heard_at=None):
+        with self._condition:
+            self._seq += 1
+            self.submitted += 1
+            job = Job(self._seq, text, heard_at or time.monotonic())
+            if self.pending and self.policy == 'coalesce':
+                # Everything still waiting becomes one input, answered once
+                waiting = list(self.pending)
+                self.pending.clear()
+                job.text = ' '.join([old.text for old in waiting] + [text])
+                job.merged += sum(old.merged for old in waiting)
+                self.coalesced += len(waiting)
+            elif self.pending and self.policy == 'drop':
+                self.dropped += len(self.pending)
+                self.pending.clear()
+            self.pending.append(job)
+            while len(self.pending) > self.max_pending:
+                self.pending.popleft()
+                self.dropped += 1
+            self._condition.notify()
+        self._changed()
+        return job
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self.pending and not self.closed:
+                    self._condition.wait()
+                if self.closed:
+                    return
+                job = self.pending.popleft()
+                job.started_at = time.monotonic()
+                self.last_wait = job.started_at - job.heard_at
+                self.running += 1
+                if self.on_start:
+                    self.on_start(job)
+            self._changed()
+            try:
+                self.process(job)
+            except Exception as e:
+                with self._condition:
+                    self.failed += 1
+                self._failed(job, e)
+            finally:
+                with self._condition:
+                    self.running -= 1
+                    self.completed += 1
+                self._changed()
+
+    def _failed(self, job, error):
+        # Logged rather than printed: voice.py's live display owns the terminal
+        if not self.on_error:
+            logger.error("Input %d failed: %s", job.seq, error)
+            return
+        try:
+            self.on_error(job, error)
+        except Exception:
+            logger.exception("Error handler failed for input %d (%s)", job.seq, error)
+            if job.reply is not None:
+                job.reply.finish()
+
+    def _changed(self):
+        if self.on_change:
+            self.on_change(self)
+
+    def summary(self):
+        wait = f" | wait {self.last_wait:.1f}s" if self.last_wait is not None else ""
+        failed = f" | failed {self.failed}" if self.failed else ""
+        return (f"queued {len(self.pending)} | busy {self.running}/{self.workers} | "
+                f"done {self.completed} | merged {self.coalesced} | dropped {self.dropped}{failed}{wait}")
+
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self.pending.clear()
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=1)
@@ -0,0 +1,181 @@
+import re
+import math
+from collections import Counter
+
+# Shared command dispatch for main.py, speach.py and voice.py. Each front end
+# registers its handlers with keywords, regexes and example phrases; input that
+# no pattern matches goes to a small TF-IDF classifier over the examples, and
+# only then to the front end's fallback (usually the LLM).
+
+_word_pattern = re.compile(r"[a-z0-9']+")
+_named_group = re.compile(r'\(\?P<\w+>')
+
+# Left out of the classifier: function words, and verbs and time words that say
+# nothing about the domain ("clean up the code" is not about the downloads)
+STOPWORDS = frozenset("""
+    a an the and or but if of to in on at for from by with about into over up out off down
+    i me my mine you your it its this that these those there here we us our they them their
+    is are was were be been being am do does did doing done have has had can could will would
+    shall should may might must going gonna want wanna need please just really very so too also
+    what what's whats how how's who where when why which whether not no yes any some all
+    help make get give let tell show find put take go try use keep start stop
+    clean organize organise tidy sort arrange fix check
+    today tomorrow yesterday tonight now later day week morning evening outside good bad
+""".split())
+
+
+def tokenize(text):
+    return _word_pattern.findall(text.lower())
+
+
+def content_words(text):
+    """Tokens that carry meaning for the classifier."""
+    words = (word[:-2] if word.endswith("'s") else word for word in tokenize(text))
+    return [word for word in words if word not in STOPWORDS]
+
+
+class Intent:
+    def __init__(self, name, handler, keywords=(), patterns=(), examples=(), side_effects=False):
+        self.name = name
+        self.handler = handler
+        self.keywords = list(keywords)
+        self.examples = list(examples)
+        # Handlers that change something (move files, run commands) are never
+        # run on a classifier guess alone
+        self.side_effects = side_effects
+        self.vocabulary = {word for text in self.examples + self.keywords for word in content_words(text)}
+        # Patterns come first so their groups are filled when they match; keywords
+        # match anywhere in the input, like the `in` checks they replace
+        sources = list(patterns) + [re.escape(keyword) for keyword in self.keywords]
+        self.source = '|'.join(f'(?:{source})' for source in sources)
+        self.pattern = re.compile(self.source, re.IGNORECASE) if sources else None
+
+
+class RouteMatch:
+    """Which intent matched, how, and the regex match for pulling out arguments."""
+
+    def __init__(self, intent, how, match=None, score=1.0):
+        self.intent = intent
+        self.how = how
+        self.match = match
+        self.score = score
+
+    @property
+    def name(self):
+        return self.intent.name
+
+    def group(self, *args):
+        return self.match.group(*args) if self.match else None
+
+    def __repr__(self):
+        return f"RouteMatch({self.name!r}, how={self.how!r}, score={self.score:.2f})"
+
+
+class IntentRouter:
+    """Maps input text to a registered handler.
+
+    All patterns are compiled into one alternation, so input that matches no
+    pattern, the usual case for chat, is rejected in a single scan. When
+    something matches, the intents up to the one found are tried in
+    registration order, so the first registered wins, as in an if/elif chain.
+
+    Without a pattern match the classifier needs a similarity of at least
+    `threshold`, and at least `min_coverage` of the input's content words must
+    appear in the intent's examples or keywords.
+    """
+
+    def __init__(self, threshold=0.6, min_coverage=0.6):
+        self.intents = []
+        self.threshold = threshold
+        self.min_coverage = min_coverage
+        self._combined = None
+        self._compiled = False
+        self._vectors = None
+        self._idf = None
+
+    def register(self, name, handler, keywords=(), patterns=(), examples=(), side_effects=False):
+        self.intents.append(Intent(name, handler, keywords, patterns, examples, side_effects))
+        self._compiled = False
+        self._vectors = None
+        return handler
+
+    def intent(self, name, keywords=(), patterns=(), examples=(), side_effects=False):
+        """Decorator form of register()."""
+        def decorator(handler):
+            return self.register(name, handler, keywords, patterns, examples, side_effects)
+        return decorator
+
+    def _compile(self):
+        # Named groups of different intents could clash, so they are dropped
+        # here; the winning intent's own pattern is run again to extract them
+        alternatives = [
+            f'(?P<i{index}>{_named_group.sub("(?:", intent.source)})'
+            for index, intent in enumerate(self.intents) if intent.pattern
+        ]
+        self._combined = re.compile('|'.join(alternatives), re.IGNORECASE) if alternatives else None
+        self._compiled = True
+
+    def _train(self):
+        documents = [(intent, Counter(content_words(example)))
+                     for intent in self.intents for example in intent.examples]
+        document_frequency = Counter(word for _, counts in documents for word in counts)
+        total = len(documents)
+        self._idf = {word: math.log((1 + total) / (1 + count)) + 1 for word, count in document_frequency.items()}
+        self._vectors = [(intent, self._vector(counts)) for intent, counts in documents]
+
+    def _vector(self, counts):
+        vector = {word: count * self._idf[word] for word, count in counts.items() if word in self._idf}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return {word: weight / norm for word, weight in vector.items()} if norm else {}
+
+    def classify(self, text):
+        """Nearest example by TF-IDF cosine similarity, as (intent, score)."""
+        if self._vectors is None:
+            self._train()
+        query = self._vector(Counter(content_words(text)))
+        best, best_score = None, 0.0
+        for intent, vector in self._vectors:
+            score = sum(weight * vector.get(word, 0.0) for word, weight in query.items())
+            if score > best_score:
+                best, best_score = intent, score
+        return best, best_score
+
+    def match(self, text):
+        if not self._compiled:
+            self._compile()
+        found = self._combined.search(text) if self._combined else None
+        if found:
+            # The leftmost match can hide an earlier intent's match further
+            # on ("weather in https://..." is a URL), so the intents before it
+            # are tried in order
+            candidates = self.intents[:int(found.lastgroup[1:]) + 1]
+            for intent in candidates:
+                if intent.pattern:
+                    match = intent.pattern.search(text)
+                    if match:
+                        return RouteMatch(intent, 'pattern', match)
+
+        words = content_words(text)
+        intent, score = self.classify(text)
+        if not intent or score < self.threshold:
+            return None
+        coverage = sum(word in intent.vocabulary for word in words) / len(words)
+        if coverage < self.min_coverage:
+            return None
+        return RouteMatch(intent, 'classifier', score=score)
+
+    def dispatch(self, text, fallback=None, confirm=None):
+        """Run the handler for `text`, or `fallback(text)` when nothing matches.
+
+        A side-effecting intent found only by the classifier runs if
+        `confirm(route)` returns true; without `confirm` it goes to the fallback.
+        """
+        route = self.match(text)
+        if route and route.how == 'classifier' and route.intent.side_effects:
+            if not (confirm and confirm(route)):
+                route = None
+        if route:
+            return route.intent.handler(text, route)
+        if fallback:
+            return fallback(text)
+        return None
@@ -0,0 +1,102 @@
+import sqlite3
+import hashlib
+import json
+import threading
+import time
+import logging
+
+
+class LLMCache:
+    """On-disk LLM response cache backed by SQLite.
+
+    Entries are keyed by a hash of (model, prompt, max_tokens) and written as
+    soon as they are produced, so nothing is lost on a crash and lookups never
+    load the whole store. Old entries are evicted by TTL, then least recently
+    used first once the entry count or total size goes over the limits.
+    """
+
+    def __init__(self, path='llm_cache.db', max_entries=5000, max_bytes=50 * 1024 * 1024,
+                 ttl=30 * 24 * 3600, evict_every=100):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.evict_every = evict_every
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.evict()
+
+    @staticmethod
+    def make_key(model, prompt, max_tokens):
+        payload = json.dumps([model, max_tokens, prompt], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, model, prompt, max_tokens):
+        key = self.make_key(model, prompt, max_tokens)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            response, created = row
+            if self.ttl and now - created > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        return response
+
+    def put(self, model, prompt, max_tokens, response):
+        key = self.make_key(model, prompt, max_tokens)
+        now = time.time()
+        size = len(response.encode('utf-8'))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now)
+            )
+            self._puts += 1
+            due = self._puts % self.evict_every == 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        with self._lock:
+            if self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            if count <= self.max_entries and total <= self.max_bytes:
+                return
+
+            # Walk from least recently used until both limits are met again
+            evicted = []
+            for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+                if count <= self.max_entries and total <= self.max_bytes:
+                    break
+                evicted.append((key,))
+                count -= 1
+                total -= size
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        logging.info(f"Evicted {len(evicted)} LLM cache entries")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
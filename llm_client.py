@@ -0,0 +1,330 @@
+import os
+import json
+import time
+import queue
+import random
+import asyncio
+import concurrent.futures
+import hashlib
+import logging
+import threading
+from collections import deque
+from chunking import count_tokens
+
+# One client per process, shared by avscraper.py, main.py, voice.py and speach.py.
+# Calls run on a private asyncio loop thread; the sync helpers (complete,
+# stream) make it usable from plain threads and the Tk main loop.
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Allows `rate_per_minute` units per minute, bursting up to `capacity`."""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount=1):
+        if self.rate <= 0:
+            return
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def drain(self):
+        # After a 429 the server's view of our budget wins over ours
+        self.tokens = 0
+        self.updated = time.monotonic()
+
+
+class CallMetrics:
+    """Latency and token counts for the most recent calls."""
+
+    def __init__(self, keep=1000):
+        self.calls = deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    def record(self, model, latency, prompt_tokens=0, completion_tokens=0,
+               first_token=None, retries=0, coalesced=False, error=None):
+        with self._lock:
+            self.calls.append({
+                'model': model,
+                'latency': latency,
+                'first_token': first_token,
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'retries': retries,
+                'coalesced': coalesced,
+                'error': error,
+                'time': time.time(),
+            })
+
+    def summary(self):
+        with self._lock:
+            calls = list(self.calls)
+        if not calls:
+            return {'calls': 0}
+        latencies = sorted(call['latency'] for call in calls)
+        first_tokens = sorted(call['first_token'] for call in calls if call['first_token'] is not None)
+
+        def percentile(values, fraction):
+            return values[min(len(values) - 1, int(len(values) * fraction))] if values else None
+
+        return {
+            'calls': len(calls),
+            'errors': sum(1 for call in calls if call['error']),
+            'coalesced': sum(1 for call in calls if call['coalesced']),
+            'retries': sum(call['retries'] for call in calls),
+            'latency_p50': percentile(latencies, 0.5),
+            'latency_p95': percentile(latencies, 0.95),
+            'first_token_p50': percentile(first_tokens, 0.5),
+            'prompt_tokens': sum(call['prompt_tokens'] for call in calls),
+            'completion_tokens': sum(call['completion_tokens'] for call in calls),
+        }
+
+
+class LLMClient:
+    def __init__(self, api_key=None, base_url=None, requests_per_minute=None, tokens_per_minute=None,
+                 max_concurrency=8, timeout=60.0, max_retries=5, call_timeout=None):
+        self.api_key = api_key or os.getenv('GROQ_API_KEY')
+        # GROQ_BASE_URL can point every front end at mock_llm_server.py
+        self.base_url = base_url or os.getenv('GROQ_BASE_URL')
+        self.requests_per_minute = requests_per_minute or int(os.getenv('GROQ_RPM', 30))
+        self.tokens_per_minute = tokens_per_minute or int(os.getenv('GROQ_TPM', 15000))
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        # Upper bound for a blocking complete() or for each wait in stream(), retries
+        # and rate limiting included, so a stuck call can't block its thread forever
+        self.call_timeout = call_timeout or timeout * (max_retries + 1)
+        self.closed = False
+        self.metrics = CallMetrics()
+
+        self._client = None
+        self._in_flight = {}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="llm-client", daemon=True)
+        self._thread.start()
+        self._request_bucket = None
+        self._token_bucket = None
+        self._semaphore = None
+
+    def _setup(self):
+        # Called on the loop thread, so the asyncio primitives belong to that loop
+        if self._client is None:
+            import httpx
+            from groq import AsyncGroq
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_concurrency * 2,
+                                    max_keepalive_connections=self.max_concurrency),
+                timeout=self.timeout,
+            )
+            self._client = AsyncGroq(api_key=self.api_key, base_url=self.base_url,
+                                     http_client=http_client, max_retries=0, timeout=self.timeout)
+            self._request_bucket = TokenBucket(self.requests_per_minute)
+            self._token_bucket = TokenBucket(self.tokens_per_minute)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    @staticmethod
+    def _estimate_tokens(messages, max_tokens):
+        return sum(count_tokens(message.get('content') or '') for message in messages) + (max_tokens or 0)
+
+    @staticmethod
+    def _request_key(model, messages, kwargs):
+        payload = json.dumps([model, messages, kwargs], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _retry_delay(self, error, attempt):
+        response = getattr(error, 'response', None)
+        if response is not None:
+            try:
+                return float(response.headers.get('retry-after'))
+            except (TypeError, ValueError):
+                pass
+        return min(30.0, 2 ** attempt) * (0.5 + random.random() / 2)
+
+    def _is_retryable(self, error):
+        from groq import APIConnectionError, APIStatusError
+        if isinstance(error, APIConnectionError):
+            return True
+        return isinstance(error, APIStatusError) and error.status_code in RETRYABLE_STATUS
+
+    async def _with_retries(self, model, messages, max_tokens, call):
+        client = self._setup()
+        attempt = 0
+        while True:
+            await self._request_bucket.acquire()
+            await self._token_bucket.acquire(self._estimate_tokens(messages, max_tokens))
+            try:
+                async with self._semaphore:
+                    return await call(client), attempt
+            except Exception as e:
+                if attempt >= self.max_retries or not self._is_retryable(e):
+                    raise
+                if getattr(e, 'status_code', None) == 429:
+                    self._request_bucket.drain()
+                delay = self._retry_delay(e, attempt)
+                logging.info(f"LLM call to {model} failed ({e}), retrying in {delay:.1f}s")
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    async def acomplete(self, messages, model, max_tokens=1024, **kwargs):
+        """Return the full reply text. Identical concurrent requests share one call."""
+        key = self._request_key(model, messages, dict(kwargs, max_tokens=max_tokens))
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            start = time.perf_counter()
+            result = await asyncio.shield(pending)
+            self.metrics.record(model, time.perf_counter() - start, coalesced=True)
+            return result
+
+        pending = self._loop.create_future()
+        self._in_flight[key] = pending
+        start = time.perf_counter()
+        try:
+            response, retries = await self._with_retries(
+                model, messages, max_tokens,
+                lambda client: client.chat.completions.create(
+                    model=model, messages=messages, max_tokens=max_tokens, **kwargs
+                ),
+            )
+            result = response.choices[0].message.content
+            usage = getattr(response, 'usage', None)
+            self.metrics.record(model, time.perf_counter() - start,
+                                prompt_tokens=getattr(usage, 'prompt_tokens', 0) or 0,
+                                completion_tokens=getattr(usage, 'completion_tokens', 0) or 0,
+                                retries=retries)
+            pending.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except Exception as e:
+            self.metrics.record(model, time.perf_counter() - start, error=str(e))
+            pending.set_exception(e)
+            # Retrieve it here so a request nobody else waited on doesn't warn
+            pending.exception()
+            raise
+        finally:
+            del self._in_flight[key]
+
+    async def astream(self, messages, model, max_tokens=1024, **kwargs):
+        """Yield reply text as it arrives. Retries only happen before the first token."""
+        start = time.perf_counter()
+        first_token = None
+        completion_tokens = 0
+        usage = None
+        stream, retries = await self._with_retries(
+            model, messages, max_tokens,
+            lambda client: client.chat.completions.create(
+                model=model, messages=messages, max_tokens=max_tokens, stream=True, **kwargs
+            ),
+        )
+        try:
+            async for chunk in stream:
+                x_groq = getattr(chunk, 'x_groq', None)
+                if x_groq is not None and getattr(x_groq, 'usage', None) is not None:
+                    usage = x_groq.usage
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if text:
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                    completion_tokens += 1
+                    yield text
+        finally:
+            self.metrics.record(model, time.perf_counter() - start,
+                                prompt_tokens=getattr(usage, 'prompt_tokens', 0) or 0,
+                                completion_tokens=getattr(usage, 'completion_tokens', 0) or completion_tokens,
+                                first_token=first_token, retries=retries)
+
+    def _check_open(self):
+        if self.closed:
+            raise RuntimeError("LLM client is closed")
+
+    def complete(self, messages, model, max_tokens=1024, timeout=None, **kwargs):
+        self._check_open()
+        future = asyncio.run_coroutine_threadsafe(
+            self.acomplete(messages, model, max_tokens=max_tokens, **kwargs), self._loop
+        )
+        try:
+            return future.result(timeout or self.call_timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"LLM call to {model} took longer than {timeout or self.call_timeout:g}s")
+
+    def stream(self, messages, model, max_tokens=1024, **kwargs):
+        """Blocking generator over astream for use from ordinary threads."""
+        self._check_open()
+        chunks = queue.Queue()
+
+        async def pump():
+            try:
+                async for text in self.astream(messages, model, max_tokens=max_tokens, **kwargs):
+                    chunks.put(('text', text))
+            except BaseException as e:
+                chunks.put(('error', e))
+            else:
+                chunks.put(('end', None))
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self._loop)
+        try:
+            while True:
+                try:
+                    kind, value = chunks.get(timeout=self.call_timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"LLM stream from {model} stalled for {self.call_timeout:g}s")
+                if kind == 'text':
+                    yield value
+                elif kind == 'error':
+                    if not isinstance(value, asyncio.CancelledError):
+                        raise value
+                    return
+                else:
+                    return
+        finally:
+            # Stop generating if the caller stopped reading (barge-in, window closed)
+            future.cancel()
+
+    def close(self):
+        self.closed = True
+        # get_client() hands out a fresh client from now on
+        with _shared_lock:
+            for key, client in list(_shared_clients.items()):
+                if client is self:
+                    del _shared_clients[key]
+
+        async def shutdown():
+            if self._client is not None:
+                await self._client.close()
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(5)
+        except Exception as e:
+            logging.error(f"Error closing LLM client: {str(e)}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+_shared_clients = {}
+_shared_lock = threading.Lock()
+
+
+def get_client(api_key=None, **kwargs):
+    """Return the process-wide client for this API key, creating it on first use."""
+    api_key = api_key or os.getenv('GROQ_API_KEY')
+    with _shared_lock:
+        if api_key not in _shared_clients:
+            _shared_clients[api_key] = LLMClient(api_key=api_key, **kwargs)
+        return _shared_clients[api_key]
@@ -1,15 +1,14 @@
 import os
+import sys
+import time
 import subprocess
-import requests
 from dotenv import load_dotenv
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from groq import Groq
-import sorter
-import re
- 
+from chunking import count_tokens
+from intent_router import IntentRouter
+
+# requests, sorter and the Groq client are imported when their command first
+# runs, so the prompt comes up without waiting for them; check_startup.py
+# measures the time to first prompt.
 
 # Load environment variables from .env file
 load_dotenv()
@@ -17,8 +16,26 @@ load_dotenv()
 # Get the API key from environment variables
 api_key = os.getenv('GROQ_API_KEY')
 
-# Initialize Groq client with the API key
-client = Groq(api_key=api_key)
+client = None
+
+# Shared Groq client with the API key (rate limiting, retries, metrics)
+def get_ai_client():
+    global client
+    if client is None:
+        from llm_client import get_client
+        client = get_client(api_key=api_key)
+    return client
+
+conversation = None
+
+# History sent with each AI request, summarised past the token budget and
+# saved between runs (ASSISTANT_SESSION picks the session)
+def get_conversation():
+    global conversation
+    if conversation is None:
+        from conversation import Conversation, llm_summariser
+        conversation = Conversation(os.getenv('ASSISTANT_SESSION', 'cli'), summarise=llm_summariser(get_ai_client()))
+    return conversation
 
 # Example function to execute terminal commands
 def execute_terminal_command(command):
@@ -28,17 +45,24 @@ def execute_terminal_command(command):
     except Exception as e:
         return f"Error executing command: {str(e)}"
 
-# Example function to interact with the weather API
+weather_tool = None
+
+# Example function to interact with the weather API; answers are cached per
+# location and refreshed in the background once they get old
 def get_weather(api_key, location):
-    url = f"https://api.openweathermap.org/data/2.5/weather?q={location}&appid={api_key}"
-    response = requests.get(url)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        return f"Error fetching weather: {response.status_code}"
+    global weather_tool
+    if weather_tool is None:
+        from api_tools import WeatherTool
+        weather_tool = WeatherTool(api_key)
+    try:
+        return weather_tool.current(location)
+    except Exception as e:
+        status = getattr(getattr(e, 'response', None), 'status_code', None)
+        return f"Error fetching weather: {status or e}"
 
 
 def sort_files():
+    import sorter
     other_files = sorter.scan_and_organize_downloads()
     print(f"sorted files in downloads folder")
 
@@ -48,62 +72,98 @@ def sort_files():
 
 
 # URL detection regex pattern
-url_pattern = re.compile(r'https?://(?:www\.)?[-a-zA-Z0-9@:%._\+~#=]{1,256}\.[a-zA-Z0-9()]{1,6}\b(?:[-a-zA-Z0-9()@:%_\+.~#?&//=]*)')
-
-# AI function to generate a response
-def ai_generate_response(message):
-    completion = client.chat.completions.create(
-        model="llama-3.2-90b-text-preview",
-        messages=[
-            {
-                "role": "user",
-                "content": message
-            }
-        ],
+URL_PATTERN = r'https?://(?:www\.)?[-a-zA-Z0-9@:%._\+~#=]{1,256}\.[a-zA-Z0-9()]{1,6}\b(?:[-a-zA-Z0-9()@:%_\+.~#?&//=]*)'
+
+# Time-to-first-token and throughput of each AI reply
+reply_stats = []
+
+# AI function to generate a response; tokens are written to `out` as they arrive
+def ai_generate_response(message, out=sys.stdout):
+    start = time.perf_counter()
+    completion = get_ai_client().stream(
+        get_conversation().messages(message),
+        "llama-3.2-90b-text-preview",
         temperature=1,
         max_tokens=1024,
         top_p=1,
-        stream=True,
         stop=None,
     )
 
-    response = ""
-    for chunk in completion:
-        response += chunk.choices[0].delta.content or ""
+    parts = []
+    first_token_at = None
+    for text in completion:
+        if first_token_at is None:
+            first_token_at = time.perf_counter()
+        parts.append(text)
+        if out is not None:
+            out.write(text)
+            out.flush()
+    end = time.perf_counter()
+
+    response = "".join(parts)
+    get_conversation().record(message, response)
+    tokens = count_tokens(response)
+    generation_time = end - first_token_at if first_token_at else 0
+    reply_stats.append({
+        "time_to_first_token": first_token_at - start if first_token_at else None,
+        "total_time": end - start,
+        "tokens": tokens,
+        "tokens_per_sec": tokens / generation_time if generation_time > 0 else None,
+    })
     return response
 
+def show_ai_response(user_input):
+    print("AI response: ", end="", flush=True)
+    ai_generate_response(user_input)
+    stats = reply_stats[-1]
+    if stats["time_to_first_token"] is not None:
+        rate = f", {stats['tokens_per_sec']:.1f} tokens/sec" if stats["tokens_per_sec"] else ""
+        print(f"\n[first token {stats['time_to_first_token']:.2f}s{rate}]")
+    else:
+        print()
+
+# Commands are matched in registration order; anything else goes to the AI
+router = IntentRouter()
+
+@router.intent("url", patterns=[URL_PATTERN])
+def handle_url(user_input, route):
+    print(f"Detected URL: {route.group()}")
+
+@router.intent("weather", keywords=["weather"], patterns=[r"weather\b.*?\b(?:in|for|at) (?P<location>[^?!.]+)"],
+               examples=["what's the temperature outside", "is it going to rain today", "forecast for tomorrow"])
+def handle_weather(user_input, route):
+    # "weather in Paris"; otherwise the configured home location
+    location = (route.group("location") or os.getenv('WEATHER_LOCATION', "London")).strip()
+    weather_data = get_weather(os.getenv('WEATHER_API_KEY'), location)
+    print(f"Weather in {location}: {weather_data}")
+
+@router.intent("run command", keywords=["run command"], side_effects=True)
+def handle_run_command(user_input, route):
+    command = "ls"  # Example command
+    terminal_output = execute_terminal_command(command)
+    print(f"Command output: {terminal_output}")
+
+@router.intent("sort", keywords=["sort"], side_effects=True,
+               examples=["organize my downloads", "clean up the downloads folder", "tidy my downloads"])
+def handle_sort(user_input, route):
+    sort_files()
+
+# Asked before a command that changes something is run on a guessed intent
+def confirm_command(route):
+    answer = input(f"Did you mean '{route.name}'? This will run it. [y/N] ")
+    return answer.strip().lower() in ("y", "yes")
+
 # Main function that interprets user input and executes the corresponding command
 def main():
     while True:
         user_input = input("Enter your command: ")
 
         if user_input.lower() == "exit":
+            if conversation:
+                conversation.close()
             break
 
-        if url_pattern.search(user_input):
-            url = url_pattern.search(user_input).group()
-            print(f"Detected URL: {url}")
- 
-
-        elif "weather" in user_input:
-            location = "London"  # You can dynamically fetch location
-            weather_data = get_weather(os.getenv('WEATHER_API_KEY'), location)
-            print(f"Weather in {location}: {weather_data}")
-
-        elif "run command" in user_input:
-            command = "ls"  # Example command
-            terminal_output = execute_terminal_command(command)
-            print(f"Command output: {terminal_output}")
-
-            
-        elif "sort" in user_input:
-            sort_files()
-        
-
-
-        else:
-            response = ai_generate_response(user_input)
-            print(f"AI response: {response}")
+        router.dispatch(user_input, fallback=show_ai_response, confirm=confirm_command)
 
 # Run the main function
 if __name__ == "__main__":
@@ -0,0 +1,133 @@
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A local stand-in for the Groq chat completions endpoint. Point the
+# assistants at it with GROQ_BASE_URL=http://127.0.0.1:8765 to benchmark
+# or exercise them without network access or API quota.
+
+
+class MockCompletionHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency = 0.2
+    token_delay = 0.01
+    error_rate = 0.0
+    requests_served = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.endswith('/chat/completions'):
+            self.send_error(404)
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        type(self).requests_served += 1
+
+        if self.error_rate and random.random() < self.error_rate:
+            payload = json.dumps({'error': {'message': 'Rate limit reached', 'type': 'rate_limit'}}).encode()
+            self.send_response(429)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.send_header('Retry-After', '0.1')
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        time.sleep(self.latency)
+        messages = body.get('messages') or [{}]
+        prompt = messages[-1].get('content') or ''
+        words = f"Mock reply to: {prompt[:200]}".split(' ')
+        words = words[:body.get('max_tokens') or len(words)]
+        prompt_tokens = sum(len((m.get('content') or '').split()) for m in messages)
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': len(words),
+                 'total_tokens': prompt_tokens + len(words)}
+        model = body.get('model', 'mock')
+
+        if body.get('stream'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for i, word in enumerate(words):
+                time.sleep(self.token_delay)
+                self._send_event(self._chunk(model, {'content': word + (' ' if i < len(words) - 1 else '')}))
+            final = self._chunk(model, {}, finish_reason='stop')
+            final['x_groq'] = {'id': 'mock', 'usage': usage}
+            self._send_event(final)
+            self._send_chunk(b'data: [DONE]\n\n')
+            self._send_chunk(b'')
+            return
+
+        payload = json.dumps({
+            'id': 'chatcmpl-mock',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': ' '.join(words)},
+                'finish_reason': 'stop',
+            }],
+            'usage': usage,
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _chunk(self, model, delta, finish_reason=None):
+        return {
+            'id': 'chatcmpl-mock',
+            'object': 'chat.completion.chunk',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+        }
+
+    def _send_event(self, data):
+        self._send_chunk(f"data: {json.dumps(data)}\n\n".encode())
+
+    def _send_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+def start_mock_server(port=0, latency=0.2, token_delay=0.01, error_rate=0.0):
+    """Start the server on a background thread and return (server, base_url)."""
+    handler = type('ConfiguredHandler', (MockCompletionHandler,), {
+        'latency': latency,
+        'token_delay': token_delay,
+        'error_rate': error_rate,
+        'requests_served': 0,
+    })
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the Groq chat completions API")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.2, help="seconds before the first byte")
+    parser.add_argument('--token-delay', type=float, default=0.01, help="seconds between streamed tokens")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with 429")
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(args.port, args.latency, args.token_delay, args.error_rate)
+    print(f"Mock LLM server listening on {base_url} (set GROQ_BASE_URL={base_url})")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+import os
+import json
+import importlib.util
+import threading
+from audio_capture import to_pcm16, resample
+
+# Speech-to-text backends for voice.py and speach.py. Local models (Vosk,
+# faster-whisper) answer without a network round trip; Google stays as the
+# fallback. Choose with SPEECH_BACKENDS, e.g. "vosk,google" (default "auto":
+# whichever local backend is installed, then Google). Audio is anything with
+# frame_data, sample_rate and sample_width: an audio_capture.Utterance or a
+# speech_recognition.AudioData.
+
+
+class RecognitionError(Exception):
+    """The backend could not produce a transcript (network, missing model, ...)."""
+
+
+class NoSpeechError(RecognitionError):
+    """The backend ran but heard no words."""
+
+
+class Recognizer:
+    name = 'base'
+    streaming = False
+
+    def load(self):
+        """Load the model. Called once; the instance then stays warm."""
+
+    def transcribe(self, audio):
+        raise NotImplementedError
+
+    def warm(self):
+        """Load the model and run it once, so the first real utterance isn't slow."""
+        self.load()
+        try:
+            self.transcribe(_Audio(bytes(3200), 16000, 2))
+        except RecognitionError:
+            pass
+
+    def stream(self, sample_rate, sample_width=2):
+        """A session that takes frames as they are captured and returns partial text."""
+        return BufferedSession(self, sample_rate, sample_width)
+
+
+class _Audio:
+    def __init__(self, frame_data, sample_rate, sample_width):
+        self.frame_data = frame_data
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+
+
+class BufferedSession:
+    """Stand-in stream for backends without partial results: transcribes at the end."""
+
+    def __init__(self, recognizer, sample_rate, sample_width):
+        self.recognizer = recognizer
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.frames = []
+
+    def accept(self, frame):
+        self.frames.append(frame)
+        return None
+
+    def finish(self):
+        return self.recognizer.transcribe(_Audio(b''.join(self.frames), self.sample_rate, self.sample_width))
+
+
+def pcm16(audio, rate=None):
+    """The audio as 16-bit mono PCM, resampled to `rate` if given."""
+    data = audio.frame_data
+    if audio.sample_width != 2:
+        data = to_pcm16(data, audio.sample_width)
+    if rate and audio.sample_rate != rate:
+        data = resample(data, audio.sample_rate, rate)
+    return data
+
+
+class VoskRecognizer(Recognizer):
+    name = 'vosk'
+    streaming = True
+
+    def __init__(self, model_path=None):
+        self.model_path = model_path or os.getenv('VOSK_MODEL', os.path.expanduser('~/.cache/vosk/model'))
+        self.model = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            if self.model is None:
+                try:
+                    import vosk
+                except ImportError as e:
+                    raise RecognitionError("vosk is not installed") from e
+                if not os.path.isdir(self.model_path):
+                    raise RecognitionError(f"No Vosk model at {self.model_path}")
+                vosk.SetLogLevel(-1)
+                self.model = vosk.Model(self.model_path)
+        return self.model
+
+    def _recognizer(self, sample_rate):
+        model = self.load()
+        import vosk
+        return vosk.KaldiRecognizer(model, sample_rate)
+
+    def transcribe(self, audio):
+        recognizer = self._recognizer(audio.sample_rate)
+        recognizer.AcceptWaveform(pcm16(audio))
+        text = json.loads(recognizer.FinalResult()).get('text', '')
+        if not text:
+            raise NoSpeechError()
+        return text
+
+    def stream(self, sample_rate, sample_width=2):
+        return VoskSession(self._recognizer(sample_rate), sample_width)
+
+
+class VoskSession:
+    def __init__(self, recognizer, sample_width):
+        self.recognizer = recognizer
+        self.sample_width = sample_width
+        self.text = []
+
+    def accept(self, frame):
+        if self.sample_width != 2:
+            frame = to_pcm16(frame, self.sample_width)
+        if self.recognizer.AcceptWaveform(frame):
+            # Vosk finalises at its own pauses inside one utterance
+            self.text.append(json.loads(self.recognizer.Result()).get('text', ''))
+            return ' '.join(self.text)
+        partial = json.loads(self.recognizer.PartialResult()).get('partial', '')
+        return ' '.join(self.text + [partial]).strip()
+
+    def finish(self):
+        self.text.append(json.loads(self.recognizer.FinalResult()).get('text', ''))
+        text = ' '.join(part for part in self.text if part)
+        if not text:
+            raise NoSpeechError()
+        return text
+
+
+class WhisperRecognizer(Recognizer):
+    name = 'whisper'
+
+    def __init__(self, model_size=None, device='cpu', compute_type='int8'):
+        self.model_size = model_size or os.getenv('WHISPER_MODEL', 'base.en')
+        self.device = device
+        self.compute_type = compute_type
+        self.model = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            if self.model is None:
+                try:
+                    from faster_whisper import WhisperModel
+                except ImportError as e:
+                    raise RecognitionError("faster-whisper is not installed") from e
+                self.model = WhisperModel(self.model_size, device=self.device, compute_type=self.compute_type)
+        return self.model
+
+    def transcribe(self, audio):
+        model = self.load()
+        import numpy
+        samples = numpy.frombuffer(pcm16(audio, 16000), dtype=numpy.int16).astype(numpy.float32) / 32768
+        # Greedy decoding; the VAD has already trimmed the silence
+        segments, _ = model.transcribe(samples, beam_size=1, language='en', vad_filter=False)
+        text = ' '.join(segment.text.strip() for segment in segments).strip()
+        if not text:
+            raise NoSpeechError()
+        return text
+
+
+class GoogleRecognizer(Recognizer):
+    name = 'google'
+
+    def __init__(self):
+        self.recognizer = None
+
+    def load(self):
+        if self.recognizer is None:
+            try:
+                import speech_recognition as sr
+            except ImportError as e:
+                raise RecognitionError("SpeechRecognition is not installed") from e
+            self.recognizer = sr.Recognizer()
+        return self.recognizer
+
+    def warm(self):
+        # Nothing to load, and a warm-up request would only cost a round trip
+        self.load()
+
+    def transcribe(self, audio):
+        recognizer = self.load()
+        import speech_recognition as sr
+        try:
+            return recognizer.recognize_google(sr.AudioData(audio.frame_data, audio.sample_rate, audio.sample_width))
+        except sr.UnknownValueError as e:
+            raise NoSpeechError() from e
+        except sr.RequestError as e:
+            raise RecognitionError(str(e)) from e
+
+
+class FallbackRecognizer(Recognizer):
+    """Tries each backend in turn until one produces a transcript.
+
+    A backend that heard nothing is believed (NoSpeechError is raised at
+    once); one that failed, e.g. a missing model or no network, is skipped.
+    """
+
+    def __init__(self, backends):
+        self.backends = list(backends)
+        self.name = '+'.join(backend.name for backend in self.backends)
+        self.streaming = bool(self.backends) and self.backends[0].streaming
+
+    def warm(self):
+        for backend in self.backends:
+            try:
+                backend.warm()
+                return
+            except RecognitionError:
+                continue
+
+    def transcribe(self, audio):
+        errors = []
+        for backend in self.backends:
+            try:
+                return backend.transcribe(audio)
+            except NoSpeechError:
+                raise
+            except RecognitionError as e:
+                errors.append(f"{backend.name}: {e}")
+        raise RecognitionError('; '.join(errors) or "no speech backends configured")
+
+    def stream(self, sample_rate, sample_width=2):
+        # Stream from the first usable backend if it gives partials; otherwise
+        # buffer and let the whole chain transcribe at the end
+        for backend in self.backends:
+            try:
+                backend.load()
+            except RecognitionError:
+                continue
+            if backend.streaming:
+                return backend.stream(sample_rate, sample_width)
+            break
+        return BufferedSession(self, sample_rate, sample_width)
+
+
+BACKENDS = {
+    'vosk': VoskRecognizer,
+    'whisper': WhisperRecognizer,
+    'google': GoogleRecognizer,
+}
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_backend(name):
+    """The shared, loaded-once instance of a backend."""
+    with _instances_lock:
+        if name not in _instances:
+            _instances[name] = BACKENDS[name]()
+        return _instances[name]
+
+
+def local_backend_available(name):
+    # Checked without loading, which can take seconds (or a download for whisper)
+    if name == 'vosk':
+        return importlib.util.find_spec('vosk') is not None and os.path.isdir(get_backend('vosk').model_path)
+    return importlib.util.find_spec('faster_whisper') is not None
+
+
+def make_recognizer(spec=None):
+    """Recognizer for a spec like "vosk,google"; "auto" picks a local backend plus Google."""
+    spec = spec or os.getenv('SPEECH_BACKENDS', 'auto')
+    if spec == 'auto':
+        names = [name for name in ('vosk', 'whisper') if local_backend_available(name)][:1] + ['google']
+    else:
+        names = [name.strip() for name in spec.split(',') if name.strip()]
+    return FallbackRecognizer([get_backend(name) for name in names])
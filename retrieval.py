@@ -0,0 +1,105 @@
+import re
+import math
+import threading
+from collections import Counter, defaultdict
+from chunking import chunk_text
+
+_token = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return _token.findall(text.lower())
+
+
+class BM25Index:
+    """Okapi BM25 over passage-sized chunks of each page's extracted text."""
+
+    def __init__(self, passage_tokens=300, overlap_tokens=50, k1=1.5, b=0.75):
+        self.passage_tokens = passage_tokens
+        self.overlap_tokens = overlap_tokens
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._passages = {}
+        self._by_document = defaultdict(list)
+        self._postings = defaultdict(set)
+        self._total_length = 0
+        self._next_id = 0
+
+    def set_document(self, doc_id, text):
+        passages = chunk_text(text, self.passage_tokens, self.overlap_tokens)
+        with self._lock:
+            self._remove(doc_id)
+            for passage in passages:
+                terms = Counter(tokenize(passage))
+                if not terms:
+                    continue
+                passage_id = self._next_id
+                self._next_id += 1
+                length = sum(terms.values())
+                self._passages[passage_id] = (doc_id, passage, terms, length)
+                self._by_document[doc_id].append(passage_id)
+                self._total_length += length
+                for term in terms:
+                    self._postings[term].add(passage_id)
+
+    def remove_document(self, doc_id):
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        for passage_id in self._by_document.pop(doc_id, []):
+            _, _, terms, length = self._passages.pop(passage_id)
+            self._total_length -= length
+            for term in terms:
+                postings = self._postings[term]
+                postings.discard(passage_id)
+                if not postings:
+                    del self._postings[term]
+
+    def clear(self):
+        with self._lock:
+            self._passages.clear()
+            self._by_document.clear()
+            self._postings.clear()
+            self._total_length = 0
+
+    def __len__(self):
+        return len(self._passages)
+
+    def search(self, query, k=5):
+        """Return up to k (doc_id, passage, score) tuples, best first."""
+        with self._lock:
+            count = len(self._passages)
+            if not count:
+                return []
+            average_length = self._total_length / count
+            scores = defaultdict(float)
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for passage_id in postings:
+                    _, _, terms, length = self._passages[passage_id]
+                    tf = terms[term]
+                    norm = self.k1 * (1 - self.b + self.b * length / average_length)
+                    scores[passage_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+            best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            return [(self._passages[pid][0], self._passages[pid][1], score) for pid, score in best]
+
+    def leading(self, k=5):
+        """The first passages of each page, round robin, as (doc_id, passage, 0.0) tuples.
+
+        For queries that share no term with the index ("summarize this
+        page"), so the prompt still gets k passages of context.
+        """
+        with self._lock:
+            documents = [list(passage_ids) for passage_ids in self._by_document.values()]
+            picked = []
+            for position in range(max(map(len, documents), default=0)):
+                for passage_ids in documents:
+                    if position < len(passage_ids) and len(picked) < k:
+                        picked.append(passage_ids[position])
+            return [(self._passages[pid][0], self._passages[pid][1], 0.0) for pid in picked]
@@ -0,0 +1,240 @@
+import os
+import json
+import errno
+import time
+import shutil
+
+JOURNAL_FILE = os.path.expanduser("~/.sorter_journal.jsonl")
+# Finished runs, newest last by name, so the last few can still be rolled back
+JOURNAL_HISTORY = os.path.expanduser("~/.sorter_journals")
+KEEP_JOURNALS = 10
+
+
+class Journal:
+    """Write-ahead record of a sorter run.
+
+    Every step is written as 'pending' before it touches the disk and as
+    'done' or 'failed' afterwards. A run that was interrupted leaves the
+    journal behind, and resume() or rollback() can finish or undo it. The
+    records are flushed to the OS, not fsynced, so they survive the process
+    being killed, which is the case this is for, without an fsync per file.
+
+    A run may execute several plans (watch mode sorts each file as its own
+    plan); with `session=True` they all go into one journal, which is
+    archived by close(). A journal that recorded no steps is just removed.
+    """
+
+    def __init__(self, path=JOURNAL_FILE, history=JOURNAL_HISTORY, session=False):
+        self.path = path
+        self.history = history
+        self.session = session
+        self._file = None
+        self._base = 0
+        self._next_id = 0
+        self._steps = 0
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def start(self, plan_size):
+        """Begin a plan; its step ids follow those of earlier plans in the session."""
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._base = self._next_id
+        self._next_id += plan_size
+        self._write({'state': 'start', 'time': time.time(), 'steps': plan_size})
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def pending(self, step_id, step):
+        self._steps += 1
+        self._write(dict(step, id=self._base + step_id, state='pending'))
+
+    def done(self, step_id):
+        self._write({'id': self._base + step_id, 'state': 'done'})
+
+    def failed(self, step_id, error):
+        self._write({'id': self._base + step_id, 'state': 'failed', 'error': str(error)})
+
+    def finish(self):
+        self._write({'state': 'end', 'time': time.time()})
+        if not self.session:
+            self.close()
+
+    def close(self):
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        if self._steps:
+            # The finished run is kept so it can still be rolled back
+            archive(self.path, self.history)
+        else:
+            os.remove(self.path)
+
+    def read(self):
+        """Return the steps in order, each with its final state."""
+        steps = {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # The last line may be cut off by the interruption
+                    continue
+                if 'id' not in record:
+                    continue
+                if record['state'] == 'pending':
+                    steps[record['id']] = record
+                elif record['id'] in steps:
+                    steps[record['id']]['state'] = record['state']
+        return [steps[step_id] for step_id in sorted(steps)]
+
+
+def archive(path, history=JOURNAL_HISTORY):
+    """Move a finished journal into the history, dropping the oldest beyond KEEP_JOURNALS."""
+    os.makedirs(history, exist_ok=True)
+    os.replace(path, os.path.join(history, f"{time.time_ns()}.jsonl"))
+    for name in journal_history(history)[:-KEEP_JOURNALS]:
+        os.remove(os.path.join(history, name))
+
+
+def journal_history(history=JOURNAL_HISTORY):
+    """File names of the archived journals, oldest first."""
+    try:
+        return sorted(name for name in os.listdir(history) if name.endswith('.jsonl'))
+    except FileNotFoundError:
+        return []
+
+
+def _copy_of(source, target, size=None):
+    """'complete' or 'partial' if target holds source's bytes (or a prefix of them), else None.
+
+    `size` is the source size journaled with the step; a source that has
+    changed since cannot be matched.
+    """
+    source_size = os.path.getsize(source)
+    if size is not None and source_size != size:
+        return None
+    target_size = os.path.getsize(target)
+    if target_size > source_size:
+        return None
+    with open(source, 'rb') as source_file, open(target, 'rb') as target_file:
+        for block in iter(lambda: target_file.read(1024 * 1024), b''):
+            if source_file.read(len(block)) != block:
+                return None
+    return 'complete' if target_size == source_size else 'partial'
+
+
+def _redo(step):
+    source, target = step['source'], step['target']
+    source_exists, target_exists = os.path.exists(source), os.path.lexists(target)
+
+    if step['action'] == 'link':
+        if source_exists and target_exists and target != step['duplicate'] and \
+                not os.path.samefile(target, step['duplicate']):
+            raise FileExistsError(errno.EEXIST, "target exists and is not the journaled duplicate", target)
+        if source_exists and not target_exists and target != step['duplicate']:
+            os.link(step['duplicate'], target)
+        if source_exists:
+            os.remove(source)
+        return True
+
+    if source_exists and target_exists:
+        state = _copy_of(source, target, step.get('size'))
+        if state == 'complete':
+            # The copy finished; only removing the source was left
+            os.remove(source)
+            return True
+        if state is None:
+            # Not ours: leave both files alone
+            raise FileExistsError(errno.EEXIST, "target exists and does not match the journaled file", target)
+        # An interrupted cross-device copy leaves a partial target behind
+        os.remove(target)
+    if source_exists:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.move(source, target)
+        return True
+    return target_exists
+
+
+def resume(path=JOURNAL_FILE, history=JOURNAL_HISTORY):
+    """Finish the steps an interrupted run left pending. Returns steps completed."""
+    journal = Journal(path)
+    if not journal.exists():
+        return 0
+    completed = 0
+    steps = journal.read()
+    for step in steps:
+        if step['state'] != 'pending':
+            continue
+        try:
+            if _redo(step):
+                completed += 1
+            else:
+                print(f"Lost track of {step['source']}: neither it nor {step['target']} exists")
+        except OSError as e:
+            print(f"Could not finish moving {step['source']}: {e}")
+    if steps:
+        archive(path, history)
+    else:
+        os.remove(path)
+    return completed
+
+
+def rollback(path=None, history=JOURNAL_HISTORY):
+    """Undo an interrupted run, or the last finished one, newest step first.
+
+    The journal is deleted only once every step is back in place, so a
+    partial rollback can be retried; the run before it is next in line.
+    """
+    if path is None:
+        archived = journal_history(history)
+        if os.path.exists(JOURNAL_FILE):
+            path = JOURNAL_FILE
+        elif archived:
+            path = os.path.join(history, archived[-1])
+        else:
+            return 0
+    journal = Journal(path)
+    if not journal.exists():
+        return 0
+    undone = 0
+    left = 0
+    for step in reversed(journal.read()):
+        if step['state'] == 'failed':
+            continue
+        source, target = step['source'], step['target']
+        try:
+            if os.path.exists(source):
+                if not os.path.lexists(target) or target == step['duplicate']:
+                    # Never moved, or already restored
+                    continue
+                left += 1
+                print(f"Could not restore {source}: {target} exists too")
+                continue
+            if not os.path.lexists(target):
+                left += 1
+                print(f"Could not restore {source}: {target} is gone")
+                continue
+            os.makedirs(os.path.dirname(source), exist_ok=True)
+            if step['action'] == 'link':
+                try:
+                    os.link(target, source)
+                except OSError:
+                    shutil.copy2(target, source)
+                if target != step['duplicate']:
+                    os.remove(target)
+            else:
+                shutil.move(target, source)
+            undone += 1
+        except OSError as e:
+            left += 1
+            print(f"Could not restore {source}: {e}")
+    if left:
+        print(f"{left} files were not restored; kept {path} to try again")
+    else:
+        os.remove(path)
+    return undone
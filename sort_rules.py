@@ -0,0 +1,130 @@
+import os
+import re
+import fnmatch
+import mimetypes
+import configparser
+
+# Built-in rules, used when there is no sorter_rules.ini. Each section of that
+# file has the same keys: destination plus any of extensions, mime, glob,
+# min_size and max_size. Rules with glob, mime or size conditions are tried
+# first, in file order; otherwise the first rule listing the extension applies.
+DEFAULT_RULES = [
+    {'name': 'Videos', 'destination': '~/Videos', 'extensions': '.mp4 .avi .mkv .mov'},
+    {'name': 'Zip', 'destination': '~/ZipFiles', 'extensions': '.zip'},
+    {'name': 'ISO', 'destination': '~/ISOFiles', 'extensions': '.iso'},
+    {'name': 'RAR', 'destination': '~/RARFiles', 'extensions': '.rar'},
+    {'name': 'Images', 'destination': '~/Images', 'extensions': '.jpg .png .jpeg .gif .bmp .tiff .webp'},
+    {'name': 'Documents', 'destination': '~/Documents',
+     'extensions': '.doc .docx .pdf .txt .rtf .odt .xls .xlsx .ppt .pptx'},
+    {'name': 'EXE', 'destination': '~/EXEFiles', 'extensions': '.exe'},
+    {'name': 'MSI', 'destination': '~/MSIFiles', 'extensions': '.msi'},
+    {'name': 'APK', 'destination': '~/APKFiles', 'extensions': '.apk'},
+]
+
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sorter_rules.ini')
+
+_size_pattern = re.compile(r'^\s*([\d.]+)\s*([kmgt]?)i?b?\s*$', re.IGNORECASE)
+_size_units = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3, 't': 1024 ** 4}
+
+
+def parse_size(value):
+    if value is None or value == '':
+        return None
+    match = _size_pattern.match(str(value))
+    if not match:
+        raise ValueError(f"Invalid size: {value}")
+    return int(float(match.group(1)) * _size_units[match.group(2).lower()])
+
+
+class Rule:
+    def __init__(self, name, destination, extensions='', mime='', glob='', min_size=None, max_size=None):
+        self.name = name
+        self.destination = os.path.expanduser(destination)
+        self.extensions = {
+            ext.lower() if ext.startswith('.') else '.' + ext.lower()
+            for ext in extensions.replace(',', ' ').split()
+        }
+        self.mime = mime.split()
+        self.glob = [pattern.lower() for pattern in glob.split()]
+        self.min_size = parse_size(min_size)
+        self.max_size = parse_size(max_size)
+
+    @property
+    def extension_only(self):
+        return bool(self.extensions) and not (self.mime or self.glob or self.needs_size)
+
+    @property
+    def needs_size(self):
+        return self.min_size is not None or self.max_size is not None
+
+    def matches(self, filename, extension, size):
+        if self.extensions and extension not in self.extensions:
+            return False
+        if self.glob and not any(fnmatch.fnmatch(filename.lower(), pattern) for pattern in self.glob):
+            return False
+        if self.mime:
+            mime_type = mimetypes.guess_type(filename)[0] or ''
+            if not any(fnmatch.fnmatch(mime_type, pattern) for pattern in self.mime):
+                return False
+        if self.min_size is not None and (size is None or size < self.min_size):
+            return False
+        if self.max_size is not None and (size is None or size > self.max_size):
+            return False
+        return True
+
+
+class RuleEngine:
+    """Maps file names to destination folders.
+
+    Plain extension rules go into a dict, so the common case is a single
+    lookup. Rules with glob/MIME/size conditions are few and are checked in
+    order first, so they can carve exceptions out of an extension rule.
+    """
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.by_extension = {}
+        self.conditional = []
+        for rule in rules:
+            if rule.extension_only:
+                for extension in rule.extensions:
+                    self.by_extension.setdefault(extension, rule)
+            else:
+                self.conditional.append(rule)
+        self.needs_size = any(rule.needs_size for rule in self.conditional)
+
+    @property
+    def destinations(self):
+        return {rule.destination for rule in self.rules}
+
+    def match(self, filename, size=None):
+        extension = os.path.splitext(filename)[1].lower()
+        for rule in self.conditional:
+            if rule.matches(filename, extension, size):
+                return rule
+        return self.by_extension.get(extension)
+
+    def destination_for(self, filename, size=None):
+        rule = self.match(filename, size)
+        return rule.destination if rule else None
+
+
+def load_rules(path=None):
+    path = path or RULES_FILE
+    config = configparser.ConfigParser()
+    if not config.read(path):
+        return RuleEngine([Rule(**rule) for rule in DEFAULT_RULES])
+
+    rules = []
+    for section in config.sections():
+        options = config[section]
+        rules.append(Rule(
+            section,
+            options['destination'],
+            extensions=options.get('extensions', ''),
+            mime=options.get('mime', ''),
+            glob=options.get('glob', ''),
+            min_size=options.get('min_size'),
+            max_size=options.get('max_size'),
+        ))
+    return RuleEngine(rules)
@@ -1,59 +1,464 @@
 import os
+import errno
 import shutil
-import schedule
 import time
+import select
+import struct
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from sort_rules import load_rules
+from dedupe_index import DedupeIndex, BatchIndex, INDEX_FILE
+from sort_journal import Journal, resume, rollback
 
-def move_file(file_path, destination_folder):
-    os.makedirs(destination_folder, exist_ok=True)
-    shutil.move(file_path, os.path.join(destination_folder, os.path.basename(file_path)))
-
-def scan_and_organize_downloads():
-    downloads_folder = os.path.expanduser("~/Downloads")
-    video_folder = os.path.expanduser("~/Videos")
-    zip_folder = os.path.expanduser("~/ZipFiles")
-    iso_folder = os.path.expanduser("~/ISOFiles")
-    rar_folder = os.path.expanduser("~/RARFiles")
-    img_folder = os.path.expanduser("~/Images")
-    doc_folder = os.path.expanduser("~/Documents")
-    exe_folder = os.path.expanduser("~/EXEFiles")
-    apk_folder = os.path.expanduser("~/APKFiles")
-    msi_folder = os.path.expanduser("~/APKFiles")
-
-    
-
-    for filename in os.listdir(downloads_folder):
-        file_path = os.path.join(downloads_folder, filename)
-        if os.path.isfile(file_path):
-            _, extension = os.path.splitext(filename)
-            extension = extension.lower()
-
-            if extension in ['.mp4', '.avi', '.mkv', '.mov']:
-                move_file(file_path, video_folder)
-            elif extension == '.zip':
-                move_file(file_path, zip_folder)
-            elif extension == '.iso':
-                move_file(file_path, iso_folder)
-            elif extension == '.rar':
-                move_file(file_path, rar_folder)
-            elif extension in ['.jpg', '.png', '.jpeg', '.gif', '.bmp', '.tiff', '.webp']:
-                move_file(file_path, img_folder)
-            elif extension in ['.doc', '.docx', '.pdf', '.txt', '.rtf', '.odt', '.xls', '.xlsx', '.ppt', '.pptx']:
-                move_file(file_path, doc_folder)
-            elif extension == '.exe':
-                move_file(file_path, exe_folder)
-            elif extension == '.msi':
-                move_file(file_path, msi_folder)
-            elif extension == '.apk':
-                move_file(file_path, apk_folder)
+# Suffixes browsers and download managers use while a file is still arriving
+PARTIAL_SUFFIXES = ('.crdownload', '.part', '.partial', '.download', '.tmp')
 
+_engine = None
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        _engine = load_rules()
+    return _engine
+
+def destination_for(filename, size=None):
+    return get_engine().destination_for(filename, size)
+
+def rename_or_copy(file_path, target_path):
+    """Rename when source and target share a filesystem, else return False."""
+    try:
+        os.rename(file_path, target_path)
+        return True
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        return False
+
+def unique_target(destination_folder, filename, claimed):
+    """Never overwrite: "report.pdf" becomes "report (1).pdf" when taken."""
+    stem, extension = os.path.splitext(filename)
+    target_path = os.path.join(destination_folder, filename)
+    counter = 1
+    while target_path in claimed or os.path.lexists(target_path):
+        target_path = os.path.join(destination_folder, f"{stem} ({counter}){extension}")
+        counter += 1
+    claimed.add(target_path)
+    return target_path
+
+def link_duplicate(file_path, duplicate, target_path):
+    """Replace the download with a hard link to the copy already sorted."""
+    if target_path != duplicate:
+        os.link(duplicate, target_path)
+    os.remove(file_path)
+
+def plan_moves(file_paths, engine=None, index=None, duplicates='skip'):
+    """Decide where every file goes without touching the disk.
+
+    Each step is a dict with an action ('move', 'link' or 'skip'), the
+    source, the target and, for duplicates, the already-sorted copy. With
+    an index, files are also checked against those planned before them, so
+    a duplicate's copy may be the target of an earlier step.
+    """
+    engine = engine or get_engine()
+    plan = []
+    claimed = set()
+    batch = BatchIndex() if index else None
+    for file_path, size in file_paths:
+        filename = os.path.basename(file_path)
+        try:
+            # Only size rules and the duplicate check need a stat; the
+            # extension lookup works from the name alone
+            st = os.stat(file_path) if engine.needs_size and size is None else None
+            if st:
+                size = st.st_size
+            destination_folder = engine.destination_for(filename, size)
+            if not destination_folder:
+                continue
+            duplicate = None
+            if index:
+                st = st or os.stat(file_path)
+                size = st.st_size
+                duplicate = index.find_duplicate(file_path, st) or batch.find_duplicate(file_path, st)
+        except OSError as e:
+            print(f"Could not read {file_path}: {e}")
+            continue
+
+        if duplicate and duplicates == 'skip':
+            plan.append({'action': 'skip', 'source': file_path, 'target': None, 'duplicate': duplicate})
+            continue
+        action = 'link' if duplicate and duplicates == 'link' else 'move'
+        if action == 'link' and filename == os.path.basename(duplicate) and \
+                os.path.dirname(duplicate) == destination_folder:
+            target_path = duplicate
+        else:
+            target_path = unique_target(destination_folder, filename, claimed)
+        if batch and action == 'move':
+            batch.add(file_path, st, target_path)
+        # The size lets resume() tell a partial copy of this file from an unrelated one
+        plan.append({'action': action, 'source': file_path, 'target': target_path, 'duplicate': duplicate,
+                     'size': size})
+    return plan
+
+def print_plan(plan):
+    for step in plan:
+        if step['action'] == 'skip':
+            print(f"skip  {step['source']} (duplicate of {step['duplicate']})")
+        elif step['action'] == 'link':
+            print(f"link  {step['source']} -> {step['target']} (duplicate of {step['duplicate']})")
+        else:
+            print(f"move  {step['source']} -> {step['target']}")
+
+def execute_plan(plan, workers=8, index=None, journal=None):
+    """Carry out a plan and return how many files were moved or linked.
+
+    Destination folders are created once up front. Same-filesystem moves are
+    a rename on the calling thread; only cross-device moves, which have to
+    copy the data, are handed to the thread pool so they overlap. Every step
+    is journaled before it runs, so an interrupted run can be resumed. Links
+    to a file that is still being copied wait until the copies are done.
+    """
+    for destination_folder in {os.path.dirname(step['target']) for step in plan if step['action'] != 'skip'}:
+        os.makedirs(destination_folder, exist_ok=True)
+
+    journal = journal or Journal()
+    journal.start(len(plan))
+    moved = 0
+    copies = []
+    copying = set()
+    waiting = []
+
+    def link(step_id, step):
+        try:
+            link_duplicate(step['source'], step['duplicate'], step['target'])
+        except OSError as e:
+            # Hard links can't cross filesystems; leave the file where it is
+            journal.failed(step_id, e)
+            print(f"Skipped {os.path.basename(step['source'])}: duplicate of {step['duplicate']}")
+            return 0
+        journal.done(step_id)
+        if index:
+            index.add(step['target'])
+        return 1
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for step_id, step in enumerate(plan):
+            source, target = step['source'], step['target']
+            if step['action'] == 'skip':
+                print(f"Skipped {os.path.basename(source)}: duplicate of {step['duplicate']}")
+                continue
+
+            if step['action'] == 'link' and step['duplicate'] in copying:
+                waiting.append((step_id, step))
+                continue
+            journal.pending(step_id, step)
+            try:
+                if step['action'] == 'link':
+                    moved += link(step_id, step)
+                elif rename_or_copy(source, target):
+                    journal.done(step_id)
+                    moved += 1
+                    if index:
+                        index.add(target)
+                else:
+                    copying.add(target)
+                    copies.append((step_id, step, executor.submit(shutil.move, source, target)))
+            except OSError as e:
+                journal.failed(step_id, e)
+                print(f"Could not move {source}: {e}")
+        for step_id, step, future in copies:
+            try:
+                future.result()
+                journal.done(step_id)
+                moved += 1
+                if index:
+                    index.add(step['target'])
+            except OSError as e:
+                journal.failed(step_id, e)
+                print(f"Could not move {step['source']}: {e}")
+    for step_id, step in waiting:
+        journal.pending(step_id, step)
+        moved += link(step_id, step)
+    journal.finish()
+    if index:
+        index.conn.commit()
+    return moved
+
+def organize_files(file_paths, engine=None, workers=8, index=None, duplicates='skip', journal=None):
+    """Plan and then execute the moves for the given (path, size) pairs.
+
+    With a DedupeIndex, a file whose content is already in a destination
+    folder is skipped, hard-linked to the existing copy, or moved under a
+    new name, depending on `duplicates` ('skip', 'link' or 'rename').
+    """
+    return execute_plan(plan_moves(file_paths, engine, index, duplicates), workers, index, journal)
+
+def open_index(engine=None, readonly=False):
+    if readonly:
+        # A dry run plans against the index as last saved and writes nothing
+        if not os.path.exists(INDEX_FILE):
+            return None
+        return DedupeIndex(readonly=True)
+    index = DedupeIndex()
+    index.refresh((engine or get_engine()).destinations)
+    return index
+
+def sort_file(file_path, index=None, duplicates='skip', journal=None):
+    return organize_files([(file_path, None)], workers=1, index=index, duplicates=duplicates, journal=journal) == 1
+
+def scan_and_organize_downloads(downloads_folder=None, engine=None, workers=8, duplicates='skip',
+                                dedupe=True, dry_run=False):
+    downloads_folder = downloads_folder or os.path.expanduser("~/Downloads")
+
+    if not dry_run and Journal().exists():
+        print(f"Finished {resume()} moves left over from an interrupted run")
+
+    # scandir reports the entry type from the directory listing, no stat per file
+    start = time.perf_counter()
+    with os.scandir(downloads_folder) as entries:
+        file_paths = [(entry.path, None) for entry in entries if entry.is_file()]
+
+    index = open_index(engine, readonly=dry_run) if dedupe else None
+    try:
+        plan = plan_moves(file_paths, engine, index, duplicates)
+        planned = time.perf_counter()
+        if dry_run:
+            print_plan(plan)
+            moving = sum(1 for step in plan if step['action'] != 'skip')
+            print(f"Dry run: {moving} of {len(file_paths)} files would be sorted, "
+                  f"planned in {planned - start:.3f}s")
+            return 0
+        moved = execute_plan(plan, workers, index)
+    finally:
+        if index:
+            index.close()
     print(f"Scanned and organized files in {downloads_folder}")
+    print(f"Moved {moved} files in {time.perf_counter() - start:.3f}s "
+          f"(planning {planned - start:.3f}s)")
+    return moved
+
+
+class StabilityTracker:
+    """Holds back files until their size and mtime stop changing."""
+
+    def __init__(self, settle_seconds=2.0):
+        self.settle_seconds = settle_seconds
+        self.pending = {}
+
+    def touch(self, path):
+        self.pending[path] = (None, time.monotonic())
+
+    def ready(self):
+        now = time.monotonic()
+        ready = []
+        for path, (signature, last_change) in list(self.pending.items()):
+            if path.endswith(PARTIAL_SUFFIXES):
+                del self.pending[path]
+                continue
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                del self.pending[path]
+                continue
+            current = (st.st_size, st.st_mtime_ns)
+            if current != signature:
+                self.pending[path] = (current, now)
+            elif now - last_change >= self.settle_seconds:
+                del self.pending[path]
+                ready.append(path)
+        return ready
+
+
+class InotifyWatcher:
+    """Minimal ctypes binding for Linux inotify, used when watchdog isn't installed."""
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, folder):
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError("inotify is not available")
+        self.folder = folder
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), mask) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {folder}")
+
+    def events(self, timeout):
+        """Return the file paths with events, waiting up to timeout seconds."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        paths = []
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if name:
+                paths.append(os.path.join(self.folder, os.fsdecode(name)))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+class WatchdogWatcher:
+    def __init__(self, folder):
+        import queue
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+
+        self._queue = queue.Queue()
+        changed = self._queue
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if not event.is_directory:
+                    changed.put(getattr(event, 'dest_path', None) or event.src_path)
+
+        self._observer = Observer()
+        self._observer.schedule(Handler(), folder, recursive=False)
+        self._observer.start()
+
+    def events(self, timeout):
+        import queue
+        paths = []
+        try:
+            paths.append(self._queue.get(timeout=timeout))
+            while True:
+                paths.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return paths
+
+    def close(self):
+        self._observer.stop()
+        self._observer.join()
+
+
+class ScanWatcher:
+    """Fallback without inotify: rescan only when something could have changed.
+
+    The folder's own mtime changes whenever an entry is added, removed or
+    renamed, so an unchanged folder costs one stat per poll. When it does
+    change, only entries that are new or whose size/mtime moved are reported.
+    """
+
+    def __init__(self, folder, poll_interval=5.0):
+        self.folder = folder
+        self.poll_interval = poll_interval
+        self.folder_mtime = None
+        self.known = {}
+
+    def events(self, timeout):
+        time.sleep(min(timeout, self.poll_interval))
+        folder_mtime = os.stat(self.folder).st_mtime_ns
+        if folder_mtime == self.folder_mtime:
+            return []
+        # Timestamps are coarse: a change within the same tick as this scan would
+        # leave the mtime unchanged, so only trust mtimes older than two seconds
+        recent = time.time_ns() - folder_mtime < 2_000_000_000
+        self.folder_mtime = None if recent else folder_mtime
+
+        changed = []
+        current = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                st = entry.stat()
+                signature = (st.st_size, st.st_mtime_ns)
+                current[entry.path] = signature
+                if self.known.get(entry.path) != signature:
+                    changed.append(entry.path)
+        self.known = current
+        return changed
+
+    def close(self):
+        pass
+
+
+def open_watcher(folder, poll_interval=5.0):
+    for watcher_class in (WatchdogWatcher, InotifyWatcher):
+        try:
+            return watcher_class(folder)
+        except (ImportError, OSError, AttributeError):
+            continue
+    return ScanWatcher(folder, poll_interval)
+
+
+def watch_downloads(downloads_folder=None, settle_seconds=2.0, poll_interval=5.0, duplicates='skip', dedupe=True):
+    downloads_folder = downloads_folder or os.path.expanduser("~/Downloads")
+    index = open_index() if dedupe else None
+    watcher = open_watcher(downloads_folder, poll_interval)
+    tracker = StabilityTracker(settle_seconds)
+    # One journal for the whole session, so --rollback undoes all of it
+    journal = Journal(session=True)
+    print(f"Watching {downloads_folder} ({type(watcher).__name__}), press Ctrl+C to stop")
+
+    try:
+        while True:
+            # Wake up often enough to release files that have settled
+            timeout = 0.5 if tracker.pending else poll_interval
+            for path in watcher.events(timeout):
+                tracker.touch(path)
+            for path in tracker.ready():
+                if os.path.isfile(path) and sort_file(path, index, duplicates, journal):
+                    print(f"Sorted {os.path.basename(path)}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+        journal.close()
+        if index:
+            index.close()
 
 def main():
+    parser = argparse.ArgumentParser(description="Sort the Downloads folder into per-type folders")
+    parser.add_argument('--watch', action='store_true', help="keep running and sort new files as they arrive")
+    parser.add_argument('--settle', type=float, default=2.0, help="seconds a file must stay unchanged before it is moved")
+    parser.add_argument('--poll', type=float, default=5.0, help="rescan interval when inotify is unavailable")
+    parser.add_argument('--rules', help="rules file (default: sorter_rules.ini next to this script)")
+    parser.add_argument('--workers', type=int, default=8, help="parallel cross-device copies")
+    parser.add_argument('--duplicates', choices=('skip', 'link', 'rename'), default='skip',
+                        help="what to do with files whose content is already sorted")
+    parser.add_argument('--no-dedupe', action='store_true', help="don't check for duplicate content")
+    parser.add_argument('--dry-run', action='store_true', help="print the plan and timing, change nothing")
+    parser.add_argument('--rollback', action='store_true',
+                        help="undo an interrupted run, or the last completed one, and exit")
+    args = parser.parse_args()
+
+    if args.rollback:
+        print(f"Restored {rollback()} files")
+        return
+
+    global _engine
+    _engine = load_rules(args.rules)
+
     # Run the scan immediately when the script starts
-    scan_and_organize_downloads()
-    
-    
-    
+    scan_and_organize_downloads(workers=args.workers, duplicates=args.duplicates,
+                                dedupe=not args.no_dedupe, dry_run=args.dry_run)
+
+    if args.watch and not args.dry_run:
+        watch_downloads(settle_seconds=args.settle, poll_interval=args.poll,
+                        duplicates=args.duplicates, dedupe=not args.no_dedupe)
+
 
 if __name__ == '__main__':
     main()
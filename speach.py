@@ -1,14 +1,23 @@
 import os
 import speech_recognition as sr
-from groq import Groq
+from llm_client import get_client
+from intent_router import IntentRouter
+from recognizers import make_recognizer, RecognitionError, NoSpeechError
+from conversation import Conversation, llm_summariser
 
-# Set up the Groq API client
-client = Groq(
+# Set up the shared Groq API client
+client = get_client(
     api_key=os.environ.get("GROQ_API_KEY"),
 )
 
-# Initialize the speech recognition engine
+# Earlier turns go with each question, summarised once they grow
+conversation = Conversation("speach", summarise=llm_summariser(client))
+
+# Initialize the speech recognition engine; r only records, transcription
+# runs locally when a model is installed and falls back to Google
 r = sr.Recognizer()
+recognizer = make_recognizer()
+recognizer.warm()
 
 # Define the AI assistant's name
 assistant_name = "Echo"
@@ -35,6 +44,25 @@ def wiki_search(query):
 def translate(text, lang):
     print(f"Translating {text} to {lang} for {assistant_name}...")
 
+def ai_reply(text):
+    # If none of the features match, use Groq to generate a response
+    reply = client.complete(conversation.messages(text), "llama3-8b-8192")
+    conversation.record(text, reply)
+    print(f">>> {assistant_name}: {reply}")
+
+# Map spoken requests to the features above
+router = IntentRouter()
+router.register("weather", lambda text, route: weather(), keywords=["weather"],
+                examples=["is it going to rain", "how hot is it outside"])
+router.register("news", lambda text, route: news(), keywords=["news"],
+                examples=["what happened today", "latest headlines"])
+router.register("joke", lambda text, route: jokes(), keywords=["joke"],
+                examples=["make me laugh", "say something funny"])
+router.register("wiki", lambda text, route: wiki_search(route.group("query")),
+                patterns=[r"wiki\s*(?P<query>.*)"])
+router.register("translate", lambda text, route: translate(route.group("text"), route.group("lang")),
+                patterns=[r"translate (?P<text>.+?) to (?P<lang>.+)"])
+
 # Main loop
 while True:
     # Listen for user input
@@ -44,38 +72,13 @@ while True:
 
     try:
         # Recognize user input
-        text = r.recognize_google(audio)  # Removed lang="en-US"
+        text = recognizer.transcribe(audio)
         print(f">>> User: {text}")
 
         # Parse user input and determine what action to take
-        if "weather" in text.lower():
-            weather()
-        elif "news" in text.lower():
-            news()
-        elif "joke" in text.lower():
-            jokes()
-        elif "wiki" in text.lower():
-            query = text.split("wiki ")[1]
-            wiki_search(query)
-        elif "translate" in text.lower():
-            parts = text.split("translate ")[1].split(" to ")
-            text_to_translate = parts[0].strip()
-            lang_to_translate_to = parts[1].strip()
-            translate(text_to_translate, lang_to_translate_to)
-        else:
-            # If none of the above, use Groq to generate a response
-            completion = client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "user",
-                        "content": text,
-                    }
-                ],
-                model="llama3-8b-8192",
-            )
-            print(f">>> {assistant_name}: {completion.choices[0].message.content}")
-
-    except sr.UnknownValueError:
+        router.dispatch(text, fallback=ai_reply)
+
+    except NoSpeechError:
         print(f">>> {assistant_name}: Sorry, couldn't understand that. Can you try again?")
-    except sr.RequestError as e:
+    except RecognitionError as e:
         print(f">>> {assistant_name}: Error recognizing speech: {e}")
@@ -0,0 +1,31 @@
+import time
+from api_tools import TTLCache
+
+
+def wait_for_refresh(cache, key):
+    deadline = time.monotonic() + 2
+    while key in cache.refreshing and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_failed_refresh_serves_stale_and_backs_off(caplog):
+    cache = TTLCache(ttl=0, stale_ttl=60, retry_after=30)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        if len(calls) > 1:
+            raise ConnectionError('endpoint down')
+        return 'sunny'
+
+    assert cache.get('london', fetch) == 'sunny'
+    assert cache.get('london', fetch) == 'sunny'
+    wait_for_refresh(cache, 'london')
+    assert 'endpoint down' in caplog.text
+    assert cache.failures['london'][1] == 1
+
+    # Still stale, but no new refresh until the back-off has passed
+    assert cache.get('london', fetch) == 'sunny'
+    wait_for_refresh(cache, 'london')
+    assert len(calls) == 2
+    cache.close()
@@ -0,0 +1,22 @@
+import os
+import argparse
+import bench_sorter
+
+
+def test_generated_tree_is_reproducible(tmp_path):
+    sizes = []
+    for run in ('one', 'two'):
+        folder = tmp_path / run
+        total = bench_sorter.generate_tree(str(folder), 50, 4096, 0.3, seed=7)
+        sizes.append((total, sorted(os.listdir(folder))))
+    assert sizes[0] == sizes[1]
+    assert len(sizes[0][1]) == 50
+
+
+def test_trial_sorts_the_tree_in_a_child_process(tmp_path):
+    args = argparse.Namespace(dest_root=None, max_size=4096, duplicates=0.2, seed=1, workers=2,
+                              dedupe=True, strace=False)
+    result = bench_sorter.run_trial(40, args, str(tmp_path))
+    assert result['files'] == 40
+    assert 0 < result['moved'] <= 40
+    assert result['seconds'] > 0
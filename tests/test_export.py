@@ -0,0 +1,35 @@
+import gzip
+import shutil
+from export import JsonlWriter, iter_elements, write_jsonl
+
+
+def test_reads_back_an_unclosed_gzip_export(tmp_path):
+    path = str(tmp_path / 'export.jsonl.gz')
+    writer = JsonlWriter(path)
+    for i in range(2000):
+        writer.append('https://example.com', {'tag': 'p', 'text': f'row {i}'})
+    # What a crash leaves behind: flushed, but without the gzip trailer
+    crashed = str(tmp_path / 'crashed.jsonl.gz')
+    shutil.copy(path, crashed)
+    writer.close()
+
+    rows = list(iter_elements(crashed))
+    assert len(rows) == 2000
+    assert rows[-1] == ('https://example.com', {'tag': 'p', 'text': 'row 1999'})
+
+
+def test_reads_every_gzip_member_and_skips_a_torn_line(tmp_path):
+    path = str(tmp_path / 'export.jsonl.gz')
+    for session in range(2):
+        writer = JsonlWriter(path)
+        writer.append('u', {'session': session})
+        writer.close()
+    with gzip.open(path, 'ab') as f:
+        f.write(b'{"url": "u", "elem')
+    assert [element for _, element in iter_elements(path)] == [{'session': 0}, {'session': 1}]
+
+
+def test_plain_jsonl_round_trip(tmp_path):
+    path = str(tmp_path / 'export.jsonl')
+    write_jsonl(path, {'u': [{'n': 1}, {'n': 2}]})
+    assert list(iter_elements(path)) == [('u', {'n': 1}), ('u', {'n': 2})]
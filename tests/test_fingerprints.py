@@ -0,0 +1,36 @@
+import os
+import time
+from fingerprints import FingerprintStore, text_fingerprint
+
+
+def store_page(store, url, text):
+    text_hash = text_fingerprint(text)
+    store.save_text(text_hash, text)
+    store.update(url, text_hash=text_hash, llm_response='summary')
+    return text_hash
+
+
+def test_unreferenced_and_stale_texts_are_pruned(tmp_path):
+    store = FingerprintStore(str(tmp_path))
+    kept = store_page(store, 'https://a.example', 'page a')
+    store_page(store, 'https://b.example', 'page b')
+    store.save_text(text_fingerprint('orphan'), 'orphan')
+    # b has not been scraped for longer than max_age
+    store.entries['https://b.example']['checked'] = time.time() - store.max_age - 1
+
+    store.save()
+    assert os.listdir(store.texts_path) == [f"{kept}.txt"]
+    assert list(FingerprintStore(str(tmp_path)).entries) == ['https://a.example']
+
+
+def test_least_recently_used_texts_are_evicted(tmp_path):
+    store = FingerprintStore(str(tmp_path), max_texts=2)
+    hashes = [store_page(store, f'https://{n}.example', f'page {n}') for n in range(3)]
+    for age, text_hash in zip((300, 200, 100), hashes):
+        path = os.path.join(store.texts_path, f"{text_hash}.txt")
+        os.utime(path, (time.time() - age, time.time() - age))
+    # Reading the oldest text makes it the most recently used
+    assert store.load_text(hashes[0]) == 'page 0'
+
+    store.save()
+    assert sorted(os.listdir(store.texts_path)) == sorted(f"{h}.txt" for h in (hashes[0], hashes[2]))
@@ -0,0 +1,20 @@
+import pytest
+from html_extract import available_backends
+
+BACKENDS = available_backends()
+PAGE = "<html><body><script>var x;</script><p>Hello <b>world</b></p><pre>print(1)</pre></body></html>"
+
+
+@pytest.mark.parametrize('backend', BACKENDS, ids=lambda backend: backend.name)
+def test_backends_agree_on_a_page(backend):
+    text = backend.extract_text(PAGE)
+    assert 'Hello' in text and 'world' in text
+    assert 'var x' not in text
+    assert [code for _, code in backend.extract_code(PAGE)] == ['print(1)']
+
+
+@pytest.mark.parametrize('backend', BACKENDS, ids=lambda backend: backend.name)
+@pytest.mark.parametrize('html', ['', '   ', '<!-- only a comment -->'])
+def test_backends_return_empty_for_no_content(backend, html):
+    assert backend.extract_text(html) == ''
+    assert backend.extract_code(html) == []
@@ -0,0 +1,111 @@
+import time
+import threading
+from input_pipeline import InputPipeline
+
+
+def wait_until(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def run_burst(policy, texts, max_pending=4):
+    """Submit `texts` while the only worker is busy; returns the texts it processed."""
+    busy = threading.Event()
+    release = threading.Event()
+    handled = []
+
+    def process(job):
+        handled.append(job.text)
+        if job.text == 'first':
+            busy.set()
+            release.wait(2)
+
+    pipeline = InputPipeline(process, workers=1, policy=policy, max_pending=max_pending)
+    pipeline.submit('first')
+    assert busy.wait(2)
+    for text in texts:
+        pipeline.submit(text)
+    release.set()
+    assert wait_until(lambda: not pipeline.pending and not pipeline.running)
+    pipeline.close()
+    return handled, pipeline
+
+
+def test_coalesce_merges_waiting_inputs():
+    handled, pipeline = run_burst('coalesce', ['turn on', 'the lights', 'please'])
+    assert handled == ['first', 'turn on the lights please']
+    assert pipeline.coalesced == 2 and pipeline.dropped == 0
+
+
+def test_drop_keeps_only_the_newest_input():
+    handled, pipeline = run_burst('drop', ['old', 'older', 'newest'])
+    assert handled == ['first', 'newest']
+    assert pipeline.dropped == 2
+
+
+def test_keep_answers_every_input_up_to_max_pending():
+    handled, pipeline = run_burst('keep', ['a', 'b', 'c', 'd'], max_pending=3)
+    assert handled == ['first', 'b', 'c', 'd']
+    assert pipeline.dropped == 1
+
+
+def test_unknown_policy_is_rejected():
+    try:
+        InputPipeline(lambda job: None, policy='newest')
+    except ValueError:
+        return
+    raise AssertionError("expected ValueError")
+
+
+def test_worker_survives_a_failing_input():
+    handled = []
+
+    def process(job):
+        if job.text == 'bad':
+            raise ValueError('boom')
+        handled.append(job.text)
+
+    pipeline = InputPipeline(process, workers=1, policy='keep',
+                             on_error=lambda job, error: handled.append(f"{job.text}: {error}"))
+    for text in ['first', 'bad', 'last']:
+        pipeline.submit(text)
+        time.sleep(0.05)
+    deadline = time.monotonic() + 2
+    while pipeline.completed < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    pipeline.close()
+    assert handled == ['first', 'bad: boom', 'last']
+    assert pipeline.failed == 1
+
+
+class Reply:
+    def __init__(self):
+        self.finished = False
+
+    def finish(self):
+        self.finished = True
+
+
+def test_reply_finishes_when_the_error_handler_fails():
+    jobs = []
+
+    def start(job):
+        job.reply = Reply()
+        jobs.append(job)
+
+    def broken_handler(job, error):
+        raise RuntimeError('handler broke too')
+
+    def process(job):
+        raise ValueError('boom')
+
+    pipeline = InputPipeline(process, workers=1, on_start=start, on_error=broken_handler)
+    pipeline.submit('hello')
+    deadline = time.monotonic() + 2
+    while pipeline.completed < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    pipeline.close()
+    assert jobs[0].reply.finished
+    assert pipeline.failed == 1
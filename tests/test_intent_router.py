@@ -0,0 +1,54 @@
+from intent_router import IntentRouter
+
+URL_PATTERN = r'https?://(?:www\.)?[-a-zA-Z0-9@:%._\+~#=]{1,256}\.[a-zA-Z0-9()]{1,6}\b(?:[-a-zA-Z0-9()@:%_\+.~#?&//=]*)'
+
+
+def make_router(calls):
+    router = IntentRouter()
+    router.register("url", lambda text, route: calls.append("url"), patterns=[URL_PATTERN])
+    router.register("weather", lambda text, route: calls.append("weather"), keywords=["weather"],
+                    patterns=[r"weather\b.*?\b(?:in|for|at) (?P<location>[^?!.]+)"],
+                    examples=["what's the temperature outside", "is it going to rain today", "forecast for tomorrow"])
+    router.register("sort", lambda text, route: calls.append("sort"), keywords=["sort"], side_effects=True,
+                    examples=["organize my downloads", "clean up the downloads folder", "tidy my downloads"])
+    return router
+
+
+def test_patterns_and_keywords():
+    router = make_router([])
+    route = router.match("what's the weather in Paris?")
+    assert (route.name, route.how, route.group("location")) == ("weather", "pattern", "Paris")
+    assert router.match("sort my files").name == "sort"
+
+
+def test_first_registered_wins_over_leftmost_match():
+    route = make_router([]).match("weather in https://example.com")
+    assert route.name == "url"
+    assert route.group() == "https://example.com"
+
+
+def test_classifier_matches_domain_phrases():
+    router = make_router([])
+    assert router.match("will it rain tomorrow").name == "weather"
+    assert router.match("what's the temperature").name == "weather"
+    assert router.match("organise the downloads").name == "sort"
+
+
+def test_classifier_ignores_ordinary_chat():
+    router = make_router([])
+    for text in ["clean up the code", "organize my thoughts", "help me organize my essay", "tidy my room",
+                 "how do I clean up the kitchen", "is it going to be a good day today",
+                 "forecast for tomorrow's stock market", "what's the temperature of the sun",
+                 "what is the forecast for bitcoin"]:
+        assert router.match(text) is None, text
+
+
+def test_side_effects_need_confirmation_after_classifier():
+    calls = []
+    router = make_router(calls)
+    router.dispatch("organise the downloads", fallback=lambda text: calls.append("ai"))
+    router.dispatch("organise the downloads", fallback=lambda text: calls.append("ai"), confirm=lambda route: False)
+    router.dispatch("organise the downloads", fallback=lambda text: calls.append("ai"), confirm=lambda route: True)
+    # A keyword match is explicit and runs without asking
+    router.dispatch("sort downloads", fallback=lambda text: calls.append("ai"))
+    assert calls == ["ai", "ai", "sort", "sort"]
@@ -0,0 +1,27 @@
+from retrieval import BM25Index
+
+
+def make_index():
+    index = BM25Index(passage_tokens=20, overlap_tokens=0)
+    index.set_document('a', ' '.join(f'apple{i}' for i in range(60)))
+    index.set_document('b', ' '.join(f'banana{i}' for i in range(60)))
+    return index
+
+
+def test_search_ranks_matching_passages():
+    results = make_index().search('banana5', k=3)
+    assert results[0][0] == 'b'
+    assert 'banana5' in results[0][1].split()
+
+
+def test_unmatched_query_falls_back_to_leading_passages():
+    index = make_index()
+    assert index.search('summarize this page', k=3) == []
+    leading = index.leading(k=3)
+    assert [doc_id for doc_id, _, _ in leading] == ['a', 'b', 'a']
+    assert leading[0][1].split()[0] == 'apple0'
+    assert leading[1][1].split()[0] == 'banana0'
+
+
+def test_leading_on_an_empty_index():
+    assert BM25Index().leading() == []
@@ -0,0 +1,165 @@
+import os
+import json
+from dedupe_index import DedupeIndex
+from sort_rules import Rule, RuleEngine
+from sorter import plan_moves, execute_plan, StabilityTracker, ScanWatcher
+from sort_journal import Journal, resume, rollback, journal_history
+
+
+def write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def test_duplicates_within_one_batch(tmp_path):
+    downloads = tmp_path / 'Downloads'
+    documents = tmp_path / 'Documents'
+    downloads.mkdir()
+    engine = RuleEngine([Rule('Documents', str(documents), extensions='.pdf')])
+    first = write(downloads / 'report.pdf', b'same content' * 1000)
+    second = write(downloads / 'report (1).pdf', b'same content' * 1000)
+    other = write(downloads / 'other.pdf', b'other content' * 1000)
+
+    index = DedupeIndex(str(tmp_path / 'index.db'))
+    index.refresh(engine.destinations)
+    plan = plan_moves([(str(first), None), (str(second), None), (str(other), None)], engine, index)
+    assert [step['action'] for step in plan] == ['move', 'skip', 'move']
+    assert plan[1]['duplicate'] == plan[0]['target']
+
+    journal = Journal(str(tmp_path / 'journal.jsonl'), history=str(tmp_path / 'journals'))
+    assert execute_plan(plan, index=index, journal=journal) == 2
+    index.close()
+    assert sorted(os.listdir(documents)) == ['other.pdf', 'report.pdf']
+    assert os.listdir(downloads) == ['report (1).pdf']
+
+
+def test_batch_duplicate_linked(tmp_path):
+    downloads = tmp_path / 'Downloads'
+    documents = tmp_path / 'Documents'
+    downloads.mkdir()
+    engine = RuleEngine([Rule('Documents', str(documents), extensions='.pdf')])
+    first = write(downloads / 'a.pdf', b'x' * 5000)
+    second = write(downloads / 'b.pdf', b'x' * 5000)
+
+    index = DedupeIndex(str(tmp_path / 'index.db'))
+    plan = plan_moves([(str(first), None), (str(second), None)], engine, index, duplicates='link')
+    assert [step['action'] for step in plan] == ['move', 'link']
+    journal = Journal(str(tmp_path / 'journal.jsonl'), history=str(tmp_path / 'journals'))
+    assert execute_plan(plan, index=index, journal=journal) == 2
+    index.close()
+    assert os.path.samefile(documents / 'a.pdf', documents / 'b.pdf')
+    assert os.listdir(downloads) == []
+
+
+def test_empty_files_are_not_duplicates(tmp_path):
+    downloads = tmp_path / 'Downloads'
+    documents = tmp_path / 'Documents'
+    downloads.mkdir()
+    documents.mkdir()
+    engine = RuleEngine([Rule('Documents', str(documents), extensions='.txt')])
+    write(documents / 'sorted.txt', b'')
+    files = [(str(write(downloads / name, b'')), None) for name in ('a.txt', 'b.txt')]
+
+    index = DedupeIndex(str(tmp_path / 'index.db'))
+    index.refresh(engine.destinations)
+    plan = plan_moves(files, engine, index, duplicates='link')
+    index.close()
+    assert [step['action'] for step in plan] == ['move', 'move']
+
+
+def test_rollback_after_a_no_op_run(tmp_path):
+    downloads = tmp_path / 'Downloads'
+    documents = tmp_path / 'Documents'
+    history = str(tmp_path / 'journals')
+    downloads.mkdir()
+    engine = RuleEngine([Rule('Documents', str(documents), extensions='.pdf')])
+    report = write(downloads / 'report.pdf', b'report')
+
+    plan = plan_moves([(str(report), None)], engine)
+    assert execute_plan(plan, journal=Journal(str(tmp_path / 'journal.jsonl'), history=history)) == 1
+    # Nothing left to sort: no journal is archived for this run
+    assert execute_plan([], journal=Journal(str(tmp_path / 'journal.jsonl'), history=history)) == 0
+    assert len(journal_history(history)) == 1
+
+    path = str(tmp_path / 'journals' / journal_history(history)[0])
+    assert rollback(path) == 1
+    assert os.listdir(downloads) == ['report.pdf']
+    assert journal_history(history) == []
+
+
+def test_partial_rollback_keeps_the_journal(tmp_path):
+    downloads = tmp_path / 'Downloads'
+    documents = tmp_path / 'Documents'
+    history = str(tmp_path / 'journals')
+    downloads.mkdir()
+    engine = RuleEngine([Rule('Documents', str(documents), extensions='.pdf')])
+    files = [(str(write(downloads / name, name.encode())), None) for name in ('a.pdf', 'b.pdf')]
+
+    execute_plan(plan_moves(files, engine), journal=Journal(str(tmp_path / 'journal.jsonl'), history=history))
+    os.remove(documents / 'a.pdf')
+    path = str(tmp_path / 'journals' / journal_history(history)[0])
+    assert rollback(path) == 1
+    assert os.path.exists(path)
+
+
+def interrupted_move(tmp_path, source, target):
+    path = str(tmp_path / 'journal.jsonl')
+    step = {'action': 'move', 'source': str(source), 'target': str(target), 'duplicate': None,
+            'size': os.path.getsize(source), 'id': 0, 'state': 'pending'}
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'state': 'start', 'steps': 1}) + '\n' + json.dumps(step) + '\n')
+    return path
+
+
+def test_resume_replaces_a_partial_copy(tmp_path):
+    documents = tmp_path / 'Documents'
+    documents.mkdir()
+    source = write(tmp_path / 'report.pdf', b'0123456789' * 100)
+    write(documents / 'report.pdf', b'0123456789' * 10)
+    path = interrupted_move(tmp_path, source, documents / 'report.pdf')
+
+    assert resume(path, history=str(tmp_path / 'journals')) == 1
+    assert not os.path.exists(source)
+    assert (documents / 'report.pdf').read_bytes() == b'0123456789' * 100
+
+
+def test_resume_leaves_an_unrelated_target(tmp_path):
+    documents = tmp_path / 'Documents'
+    documents.mkdir()
+    source = write(tmp_path / 'report.pdf', b'0123456789' * 100)
+    write(documents / 'report.pdf', b'someone else')
+    path = interrupted_move(tmp_path, source, documents / 'report.pdf')
+
+    assert resume(path, history=str(tmp_path / 'journals')) == 0
+    assert source.read_bytes() == b'0123456789' * 100
+    assert (documents / 'report.pdf').read_bytes() == b'someone else'
+
+
+def test_stability_tracker_waits_for_files_to_settle(tmp_path):
+    path = write(tmp_path / 'movie.mp4', b'partial')
+    partial = write(tmp_path / 'other.mp4.crdownload', b'x')
+    tracker = StabilityTracker(settle_seconds=0)
+    tracker.touch(str(path))
+    tracker.touch(str(partial))
+    tracker.touch(str(tmp_path / 'gone.mp4'))
+
+    # The first look only records size and mtime; partial and missing files are dropped
+    assert tracker.ready() == []
+    assert list(tracker.pending) == [str(path)]
+    with open(path, 'ab') as f:
+        f.write(b' and more')
+    assert tracker.ready() == []
+    assert tracker.ready() == [str(path)]
+    assert tracker.pending == {}
+
+
+def test_scan_watcher_reports_new_and_changed_files(tmp_path):
+    watcher = ScanWatcher(str(tmp_path), poll_interval=0)
+    first = write(tmp_path / 'a.pdf', b'a')
+    assert watcher.events(0) == [str(first)]
+    second = write(tmp_path / 'b.pdf', b'b')
+    assert watcher.events(0) == [str(second)]
+    with open(first, 'ab') as f:
+        f.write(b'more')
+    assert watcher.events(0) == [str(first)]
@@ -0,0 +1,9 @@
+import importlib.util
+import pytest
+import check_startup
+
+
+@pytest.mark.skipif(importlib.util.find_spec('dotenv') is None, reason="main.py needs python-dotenv")
+def test_startup_stays_within_budget():
+    # Generous budgets: this catches an eager heavy import, not machine noise
+    assert check_startup.check(budget=2000, import_budget=1000, runs=3, verbose=False) == []
@@ -0,0 +1,202 @@
+import re
+import time
+import queue
+import threading
+from collections import deque
+
+# Speech output for voice.py. A single worker thread owns the pyttsx3 engine,
+# which is not thread-safe, and plays replies in the order they were created.
+# Replies are fed in sentence by sentence while the LLM is still generating,
+# so speech starts after the first sentence instead of the whole answer.
+
+# A sentence ends at . ! ? (plus closing quotes/brackets) followed by space, or at a newline
+_sentence_end = re.compile(r'[.!?]+["\')\]]*\s+|\n+')
+_abbreviation = re.compile(r'\b(?:Mr|Mrs|Ms|Dr|Prof|St|vs|etc|e\.g|i\.e)\.$', re.IGNORECASE)
+_clause_end = re.compile(r'[,;:]\s+')
+
+
+class SentenceSplitter:
+    """Cuts streamed text into sentences as soon as each one is complete.
+
+    Text without a sentence end is cut at the last clause break once it
+    passes `max_chars`, so a long run-on sentence doesn't hold up speech.
+    """
+
+    def __init__(self, max_chars=200):
+        self.max_chars = max_chars
+        self.buffer = ''
+
+    def feed(self, text):
+        self.buffer += text
+        sentences = []
+        start = 0
+        for match in _sentence_end.finditer(self.buffer):
+            candidate = self.buffer[start:match.end()].strip()
+            if _abbreviation.search(self.buffer[start:match.start() + 1]) and match.group().strip() == '.':
+                continue
+            if candidate:
+                sentences.append(candidate)
+            start = match.end()
+        self.buffer = self.buffer[start:]
+
+        if len(self.buffer) > self.max_chars:
+            breaks = list(_clause_end.finditer(self.buffer))
+            if breaks:
+                sentences.append(self.buffer[:breaks[-1].end()].strip())
+                self.buffer = self.buffer[breaks[-1].end():]
+        return sentences
+
+    def flush(self):
+        rest, self.buffer = self.buffer.strip(), ''
+        return [rest] if rest else []
+
+
+class Reply:
+    """One spoken answer; sentences can be added while it is already playing.
+
+    The worker plays a reply until finish() is called, so later replies wait
+    their turn even when they are generated first.
+    """
+
+    def __init__(self, heard_at):
+        # When the user stopped speaking, for the mouth-to-ear latency
+        self.heard_at = heard_at
+        self.first_audio_at = None
+        self.cancelled = False
+        self.sentences = queue.Queue()
+
+    def say(self, sentence):
+        if not self.cancelled and sentence.strip():
+            self.sentences.put(sentence)
+
+    def say_text(self, text):
+        """Queue a complete text, split into sentences."""
+        for sentence in SentenceSplitter().feed(text + '\n'):
+            self.say(sentence)
+
+    def finish(self):
+        self.sentences.put(None)
+
+    @property
+    def latency(self):
+        if self.first_audio_at is None or self.heard_at is None:
+            return None
+        return self.first_audio_at - self.heard_at
+
+
+class SpeechWorker:
+    """Speaks queued sentences on one thread, with barge-in cancellation.
+
+    `engine_factory` builds the TTS engine on the worker thread; it defaults
+    to pyttsx3.init. Mouth-to-ear latency, from the end of the user's speech
+    to the start of the spoken reply, is kept for the last `history` replies;
+    `on_first_audio(reply)` is called as each reply starts to play.
+    """
+
+    def __init__(self, engine_factory=None, history=100, on_first_audio=None):
+        self.engine_factory = engine_factory
+        self.on_first_audio = on_first_audio
+        self.queue = queue.Queue()
+        self.latencies = deque(maxlen=history)
+        self.speaking = False
+        self.engine = None
+        self.error = None
+        self._current = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="tts", daemon=True)
+        self._thread.start()
+        self._ready.wait(timeout=5)
+
+    def reply(self, heard_at=None):
+        """Start a reply; it plays after the replies started before it."""
+        reply = Reply(heard_at)
+        self.queue.put(reply)
+        return reply
+
+    def say(self, text, heard_at=None):
+        """Speak a complete text as its own reply."""
+        reply = self.reply(heard_at)
+        reply.say_text(text)
+        reply.finish()
+        return reply
+
+    def cancel(self):
+        """Stop speaking and drop everything queued (barge-in).
+
+        The engine is only ever driven from the worker thread, so this just
+        marks the replies cancelled; the worker stops the engine at the next
+        word it is about to say.
+        """
+        while True:
+            try:
+                reply = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if reply is not None:
+                reply.cancelled = True
+        current = self._current
+        if current:
+            current.cancelled = True
+
+    def _run(self):
+        try:
+            if self.engine_factory is None:
+                import pyttsx3
+                self.engine_factory = pyttsx3.init
+            self.engine = self.engine_factory()
+            self.engine.connect('started-utterance', self._on_started)
+            self.engine.connect('started-word', self._on_word)
+        except Exception as e:
+            # No speech output; sentences are still consumed so callers don't block
+            self.error = e
+            self.engine = None
+        finally:
+            self._ready.set()
+        while True:
+            reply = self.queue.get()
+            if reply is None:
+                break
+            self._current = reply
+            while not reply.cancelled:
+                try:
+                    sentence = reply.sentences.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if sentence is None:
+                    break
+                if self.engine is None:
+                    continue
+                self.speaking = True
+                try:
+                    self.engine.say(sentence)
+                    self.engine.runAndWait()
+                finally:
+                    self.speaking = False
+            self._current = None
+
+    def _on_started(self, name=None):
+        reply = self._current
+        if reply and reply.first_audio_at is None:
+            reply.first_audio_at = time.monotonic()
+            if reply.latency is not None:
+                self.latencies.append(reply.latency)
+            if self.on_first_audio:
+                self.on_first_audio(reply)
+
+    def _on_word(self, name=None, location=None, length=None):
+        # Runs on the worker thread inside runAndWait, where stop() is safe
+        reply = self._current
+        if reply and reply.cancelled:
+            self.engine.stop()
+
+    def latency_summary(self):
+        """Median and 90th percentile mouth-to-ear latency in seconds."""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[len(ordered) // 2], ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))]
+
+    def close(self):
+        self.cancel()
+        self.queue.put(None)
+        self._thread.join(timeout=2)
@@ -0,0 +1,147 @@
+import tkinter as tk
+from tkinter import ttk
+
+
+class VirtualTreeview(ttk.Frame):
+    """A Treeview that only materialises the rows currently on screen.
+
+    Rows live in a plain list of (values, payload) tuples. The Treeview holds
+    just enough items to fill its height, and scrolling rewrites their values
+    instead of inserting or deleting items, so the cost of a render does not
+    depend on how many rows there are.
+    """
+
+    def __init__(self, master, columns, headings, on_select=None):
+        super().__init__(master)
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", selectmode="browse")
+        for column, heading in zip(columns, headings):
+            self.tree.heading(column, text=heading)
+        self.tree.pack(side=tk.LEFT, expand=True, fill=tk.BOTH)
+
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.on_scroll)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.rows = []
+        self.offset = 0
+        self.selected = None
+        self.on_select = on_select
+        self._items = []
+        self._row_height = None
+        self._render_pending = False
+
+        self.tree.bind("<<TreeviewSelect>>", self._on_tree_select)
+        self.tree.bind("<Configure>", lambda event: self.schedule_render())
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll_by(-3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll_by(3))
+        self.tree.bind("<Up>", lambda event: self._move_selection(-1))
+        self.tree.bind("<Down>", lambda event: self._move_selection(1))
+        self.tree.bind("<Prior>", lambda event: self.scroll_by(-self.visible_count()))
+        self.tree.bind("<Next>", lambda event: self.scroll_by(self.visible_count()))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def append_rows(self, rows):
+        self.rows.extend(rows)
+        self.schedule_render()
+
+    def remove(self, index):
+        del self.rows[index]
+        if self.selected == index:
+            self.selected = None
+        elif self.selected is not None and self.selected > index:
+            self.selected -= 1
+        self.schedule_render()
+
+    def clear(self):
+        self.rows = []
+        self.offset = 0
+        self.selected = None
+        self.schedule_render()
+
+    def selected_payload(self):
+        if self.selected is None:
+            return None
+        return self.rows[self.selected][1]
+
+    def visible_count(self):
+        if self._row_height is None and self._items:
+            bbox = self.tree.bbox(self._items[0])
+            if bbox:
+                self._row_height = bbox[3]
+        row_height = self._row_height or 20
+        # One row's worth of height goes to the headings
+        return max(1, self.tree.winfo_height() // row_height - 1)
+
+    def schedule_render(self):
+        # Any number of updates within one Tk tick cost a single render
+        if not self._render_pending:
+            self._render_pending = True
+            self.after_idle(self.render)
+
+    def render(self):
+        self._render_pending = False
+        count = self.visible_count()
+        self.offset = max(0, min(self.offset, len(self.rows) - count))
+        window = self.rows[self.offset:self.offset + count]
+
+        while len(self._items) < len(window):
+            self._items.append(self.tree.insert("", "end"))
+        while len(self._items) > len(window):
+            self.tree.delete(self._items.pop())
+        for item, (values, _) in zip(self._items, window):
+            self.tree.item(item, values=values)
+
+        position = None if self.selected is None else self.selected - self.offset
+        if position is not None and 0 <= position < len(self._items):
+            if self.tree.selection() != (self._items[position],):
+                self.tree.selection_set(self._items[position])
+        elif self.tree.selection():
+            self.tree.selection_remove(*self.tree.selection())
+
+        if self.rows:
+            self.scrollbar.set(self.offset / len(self.rows), min(1.0, (self.offset + count) / len(self.rows)))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def on_scroll(self, action, amount, unit=None):
+        if action == 'moveto':
+            self.offset = int(float(amount) * len(self.rows))
+            self.schedule_render()
+        elif action == 'scroll':
+            step = self.visible_count() if unit == 'pages' else 1
+            self.scroll_by(int(amount) * step)
+
+    def scroll_by(self, rows):
+        self.offset += rows
+        self.schedule_render()
+        return "break"
+
+    def _on_mousewheel(self, event):
+        return self.scroll_by(-3 if event.delta > 0 else 3)
+
+    def _move_selection(self, step):
+        if not self.rows:
+            return "break"
+        index = 0 if self.selected is None else max(0, min(len(self.rows) - 1, self.selected + step))
+        if index < self.offset:
+            self.offset = index
+        elif index >= self.offset + self.visible_count():
+            self.offset = index - self.visible_count() + 1
+        self._select(index)
+        self.schedule_render()
+        return "break"
+
+    def _on_tree_select(self, event):
+        selection = self.tree.selection()
+        if not selection or selection[0] not in self._items:
+            return
+        index = self.offset + self._items.index(selection[0])
+        if index != self.selected and index < len(self.rows):
+            self._select(index)
+
+    def _select(self, index):
+        self.selected = index
+        if self.on_select:
+            self.on_select(self.rows[index][1])
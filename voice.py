@@ -1,31 +1,56 @@
-import speech_recognition as sr
+import os
+import queue
+import importlib.util
+import argparse
 import threading
 import time
-import pyttsx3
 from rich.console import Console
 from rich.panel import Panel
 from rich.text import Text
 from rich.layout import Layout
 from rich.live import Live
 from rich.spinner import Spinner
+from intent_router import IntentRouter
+from audio_capture import AudioCapture, MicrophoneSource, WavFileSource
+from recognizers import make_recognizer, RecognitionError, NoSpeechError
+from tts_pipeline import SentenceSplitter, SpeechWorker
+from input_pipeline import InputPipeline, POLICIES
+from conversation import Conversation, llm_summariser
+from llm_client import get_client
 
-try:
-    from groq import Groq
-    GROQ_AVAILABLE = True
-except ImportError:
-    GROQ_AVAILABLE = False
+# Checked without importing groq, which llm_client only loads on the first request
+GROQ_AVAILABLE = importlib.util.find_spec("groq") is not None
 
 class LiveSpeechRecognition:
-    def __init__(self, trigger_word="Hey"):
-        self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
+    def __init__(self, trigger_word="Hey", source=None, recognizer=None, barge_in=True,
+                 workers=2, stale_policy="coalesce"):
+        # Local speech-to-text when a model is installed, Google otherwise
+        self.recognizer = recognizer or make_recognizer()
+        self.partial_session = None
+        # Where audio comes from; a WavFileSource replays recordings instead of the microphone
+        self.source = source or MicrophoneSource()
+        self.capture = None
         self.is_listening = False
         self.thread = None
         self.console = Console()
         self.groq_client = None
+        self.conversation = None
         self.layout = Layout()
         self.trigger_word = trigger_word.lower()  # Set the trigger word
-        self.tts_engine = pyttsx3.init()  # Initialize TTS engine
+        # One thread owns the TTS engine and speaks replies sentence by sentence
+        self.speech = SpeechWorker(on_first_audio=lambda reply: self.show_latency())
+        # Starting to talk over a reply cuts it off
+        self.barge_in = barge_in
+        self.router = IntentRouter()
+        # Utterances with the trigger word go to the AI; anything else is echoed
+        self.router.register("ai", self.process_with_ai, keywords=[self.trigger_word])
+        self.status = ("Listening...", "bold blue")
+        # A fixed pool answers utterances; replies are queued for speech in
+        # the order the utterances arrived, and inputs that are still waiting
+        # when a newer one comes in are merged or dropped
+        self.pipeline = InputPipeline(self.handle_job, workers=workers, policy=stale_policy,
+                                      on_start=self.start_reply, on_change=lambda pipeline: self.render_footer(),
+                                      on_error=self.job_failed)
         self.initialize_layout()
         self.initialize_ai_client()
 
@@ -43,10 +68,12 @@ class LiveSpeechRecognition:
     def initialize_ai_client(self):
         if GROQ_AVAILABLE:
             try:
-                api_key = "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"
+                api_key = os.environ.get("GROQ_API_KEY")
                 if not api_key:
                     raise ValueError("GROQ_API_KEY environment variable not set.")
-                self.groq_client = Groq(api_key=api_key)
+                self.groq_client = get_client(api_key=api_key)
+                # Earlier turns, including those of previous runs, go with each request
+                self.conversation = Conversation("voice", summarise=llm_summariser(self.groq_client))
                 self.console.print("Groq client initialized successfully.", style="bold green")
             except Exception as e:
                 self.console.print(f"Error initializing Groq client: {e}", style="bold red")
@@ -56,6 +83,14 @@ class LiveSpeechRecognition:
 
     def start_listening(self):
         self.is_listening = True
+        # Load the speech model now rather than on the first utterance
+        threading.Thread(target=self.recognizer.warm, daemon=True).start()
+        partials = self.recognizer.streaming
+        self.capture = AudioCapture(self.source,
+                                    on_speech_start=self.on_speech_start,
+                                    on_speech_frame=self.feed_partials if partials else None,
+                                    on_speech_end=self.finish_partials if partials else None)
+        self.capture.start()
         self.thread = threading.Thread(target=self._listen_loop, daemon=True)
         self.thread.start()
 
@@ -63,101 +98,179 @@ class LiveSpeechRecognition:
         self.is_listening = False
         if self.thread and self.thread.is_alive():
             self.thread.join(timeout=1)
+        if self.capture:
+            self.capture.stop()
+        self.pipeline.close()
+        self.speech.close()
+        if self.conversation:
+            self.conversation.close()
         self.console.print("Stopped listening.", style="bold green")
 
     def _listen_loop(self):
-        with self.microphone as source:
-            self.recognizer.adjust_for_ambient_noise(source)
-        
+        # The capture thread keeps recording while utterances are recognised
+        # and answered here, so nothing said in the meantime is lost
         with Live(self.layout, refresh_per_second=4) as live:
+            self.set_status("Listening...", "bold blue")
             while self.is_listening:
                 try:
-                    self.layout["footer"].update(Panel("Listening...", style="bold blue"))
-                    with self.microphone as source:
-                        audio = self.recognizer.listen(source, timeout=5, phrase_time_limit=5)
-                    
-                    try:
-                        text = self.recognizer.recognize_google(audio)
-                        self.process_input(text, live)  # Call process_input without stopping
-                    except sr.UnknownValueError:
-                        self.layout["footer"].update(Panel("Could not understand audio", style="yellow"))
-                    except sr.RequestError as e:
-                        self.layout["footer"].update(Panel(f"Could not request results; {e}", style="red"))
-                
-                except sr.WaitTimeoutError:
-                    self.layout["footer"].update(Panel("Listening timed out, continuing...", style="yellow"))
-                
-                time.sleep(0.1)  # Small delay to prevent excessive CPU usage
-
-    def process_input(self, user_input, live):
-        user_input_lower = user_input.lower()
-        if self.trigger_word in user_input_lower:
-            # Process AI response in a separate thread to avoid blocking
-            threading.Thread(target=self.process_with_ai, args=(user_input, live), daemon=True).start()
-        elif "stop listening" in user_input_lower:
-                threading.Thread(target=self.echo_response, args=(user_input,), daemon=True).start()
-        else:
-            # Process echo response in a separate thread to avoid blocking
-            threading.Thread(target=self.echo_response, args=(user_input,), daemon=True).start()
+                    utterance = self.capture.utterances.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if utterance is None:
+                    # A recorded source has run out
+                    self.is_listening = False
+                    break
+
+                try:
+                    text = utterance.text or self.recognizer.transcribe(utterance)
+                    self.process_input(text, live, utterance.detected_at)  # Call process_input without stopping
+                except NoSpeechError:
+                    self.set_status("Could not understand audio", "yellow")
+                except RecognitionError as e:
+                    self.set_status(f"Could not request results; {e}", "red")
+                except Exception as e:
+                    # A backend failing in some other way must not end the loop
+                    self.set_status(f"Speech recognition failed: {e}", "red")
+
+    # These run on the capture's VAD thread. With a streaming recognizer,
+    # words show up while they are being said and the transcript is ready
+    # when the utterance ends.
+    def on_speech_start(self):
+        if self.barge_in and self.speech.speaking:
+            self.speech.cancel()
+            self.set_status("Interrupted, listening...", "bold blue")
+        if not self.recognizer.streaming:
+            return
+        try:
+            self.partial_session = self.recognizer.stream(self.source.sample_rate, self.source.sample_width)
+        except RecognitionError:
+            self.partial_session = None
+
+    def feed_partials(self, frame):
+        if self.partial_session:
+            partial = self.partial_session.accept(frame)
+            if partial:
+                self.layout["input"].update(Panel(Text(partial, style="dim"), title="Hearing"))
+
+    def finish_partials(self, utterance):
+        session, self.partial_session = self.partial_session, None
+        if session:
+            try:
+                utterance.text = session.finish()
+            except RecognitionError:
+                pass
+
+    def process_input(self, user_input, live, heard_at=None):
+        # heard_at is when the user stopped speaking, for the mouth-to-ear latency
+        self.pipeline.submit(user_input, heard_at)
+
+    def start_reply(self, job):
+        job.reply = self.speech.reply(job.heard_at)
+
+    def handle_job(self, job):
+        route = self.router.match(job.text)
+        handler = route.intent.handler if route else self.echo_response
+        handler(job.text, job.reply)
+        job.reply.finish()
 
-    def process_with_ai(self, user_input, live):
-        self.layout["footer"].update(Panel("Processing with AI...", style="bold cyan"))
+    def job_failed(self, job, error):
+        # The reply still finishes, so the ones queued behind it get their turn
+        try:
+            self.set_status(f"Error handling '{job.text}': {error}", "bold red")
+            job.reply.say_text("Sorry, something went wrong with that.")
+        finally:
+            job.reply.finish()
+
+    def set_status(self, message, style):
+        self.status = (message, style)
+        self.render_footer()
+
+    def render_footer(self):
+        message, style = self.status
+        footer = Text(message, style=style)
+        footer.append(f"   {self.pipeline.summary()}", style="dim")
+        self.layout["footer"].update(Panel(footer))
+
+    def process_with_ai(self, user_input, reply):
+        self.set_status("Processing with AI...", "bold cyan")
         try:
             spinner = Spinner("dots")
             self.layout["output"].update(Panel(spinner, title="AI Response"))
-            
-            completion = self.groq_client.chat.completions.create(
-                model="mixtral-8x7b-32768",
-                messages=[{"role": "user", "content": user_input}],
+
+            # Sentences are spoken as soon as they are complete, while the
+            # rest of the reply is still being generated
+            splitter = SentenceSplitter()
+            parts = []
+            completion = self.groq_client.stream(
+                self.conversation.messages(user_input),
+                "mixtral-8x7b-32768",
                 temperature=0.7,
                 max_tokens=1024,
                 top_p=1,
-                stream=False,
             )
-
-            ai_response = completion.choices[0].message.content
-            self.layout["output"].update(Panel(Text(ai_response, style="cyan"), title="AI Response"))
-            self.speak_text(ai_response)  # Use TTS to speak AI response
+            try:
+                for text in completion:
+                    parts.append(text)
+                    self.layout["output"].update(Panel(Text("".join(parts), style="cyan"), title="AI Response"))
+                    for sentence in splitter.feed(text):
+                        reply.say(sentence)
+                    if reply.cancelled:
+                        # Barged in on; stop generating what won't be heard
+                        break
+            finally:
+                completion.close()
+            for sentence in splitter.flush():
+                reply.say(sentence)
+            # Only what was generated before a barge-in is remembered
+            self.conversation.record(user_input, "".join(parts))
 
         except Exception as e:
-            self.layout["footer"].update(Panel(f"Error processing with AI: {e}", style="bold red"))
+            self.set_status(f"Error processing with AI: {e}", "bold red")
            
 
         self.continue_listening()  # Ensure it goes back to listening
 
-    def echo_response(self, user_input):
+    def echo_response(self, user_input, reply):
         self.layout["output"].update(Panel(Text(f"Echo: {user_input}", style="cyan"), title="Echo Response"))
-        self.speak_text(user_input)  # Use TTS to speak echoed input
+        reply.say_text(user_input)  # Use TTS to speak echoed input
         self.continue_listening()  # Ensure it goes back to listening
 
+    def show_latency(self):
+        summary = self.speech.latency_summary()
+        if summary:
+            self.layout["header"].update(Panel(
+                f"Mouth-to-ear latency: median {summary[0]:.2f}s, p90 {summary[1]:.2f}s", style="bold green"))
+
     def continue_listening(self):
         """Make the system return to the listening loop after processing."""
-        self.layout["footer"].update(Panel("Returning to listening mode...", style="bold blue"))
-        time.sleep(1)  # Optional small delay to indicate the transition
+        # Capture never stopped, so there is nothing to wait for
+        self.set_status("Listening...", "bold blue")
 
-    def speak_text(self, text):
-        """Convert text to speech using TTS engine."""
-        # Run TTS in a separate thread to avoid blocking
-        threading.Thread(target=self._run_tts, args=(text,), daemon=True).start()
-
-    def _run_tts(self, text):
-        """Internal method to handle TTS separately in a thread."""
-        self.tts_engine.say(text)
-        self.tts_engine.runAndWait()
+    def speak_text(self, text, heard_at=None):
+        """Queue text for the TTS worker; returns without waiting for it to be spoken."""
+        return self.speech.say(text, heard_at)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Live speech recognition with AI replies")
+    parser.add_argument('wavs', nargs='*', help="WAV files to use instead of the microphone")
+    parser.add_argument('--workers', type=int, default=2, help="utterances answered at the same time")
+    parser.add_argument('--stale', choices=POLICIES, default="coalesce",
+                        help="what to do with utterances still waiting when a newer one arrives")
+    args = parser.parse_args()
+
     console = Console()
     console.print(Panel.fit("Speech Recognition AI Conversation System", style="bold green"))
     
-    speech_recognition = LiveSpeechRecognition()
+    speech_recognition = LiveSpeechRecognition(source=WavFileSource(args.wavs, realtime=True) if args.wavs else None,
+                                               workers=args.workers, stale_policy=args.stale)
     speech_recognition.start_listening()
     
     console.print("System is running. Speak into your microphone. Press Ctrl+C to exit.", style="bold yellow")
 
     try:
-        while True:
+        while speech_recognition.is_listening:
             time.sleep(0.1)
     except KeyboardInterrupt:
         console.print("\nStopping the system...", style="bold red")
-        speech_recognition.stop_listening()
-        console.print("System stopped. Goodbye!", style="bold green")
+    speech_recognition.stop_listening()
+    console.print("System stopped. Goodbye!", style="bold green")